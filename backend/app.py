@@ -130,7 +130,11 @@ from database import (
     MonitorCRUD,
     monitor_competitor_crud,
     change_read_crud,
-    archive_crud
+    archive_crud,
+    user_crud,
+    request_cache_scope,
+    start_background_tasks,
+    stop_background_tasks
 )
 
 # ========== OAuth 配置 ==========
@@ -267,7 +271,7 @@ def ensure_user_record(payload: dict) -> None:
     try:
         from database.models import User
         with get_db_session() as db_session:
-            user = db_session.query(User).filter(User.id == user_id).first()
+            user = user_crud.get_by_id(db_session, user_id)
             now = datetime.now(timezone.utc)
 
             if user:
@@ -337,7 +341,7 @@ def get_or_create_user(db: Session, user_info: dict, provider: str):
             raise HTTPException(status_code=400, detail="Email is required")
         
         # 查找现有用户
-        user = db.query(User).filter(User.email == email).first()
+        user = user_crud.get_by_email(db, email)
         
         if user:
             # 更新最后登录时间和提供商信息
@@ -395,14 +399,18 @@ def get_or_create_user(db: Session, user_info: dict, provider: str):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("正在初始化数据库...")
-    if init_db():
+    # 同步的建表/连接检查放到线程里执行，不阻塞事件循环；两步仍保持先后顺序
+    if await asyncio.to_thread(init_db):
         logger.info("数据库初始化成功")
     else:
         logger.warning("数据库初始化失败，使用内存存储")
     
-    check_database_connection()
+    await asyncio.to_thread(check_database_connection)
+    # 定期物理删除过期的变化检测缓存行，防止表和索引无限增长
+    await start_background_tasks()
     yield
     logger.info("应用正在关闭...")
+    await stop_background_tasks()
 
 app = FastAPI(
     title="OPP - Competitor Analysis API", 
@@ -418,6 +426,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_cache_middleware(request, call_next):
+    """每个请求一个独立的 CRUD 请求级缓存（tenant_id -> 主键等）"""
+    with request_cache_scope():
+        return await call_next(request)
+
 class AnalysisRequest(BaseModel):
     company_name: str
     enable_research: bool = True
@@ -635,40 +649,17 @@ class CompetitorIDManager:
     @staticmethod
     def ensure_competitor_exists(comp_data: dict, competitor_id: str, db_session: Session) -> bool:
         """确保competitor记录存在于数据库中 - 修复Session问题"""
-        from database.models import Competitor
-        
         try:
-            existing = db_session.query(Competitor).filter(
-                Competitor.competitor_id == competitor_id
-            ).first()
-            
-            if existing:
-                # 更新现有记录的信息（如果提供了更好的数据）
-                if comp_data.get('primary_url') and not existing.primary_url:
-                    existing.primary_url = comp_data['primary_url']
-                if comp_data.get('display_name') and existing.display_name != comp_data['display_name']:
-                    existing.display_name = comp_data['display_name']
-                if comp_data.get('brief_description') and not existing.brief_description:
-                    existing.brief_description = comp_data['brief_description']
-                
-                db_session.commit()
-                return True
-            
-            # 创建新记录
-            new_competitor = Competitor(
-                competitor_id=competitor_id,
-                display_name=comp_data.get('display_name', competitor_id),
-                primary_url=comp_data.get('primary_url', ''),
-                brief_description=comp_data.get('brief_description', ''),
-                demographics=comp_data.get('demographics', ''),
-                source=comp_data.get('source', 'analysis'),
-                extra_data=comp_data.get('extra_data', {})
-            )
-            
-            db_session.add(new_competitor)
-            db_session.commit()
-            logger.info(f"成功创建competitor记录: {competitor_id}")
-            return True
+            # 单条 upsert：不存在则创建，存在则补全空字段（更新 display_name）
+            competitor_pk = competitor_crud.ensure_competitor(db_session, competitor_id, {
+                'display_name': comp_data.get('display_name', competitor_id),
+                'primary_url': comp_data.get('primary_url', ''),
+                'brief_description': comp_data.get('brief_description', ''),
+                'demographics': comp_data.get('demographics', ''),
+                'source': comp_data.get('source', 'analysis'),
+                'extra_data': comp_data.get('extra_data', {})
+            })
+            return competitor_pk is not None
             
         except Exception as e:
             db_session.rollback()
@@ -1611,8 +1602,7 @@ async def github_callback(request: Request, db: Session = Depends(get_db)):
 async def get_current_user(current_user = Depends(verify_token), db: Session = Depends(get_db)):
     """获取当前用户信息"""
     try:
-        from database.models import User
-        user = db.query(User).filter(User.id == current_user["sub"]).first()
+        user = user_crud.get_by_id(db, current_user["sub"])
         if not user:
             # 如果数据库中没找到用户，返回token中的信息
             return {
@@ -1704,7 +1694,8 @@ async def create_monitor(request: MonitorCreateRequest, current_user = Depends(r
             db_session,
             user_id=user_id,
             url=request.url.strip(),
-            name=request.name or request.url.strip()
+            name=request.name or request.url.strip(),
+            reactivate=True  # 用户显式重新添加：恢复已归档的monitor
         )
         payload = serialize_monitor(monitor)
     return payload
@@ -1878,15 +1869,27 @@ async def bulk_read_changes(request: BulkReadRequest, current_user = Depends(req
 
 
 @app.get("/api/archives")
-async def list_archives(current_user = Depends(require_auth)):
+async def list_archives(
+    limit: int = 50,
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
+    current_user = Depends(require_auth)
+):
     user_id = current_user.get('sub') if isinstance(current_user, dict) else None
     if not user_id:
         raise HTTPException(status_code=401, detail="Authentication required")
 
+    limit = max(1, min(limit, 200))
     with get_db_session() as db_session:
-        archives = archive_crud.list_archives(db_session, user_id)
+        archives = archive_crud.list_archives(
+            db_session, user_id, limit=limit, before=before, before_id=before_id
+        )
         payload = [serialize_archive(archive) for archive in archives]
-    return {'archives': payload}
+        # 满页时返回最后一条的 (created_at, id) 作为下一页游标；须在会话提交前读取
+        next_cursor = None
+        if len(archives) == limit:
+            next_cursor = {'before': archives[-1].created_at, 'before_id': archives[-1].id}
+    return {'archives': payload, 'next_cursor': next_cursor}
 
 
 @app.post("/api/archives")
@@ -1905,7 +1908,7 @@ async def create_archive(request: ArchiveCreateRequest, current_user = Depends(r
     with get_db_session() as db_session:
         # 如果指定了task_id，从任务结果中提取数据
         if request.task_id:
-            task = task_crud.get_task(db_session, request.task_id)
+            task = task_crud.get_task(db_session, request.task_id, with_results=True)
             if not task:
                 raise HTTPException(status_code=404, detail="Task not found")
             
@@ -1938,6 +1941,7 @@ async def create_archive(request: ArchiveCreateRequest, current_user = Depends(r
         # 如果指定了monitor_id，获取最新的changes
         elif request.monitor_id:
             from database.models import ChangeDetection, Monitor, TenantCompetitor, Competitor
+            from sqlalchemy import select
             
             monitor = db_session.query(Monitor).filter(
                 Monitor.id == request.monitor_id,
@@ -1962,27 +1966,26 @@ async def create_archive(request: ArchiveCreateRequest, current_user = Depends(r
                         'key_features': tenant.key_features
                     }
             
-            # 获取tracked competitors
+            # 获取tracked competitors（只读快照：按列投影，不加载 ORM 实例）
             if monitor.tenant_id:
-                competitors = db_session.query(Competitor).join(
-                    TenantCompetitor
-                ).filter(
-                    TenantCompetitor.tenant_id == monitor.tenant_id
+                competitor_rows = db_session.execute(
+                    select(
+                        Competitor.id,
+                        Competitor.competitor_id,
+                        Competitor.display_name,
+                        Competitor.primary_url,
+                        Competitor.brief_description,
+                        Competitor.demographics,
+                        Competitor.source
+                    ).join(
+                        TenantCompetitor
+                    ).where(
+                        TenantCompetitor.tenant_id == monitor.tenant_id
+                    )
                 ).all()
                 
-                competitor_snapshot = []
-                competitor_ids = []
-                for comp in competitors:
-                    competitor_snapshot.append({
-                        'id': comp.id,
-                        'competitor_id': comp.competitor_id,
-                        'display_name': comp.display_name,
-                        'primary_url': comp.primary_url,
-                        'brief_description': comp.brief_description,
-                        'demographics': comp.demographics,
-                        'source': comp.source
-                    })
-                    competitor_ids.append(comp.competitor_id)
+                competitor_snapshot = [row._asdict() for row in competitor_rows]
+                competitor_ids = [row.competitor_id for row in competitor_rows]
                 
                 # 获取最近的changes
                 if competitor_ids:
@@ -2145,7 +2148,7 @@ async def get_status(task_id: str, db: Session = Depends(get_db)):
 @app.get("/api/results/{task_id}")
 async def get_results(task_id: str, db: Session = Depends(get_db)):
     """获取任务结果"""
-    task = task_crud.get_task(db, task_id)
+    task = task_crud.get_task(db, task_id, with_results=True)
     
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -2183,7 +2186,7 @@ async def get_analysis_progress(task_id: str, current_user = Depends(require_aut
         if not user_id:
             raise HTTPException(status_code=401, detail="Authentication required")
 
-        task = task_crud.get_task(db, task_id)
+        task = task_crud.get_task(db, task_id, with_results=True)
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
 
@@ -9,11 +9,14 @@ from typing import List, Dict, Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import aiosmtplib
-from jinja2 import Template
+from jinja2 import BaseLoader, Environment
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# 模板在服务初始化时编译一次，发送时只做渲染
+_TEMPLATE_ENV = Environment(loader=BaseLoader(), auto_reload=False)
+
 class EmailService:
     """邮件服务基类"""
     
@@ -86,6 +89,11 @@ class EmailService:
 </body>
 </html>
         """
+        self._change_alert_tmpl = _TEMPLATE_ENV.from_string(self.change_alert_template)
+    
+    def render_change_alert(self, template_data: Dict) -> str:
+        """用预编译模板渲染变化提醒邮件"""
+        return self._change_alert_tmpl.render(**template_data)
     
     async def send_email(
         self, 
@@ -183,8 +191,7 @@ class EmailService:
             }
             
             # 渲染模板
-            template = Template(self.change_alert_template)
-            html_content = template.render(**template_data)
+            html_content = self.render_change_alert(template_data)
             
             # 简单文本版本
             text_content = f"""
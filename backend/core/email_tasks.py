@@ -1,95 +1,154 @@
 """
 邮件发送任务
 """
+import asyncio
 import logging
+import os
 from datetime import datetime, timedelta
-from typing import List
+from collections import defaultdict
+from typing import Dict, List
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
-from ..database import get_db_session, user_preferences_crud
-from ..database.models import User, UserPreferences, ChangeDetection, Monitor
+from ..database import get_db_session, user_crud, user_preferences_crud
+from ..database.models import UserPreferences, ChangeDetection, Competitor, Monitor
 from .email_service import email_service
 
 logger = logging.getLogger(__name__)
 
+# 每个用户邮件中最多列出的变化数
+DAILY_ALERT_LIMIT = 20
+
+# 每日提醒的并发发送数（受邮件服务商连接数限制）与失败重试
+EMAIL_SEND_CONCURRENCY = int(os.getenv("EMAIL_SEND_CONCURRENCY", "10"))
+EMAIL_SEND_RETRIES = 2
+EMAIL_RETRY_BASE_DELAY = 2.0
+
+def _fetch_daily_alert_changes(db: Session, user_ids: List[str], since: datetime) -> Dict[str, List[dict]]:
+    """一次查询取回所有收件人的待提醒变化，按用户分组
+
+    按用户分区取 threat_level / detected_at 排名前 DAILY_ALERT_LIMIT 的变化，
+    竞争对手名称随同一条语句 JOIN 回来，代替逐用户、逐变化的后续查询。
+    """
+    ranked = select(
+        Monitor.user_id.label("user_id"),
+        ChangeDetection.competitor_id,
+        ChangeDetection.url,
+        ChangeDetection.content,
+        ChangeDetection.threat_level,
+        ChangeDetection.why_matter,
+        ChangeDetection.suggestions,
+        ChangeDetection.detected_at,
+        Competitor.display_name,
+        func.row_number().over(
+            partition_by=Monitor.user_id,
+            order_by=(ChangeDetection.threat_level.desc(), ChangeDetection.detected_at.desc())
+        ).label("rn")
+    ).join(
+        Monitor, Monitor.id == ChangeDetection.monitor_id
+    ).join(
+        UserPreferences, UserPreferences.user_id == Monitor.user_id
+    ).outerjoin(
+        Competitor, Competitor.competitor_id == ChangeDetection.competitor_id
+    ).where(
+        Monitor.user_id.in_(user_ids),
+        Monitor.is_active.is_(True),
+        ChangeDetection.detected_at >= since,
+        ChangeDetection.threat_level >= UserPreferences.email_alert_threshold
+    ).subquery()
+
+    stmt = select(ranked).where(
+        ranked.c.rn <= DAILY_ALERT_LIMIT
+    ).order_by(ranked.c.user_id, ranked.c.rn)
+
+    changes_by_user: Dict[str, List[dict]] = defaultdict(list)
+    for row in db.execute(stmt):
+        changes_by_user[row.user_id].append({
+            "competitor": row.display_name or row.competitor_id,
+            "url": row.url,
+            "content": row.content,
+            "threat_level": row.threat_level,
+            "why_matter": row.why_matter,
+            "suggestions": row.suggestions,
+            "detected_at": row.detected_at.strftime("%Y-%m-%d %H:%M")
+        })
+    return changes_by_user
+
+async def _send_daily_alert(semaphore: asyncio.Semaphore, user, changes_data: List[dict]) -> bool:
+    """在并发上限内发送单个用户的每日提醒，失败按指数退避重试"""
+    for attempt in range(EMAIL_SEND_RETRIES + 1):
+        if attempt:
+            # 退避期间不占用并发名额
+            await asyncio.sleep(EMAIL_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+        async with semaphore:
+            success = await email_service.send_change_alert(
+                user.email,
+                user.name,
+                changes_data,
+                user.email_alert_threshold
+            )
+        if success:
+            logger.info(f"成功发送邮件给 {user.email}: {len(changes_data)} 个变化")
+            return True
+    
+    logger.error(f"发送邮件给 {user.email} 失败")
+    return False
+
 async def send_daily_change_alerts():
     """发送每日变化提醒邮件"""
     try:
         logger.info("开始发送每日变化提醒邮件...")
         
         with get_db_session() as db:
-            # 获取启用邮件提醒的用户
-            alert_users = user_preferences_crud.get_users_for_email_alerts(db)
-            
-            for user, preferences in alert_users:
-                if preferences.email_frequency != "daily":
+            # 获取启用邮件提醒的用户（流式返回所需列）
+            today = datetime.utcnow().date()
+            recipients = {}
+            for user in user_preferences_crud.get_users_for_email_alerts(db):
+                if user.email_frequency != "daily":
                     continue
                 
                 # 检查是否已发送今日邮件
-                if preferences.last_email_sent:
-                    if preferences.last_email_sent.date() == datetime.utcnow().date():
-                        logger.info(f"用户 {user.email} 今日已发送邮件，跳过")
-                        continue
-                
-                # 获取用户的所有monitors
-                monitors = db.query(Monitor).filter(
-                    Monitor.user_id == user.id,
-                    Monitor.is_active == True
-                ).all()
-                
-                if not monitors:
+                if user.last_email_sent and user.last_email_sent.date() == today:
+                    logger.info(f"用户 {user.email} 今日已发送邮件，跳过")
                     continue
                 
-                monitor_ids = [m.id for m in monitors]
-                
-                # 获取过去24小时的高威胁变化
-                yesterday = datetime.utcnow() - timedelta(days=1)
-                changes = db.query(ChangeDetection).filter(
-                    ChangeDetection.monitor_id.in_(monitor_ids),
-                    ChangeDetection.threat_level >= preferences.email_alert_threshold,
-                    ChangeDetection.detected_at >= yesterday
-                ).order_by(
-                    ChangeDetection.threat_level.desc(),
-                    ChangeDetection.detected_at.desc()
-                ).limit(20).all()
-                
-                if not changes:
-                    logger.info(f"用户 {user.email} 没有需要提醒的变化")
-                    continue
-                
-                # 准备邮件数据
-                changes_data = []
-                for change in changes:
-                    # 获取竞争对手名称
-                    from ..database.models import Competitor
-                    competitor = db.query(Competitor).filter(
-                        Competitor.competitor_id == change.competitor_id
-                    ).first()
-                    
-                    changes_data.append({
-                        "competitor": competitor.display_name if competitor else change.competitor_id,
-                        "url": change.url,
-                        "content": change.content,
-                        "threat_level": change.threat_level,
-                        "why_matter": change.why_matter,
-                        "suggestions": change.suggestions,
-                        "detected_at": change.detected_at.strftime("%Y-%m-%d %H:%M")
-                    })
-                
-                # 发送邮件
-                success = await email_service.send_change_alert(
-                    user.email,
-                    user.name,
-                    changes_data,
-                    preferences.email_alert_threshold
+                recipients[user.user_id] = user
+            
+            # 获取过去24小时的高威胁变化（所有收件人一条查询）
+            yesterday = datetime.utcnow() - timedelta(days=1)
+            changes_by_user = (
+                _fetch_daily_alert_changes(db, list(recipients), yesterday) if recipients else {}
+            )
+        
+        # 发送期间不占用数据库连接；并发发送，上限由 EMAIL_SEND_CONCURRENCY 控制
+        pending = []
+        for user_id, user in recipients.items():
+            changes_data = changes_by_user.get(user_id)
+            if not changes_data:
+                logger.info(f"用户 {user.email} 没有需要提醒的变化")
+                continue
+            pending.append((user_id, user, changes_data))
+        
+        semaphore = asyncio.Semaphore(EMAIL_SEND_CONCURRENCY)
+        results = await asyncio.gather(
+            *(_send_daily_alert(semaphore, user, changes_data) for _, user, changes_data in pending),
+            return_exceptions=True
+        )
+        sent_user_ids = []
+        for (user_id, user, _), result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.error(f"发送邮件给 {user.email} 失败: {result}")
+            elif result:
+                sent_user_ids.append(user_id)
+        
+        # 发送完成后一次性更新最后发送时间
+        if sent_user_ids:
+            with get_db_session() as db:
+                db.execute(
+                    update(UserPreferences)
+                    .where(UserPreferences.user_id.in_(sent_user_ids))
+                    .values(last_email_sent=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
                 )
-                
-                if success:
-                    # 更新最后发送时间
-                    preferences.last_email_sent = datetime.utcnow()
-                    db.commit()
-                    logger.info(f"成功发送邮件给 {user.email}: {len(changes)} 个变化")
-                else:
-                    logger.error(f"发送邮件给 {user.email} 失败")
         
         logger.info("每日变化提醒邮件发送完成")
         
@@ -100,7 +159,7 @@ async def send_immediate_alert(user_id: str, changes: List[ChangeDetection]):
     """发送即时提醒（高威胁变化）"""
     try:
         with get_db_session() as db:
-            user = db.query(User).filter(User.id == user_id).first()
+            user = user_crud.get_by_id(db, user_id)
             if not user:
                 return
             
@@ -112,16 +171,18 @@ async def send_immediate_alert(user_id: str, changes: List[ChangeDetection]):
             if preferences.email_frequency != "immediate":
                 return
             
-            # 准备邮件数据
+            # 准备邮件数据（竞争对手名称一次查询取回）
+            alert_changes = changes[:5]  # 最多5个
+            display_names = dict(db.execute(
+                select(Competitor.competitor_id, Competitor.display_name).where(
+                    Competitor.competitor_id.in_({change.competitor_id for change in alert_changes})
+                )
+            ).all())
+            
             changes_data = []
-            for change in changes[:5]:  # 最多5个
-                from ..database.models import Competitor
-                competitor = db.query(Competitor).filter(
-                    Competitor.competitor_id == change.competitor_id
-                ).first()
-                
+            for change in alert_changes:
                 changes_data.append({
-                    "competitor": competitor.display_name if competitor else change.competitor_id,
+                    "competitor": display_names.get(change.competitor_id) or change.competitor_id,
                     "url": change.url,
                     "content": change.content,
                     "threat_level": change.threat_level,
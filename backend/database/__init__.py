@@ -14,6 +14,8 @@ try:
     from .connection import (
         get_db, 
         get_db_session, 
+        get_async_db_session,
+        ASYNC_DB_AVAILABLE,
         init_db, 
         check_database_connection,
         get_database_stats,
@@ -66,6 +68,7 @@ try:
         change_read_crud,
         archive_crud,
         user_preferences_crud,  # 添加这行
+        user_crud,
         TenantCRUD,
         CompetitorCRUD,
         TenantCompetitorCRUD,
@@ -76,7 +79,10 @@ try:
         MonitorCompetitorCRUD,
         ChangeReadCRUD,
         ArchiveCRUD,
-        UserPreferencesCRUD  # 添加这行
+        UserPreferencesCRUD,  # 添加这行
+        UserCRUD,
+        request_cache_scope,
+        unit_of_work
     )
     ENHANCED_CRUD_AVAILABLE = True
     logger.info("增强CRUD操作导入成功")
@@ -166,12 +172,11 @@ class BackwardCompatibleTaskCRUD:
     
     def create_task(self, db, company_name, config=None, **kwargs):
         """创建任务"""
-        from .models import AnalysisTask
+        from .models import AnalysisTask, generate_uuid
         from datetime import datetime
-        import uuid
         
         task = AnalysisTask(
-            id=str(uuid.uuid4()),
+            id=generate_uuid(),
             company_name=company_name,
             task_type=kwargs.get("task_type", "analysis"),
             config=config or {},
@@ -187,10 +192,14 @@ class BackwardCompatibleTaskCRUD:
         db.refresh(task)
         return task
     
-    def get_task(self, db, task_id):
-        """获取任务"""
+    def get_task(self, db, task_id, with_results=False):
+        """获取任务（results 默认延迟加载；需要结果时随同一条查询取出）"""
         from .models import AnalysisTask
-        return db.query(AnalysisTask).filter(AnalysisTask.id == task_id).first()
+        from sqlalchemy.orm import undefer
+        query = db.query(AnalysisTask)
+        if with_results:
+            query = query.options(undefer(AnalysisTask.results))
+        return query.filter(AnalysisTask.id == task_id).first()
     
     def update_task(self, db, task_id, status=None, progress=None, message=None, results=None, **kwargs):
         """更新任务状态"""
@@ -225,41 +234,48 @@ class BackwardCompatibleTaskCRUD:
     def get_recent_tasks(self, db, limit=10):
         """获取最近的任务"""
         from .models import AnalysisTask
-        return db.query(AnalysisTask).order_by(AnalysisTask.created_at.desc()).limit(limit).all()
+        from sqlalchemy.orm import raiseload
+        # 列表只读列；禁止关系懒加载，避免逐任务 N+1
+        return (
+            db.query(AnalysisTask)
+            .options(raiseload('*'))
+            .order_by(AnalysisTask.created_at.desc())
+            .limit(limit)
+            .all()
+        )
     
     def get_running_tasks(self, db):
         """获取运行中的任务"""
         from .models import AnalysisTask
-        return db.query(AnalysisTask).filter(AnalysisTask.status == "running").all()
+        from sqlalchemy.orm import raiseload
+        return db.query(AnalysisTask).options(raiseload('*')).filter(AnalysisTask.status == "running").all()
 
 class BackwardCompatibleCompetitorCRUD:
     """向后兼容的竞争对手CRUD"""
     
     def save_competitors(self, db, task_id, competitors_data):
         """保存竞争对手数据"""
-        from .models import CompetitorRecord
-        from datetime import datetime
+        from .models import bulk_save_competitors
         
-        records = []
-        for i, comp_data in enumerate(competitors_data):
-            record = CompetitorRecord(
-                task_id=task_id,
-                domain=comp_data.get("id", comp_data.get("domain", f"comp_{i}")),
-                display_name=comp_data.get("display_name", "Unknown"),
-                primary_url=comp_data.get("primary_url", ""),
-                brief_description=comp_data.get("brief_description", ""),
-                demographics=comp_data.get("demographics", ""),
-                confidence=comp_data.get("confidence", 0.5),
-                source=comp_data.get("source", "search"),
-                extra_data=comp_data.get("metadata", comp_data.get("extra_data", {})),
-                created_at=datetime.utcnow()
-            )
-            db.add(record)
-            records.append(record)
+        if not competitors_data:
+            return []
+        
+        rows = [
+            {
+                "domain": comp_data.get("id", comp_data.get("domain", f"comp_{i}")),
+                "display_name": comp_data.get("display_name", "Unknown"),
+                "primary_url": comp_data.get("primary_url", ""),
+                "brief_description": comp_data.get("brief_description", ""),
+                "demographics": comp_data.get("demographics", ""),
+                "confidence": comp_data.get("confidence", 0.5),
+                "source": comp_data.get("source", "search"),
+                "extra_data": comp_data.get("metadata", comp_data.get("extra_data", {}))
+            }
+            for i, comp_data in enumerate(competitors_data)
+        ]
         
+        records = bulk_save_competitors(db, task_id, rows)
         db.commit()
-        for record in records:
-            db.refresh(record)
         return records
 
 class BackwardCompatibleChangeCRUD:
@@ -277,9 +293,13 @@ class BackwardCompatibleChangeCRUD:
         """保存变化数据 - 增强版本"""
         from .models import ChangeDetection
         from datetime import datetime
+        from sqlalchemy import insert
+        
+        if not changes_data:
+            return []
         
         try:
-            records = []
+            rows = []
             for change_data in changes_data:
                 # 尝试使用数据中的timestamp，如果没有则使用当前时间
                 detected_at = datetime.utcnow()
@@ -290,24 +310,24 @@ class BackwardCompatibleChangeCRUD:
                     except:
                         pass
                 
-                record = ChangeDetection(
-                    competitor_id=competitor_id,
-                    url=url,
-                    change_type=change_data.get("change_type", "Modified"),
-                    content=change_data.get("content", ""),
-                    threat_level=change_data.get("threat_level", 5),
-                    why_matter=change_data.get("why_matter", ""),
-                    suggestions=change_data.get("suggestions", ""),
-                    detected_at=detected_at,
-                    is_first=is_first,  # 新增
-                    monitor_id=monitor_id  # 新增
-                )
-                db.add(record)
-                records.append(record)
+                rows.append({
+                    "competitor_id": competitor_id,
+                    "url": url,
+                    "change_type": change_data.get("change_type", "Modified"),
+                    "content": change_data.get("content", ""),
+                    "threat_level": change_data.get("threat_level", 5),
+                    "why_matter": change_data.get("why_matter", ""),
+                    "suggestions": change_data.get("suggestions", ""),
+                    "detected_at": detected_at,
+                    "is_first": is_first,  # 新增
+                    "monitor_id": monitor_id  # 新增
+                })
             
-            db.commit()
+            # INSERT ... RETURNING 一次拿回完整行；提交前移出会话，避免 commit 过期后逐条 refresh
+            records = db.scalars(insert(ChangeDetection).returning(ChangeDetection), rows).all()
             for record in records:
-                db.refresh(record)
+                db.expunge(record)
+            db.commit()
             
             logger.info(f"保存变化记录: {len(records)} 条记录, competitor_id={competitor_id}, is_first={is_first}")
             return records
@@ -331,6 +351,10 @@ if not ENHANCED_CRUD_AVAILABLE:
         def get_tenant_by_id(db, tenant_id):
             return None
         
+        @staticmethod
+        def get_tenant_pk(db, tenant_id):
+            return None
+        
         @staticmethod
         def get_tenant_competitors(db, tenant_id):
             return []
@@ -340,7 +364,23 @@ if not ENHANCED_CRUD_AVAILABLE:
         def get_or_create_competitor(db, competitor_id, competitor_data):
             logger.warning("Fallback: 竞争对手CRUD功能受限")
             return None, False
+
+        @staticmethod
+        def ensure_competitor(db, competitor_id, competitor_data):
+            logger.warning("Fallback: 竞争对手CRUD功能受限")
+            return None
     
+    class MinimalUserCRUD:
+        @staticmethod
+        def get_by_id(db, user_id):
+            from .models import User
+            return db.query(User).filter(User.id == user_id).first()
+
+        @staticmethod
+        def get_by_email(db, email):
+            from .models import User
+            return db.query(User).filter(User.email == email).first()
+
     class MinimalUserPreferencesCRUD:
         @staticmethod
         def get_or_create_preferences(db, user_id):
@@ -390,9 +430,13 @@ if not ENHANCED_CRUD_AVAILABLE:
             records = BackwardCompatibleCompetitorCRUD().save_competitors(db, task_id, competitors_data)
             return records, []  # 返回记录和空映射列表
 
+        def list_competitors_for_task(self, db, task_id):
+            logger.warning("Fallback: 竞争对手列表不可用")
+            return []
+
     class MinimalMonitorCRUD:
         @staticmethod
-        def list_monitors(db, user_id, include_archived=False):
+        def list_monitors(db, user_id, include_archived=False, lightweight=False):
             logger.warning("Fallback: Monitor 列表不可用")
             return []
 
@@ -406,7 +450,7 @@ if not ENHANCED_CRUD_AVAILABLE:
             return None
 
         @staticmethod
-        def get_or_create_monitor(db, user_id, url, name=None, tenant_id=None):
+        def get_or_create_monitor(db, user_id, url, name=None, tenant_id=None, reactivate=False):
             return None
 
         @staticmethod
@@ -455,7 +499,7 @@ if not ENHANCED_CRUD_AVAILABLE:
 
     class MinimalArchiveCRUD:
         @staticmethod
-        def list_archives(db, user_id):
+        def list_archives(db, user_id, limit=50, before=None, before_id=None):
             logger.warning("Fallback: 归档不可用")
             return []
 
@@ -463,6 +507,10 @@ if not ENHANCED_CRUD_AVAILABLE:
         def create_archive(db, user_id, monitor_id, task_id, title, tenant_snapshot, competitor_snapshot, change_snapshot, metadata, search_text):
             return None
 
+    # 请求级缓存 / 事务分组在 fallback 下为空操作
+    from contextlib import nullcontext as request_cache_scope
+    from contextlib import nullcontext as unit_of_work
+
     # 分配最小实现
     tenant_crud = MinimalTenantCRUD()
     competitor_crud = MinimalCompetitorCRUD()
@@ -476,6 +524,8 @@ if not ENHANCED_CRUD_AVAILABLE:
     archive_crud = MinimalArchiveCRUD()
     user_preferences_crud = MinimalUserPreferencesCRUD()
     UserPreferencesCRUD = MinimalUserPreferencesCRUD
+    user_crud = MinimalUserCRUD()
+    UserCRUD = MinimalUserCRUD
     # 类引用
     TenantCRUD = MinimalTenantCRUD
     CompetitorCRUD = MinimalCompetitorCRUD
@@ -567,7 +617,7 @@ def migrate_legacy_data():
 # 导出所有主要功能
 __all__ = [
     # 核心数据库
-    'get_db', 'get_db_session', 'init_db',
+    'get_db', 'get_db_session', 'get_async_db_session', 'ASYNC_DB_AVAILABLE', 'init_db',
     'check_database_connection', 'get_database_stats', 'cleanup_database',
     'test_database_integrity',
     
@@ -583,11 +633,14 @@ __all__ = [
         'cache_crud', 'content_storage_crud', 'enhanced_task_crud',
         'monitor_crud', 'monitor_competitor_crud', 'change_read_crud', 'archive_crud',
         'user_preferences_crud',  # 添加这行
+        'user_crud',
         # CRUD类
         'TenantCRUD', 'CompetitorCRUD', 'TenantCompetitorCRUD',
         'ChangeDetectionCacheCRUD', 'ContentStorageCRUD', 'EnhancedTaskCRUD',
         'MonitorCRUD', 'MonitorCompetitorCRUD', 'ChangeReadCRUD', 'ArchiveCRUD',
         'UserPreferencesCRUD',  # 添加这行
+        'UserCRUD',
+        'request_cache_scope', 'unit_of_work',
     # 基础CRUD（总是可用）
     'task_crud', 'basic_competitor_crud', 'change_crud',
     
@@ -7,6 +7,7 @@
 import asyncio
 import concurrent.futures
 import logging
+import os
 from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
@@ -14,6 +15,14 @@ from urllib.parse import urlparse
 logger = logging.getLogger(__name__)
 
 
+async def _run_crud_async(crud_fn, *args):
+    """在 AsyncSession 上执行同步 CRUD 函数：事件循环不阻塞，也不占用执行器线程"""
+    from .connection import get_async_db_session
+    
+    async with get_async_db_session() as db:
+        return await db.run_sync(crud_fn, *args)
+
+
 class UUIDCompetitorResolver:
     """UUID竞争对手解析器 - 正确处理域名到UUID的映射"""
     
@@ -24,39 +33,40 @@ class UUIDCompetitorResolver:
         from sqlalchemy import or_
         
         try:
+            # 只需要主键：按列查询，不加载整行 ORM 对象
             # 方法1：直接通过competitor_id查找
-            competitor = db.query(models.Competitor).filter(
+            competitor_uuid = db.query(models.Competitor.id).filter(
                 models.Competitor.competitor_id == domain_id
-            ).first()
+            ).limit(1).scalar()
             
-            if competitor:
-                logger.debug(f"通过competitor_id找到UUID: {domain_id} -> {competitor.id}")
-                return competitor.id
+            if competitor_uuid:
+                logger.debug(f"通过competitor_id找到UUID: {domain_id} -> {competitor_uuid}")
+                return competitor_uuid
             
             # 方法2：通过URL查找
             if url:
-                competitor = db.query(models.Competitor).filter(
+                competitor_uuid = db.query(models.Competitor.id).filter(
                     models.Competitor.primary_url == url
-                ).first()
+                ).limit(1).scalar()
                 
-                if competitor:
-                    logger.debug(f"通过URL找到UUID: {url} -> {competitor.id}")
-                    return competitor.id
+                if competitor_uuid:
+                    logger.debug(f"通过URL找到UUID: {url} -> {competitor_uuid}")
+                    return competitor_uuid
             
             # 方法3：模糊匹配
             if url:
                 domain = urlparse(url).netloc.replace('www.', '')
                 
-                competitor = db.query(models.Competitor).filter(
+                competitor_uuid = db.query(models.Competitor.id).filter(
                     or_(
                         models.Competitor.competitor_id.like(f'%{domain}%'),
                         models.Competitor.primary_url.like(f'%{domain}%')
                     )
-                ).first()
+                ).limit(1).scalar()
                 
-                if competitor:
-                    logger.debug(f"通过模糊匹配找到UUID: {domain} -> {competitor.id}")
-                    return competitor.id
+                if competitor_uuid:
+                    logger.debug(f"通过模糊匹配找到UUID: {domain} -> {competitor_uuid}")
+                    return competitor_uuid
             
             logger.warning(f"未找到匹配的competitor UUID: domain_id={domain_id}, url={url}")
             return None
@@ -66,53 +76,77 @@ class UUIDCompetitorResolver:
             return None
     
     @staticmethod
-    def ensure_competitor_exists_and_get_uuid(db, domain_id: str, url: str) -> Optional[str]:
-        """确保competitor存在并返回UUID"""
+    def resolve_competitor_uuids(db, url_domain_pairs: List[Tuple[str, str]]) -> Dict[str, str]:
+        """批量解析 url -> competitor UUID：一次 IN 查询覆盖按域名的精确匹配，未命中的再逐个回退"""
         from . import models
         
-        try:
-            # 首先尝试查找现有记录
-            uuid = UUIDCompetitorResolver.get_competitor_uuid_by_domain(db, domain_id, url)
-            if uuid:
-                return uuid
-            
-            # 如果没找到，创建新的competitor
-            display_name_map = {
-                'google.com': 'Google',
-                'alibaba.com': 'Alibaba Group',
-                'tencent.com': 'Tencent',
-                'facebook.com': 'Facebook',
-                'amazon.com': 'Amazon',
-                'microsoft.com': 'Microsoft',
-                'apple.com': 'Apple',
-                'netflix.com': 'Netflix'
-            }
-            
-            new_competitor = models.Competitor(
-                competitor_id=domain_id,
-                display_name=display_name_map.get(domain_id, domain_id.split('.')[0].title()),
-                primary_url=url,
-                brief_description=f'Auto-created for caching: {domain_id}',
-                demographics='',
-                source='cache-uuid-fix',
-                extra_data={
-                    'created_from': 'uuid_fix',
-                    'auto_created': True,
-                    'created_at': datetime.utcnow().isoformat()
-                }
+        domain_ids = list({domain_id for _, domain_id in url_domain_pairs if domain_id})
+        by_domain = {}
+        if domain_ids:
+            by_domain = dict(
+                db.query(models.Competitor.competitor_id, models.Competitor.id).filter(
+                    models.Competitor.competitor_id.in_(domain_ids)
+                ).all()
             )
-            
-            db.add(new_competitor)
-            db.commit()
-            db.refresh(new_competitor)
-            
-            logger.info(f"为缓存创建新competitor: {domain_id} -> UUID: {new_competitor.id}")
-            return new_competitor.id
-            
+        
+        resolved = {}
+        for url, domain_id in url_domain_pairs:
+            competitor_uuid = by_domain.get(domain_id)
+            if not competitor_uuid:
+                competitor_uuid = UUIDCompetitorResolver.get_competitor_uuid_by_domain(db, domain_id, url)
+            if competitor_uuid:
+                resolved[url] = competitor_uuid
+        return resolved
+    
+    @staticmethod
+    def ensure_competitor_exists_and_get_uuid(db, domain_id: str, url: str) -> Optional[str]:
+        """确保competitor存在并返回UUID
+
+        查找与补建在 SAVEPOINT 内执行：失败只回滚这一家，不影响调用方事务中已写入的其他行。
+        """
+        try:
+            with db.begin_nested():
+                return UUIDCompetitorResolver._find_or_create_competitor(db, domain_id, url)
         except Exception as e:
-            db.rollback()
             logger.error(f"创建competitor失败: {e}")
             return None
+    
+    @staticmethod
+    def _find_or_create_competitor(db, domain_id: str, url: str) -> Optional[str]:
+        # 首先尝试查找现有记录
+        uuid = UUIDCompetitorResolver.get_competitor_uuid_by_domain(db, domain_id, url)
+        if uuid:
+            return uuid
+        
+        # 如果没找到，创建新的competitor
+        display_name_map = {
+            'google.com': 'Google',
+            'alibaba.com': 'Alibaba Group',
+            'tencent.com': 'Tencent',
+            'facebook.com': 'Facebook',
+            'amazon.com': 'Amazon',
+            'microsoft.com': 'Microsoft',
+            'apple.com': 'Apple',
+            'netflix.com': 'Netflix'
+        }
+        
+        # 单条 INSERT ... ON CONFLICT ... RETURNING，并发创建同一域名时不会撞唯一约束
+        from .crud import competitor_crud
+        competitor_uuid = competitor_crud.ensure_competitor(db, domain_id, {
+            'display_name': display_name_map.get(domain_id, domain_id.split('.')[0].title()),
+            'primary_url': url,
+            'brief_description': f'Auto-created for caching: {domain_id}',
+            'demographics': '',
+            'source': 'cache-uuid-fix',
+            'extra_data': {
+                'created_from': 'uuid_fix',
+                'auto_created': True,
+                'created_at': datetime.utcnow().isoformat()
+            }
+        })
+        
+        logger.info(f"为缓存创建新competitor: {domain_id} -> UUID: {competitor_uuid}")
+        return competitor_uuid
 
 
 class ChangeDetectionCacheManager:
@@ -121,7 +155,12 @@ class ChangeDetectionCacheManager:
     def __init__(self, default_ttl_hours: int = 72):
         self.default_ttl_hours = default_ttl_hours
         self._cleanup_task: Optional[asyncio.Task] = None
-        self._cleanup_interval = 3600
+        # 过期缓存清理间隔（秒）
+        self._cleanup_interval = int(os.getenv("CACHE_CLEANUP_INTERVAL_SECONDS", "3600"))
+        # change_detections 按月分区的保留天数，0 表示只预建分区、不删除历史
+        self._change_retention_days = int(os.getenv("CHANGE_DETECTION_RETENTION_DAYS", "0"))
+        # 孤立已读回执兜底清理的每批行数，0（默认）表示不运行
+        self._orphan_receipt_batch = int(os.getenv("READ_RECEIPT_ORPHAN_SWEEP_BATCH", "0"))
         self._executor = concurrent.futures.ThreadPoolExecutor(
             max_workers=4, 
             thread_name_prefix="cache-uuid-fix"
@@ -150,37 +189,16 @@ class ChangeDetectionCacheManager:
         """同步版本的缓存获取 - 使用正确的UUID查询"""
         try:
             from .connection import get_db_session
-            from . import models
-            
-            results = {}
+            from .crud import cache_crud
             
             with get_db_session() as db:
+                # 一次解析全部UUID，再按 (competitor UUID, url) 批量查询缓存
+                uuid_by_url = UUIDCompetitorResolver.resolve_competitor_uuids(db, url_competitor_pairs)
                 for url, domain_id in url_competitor_pairs:
-                    try:
-                        # 获取正确的UUID
-                        competitor_uuid = UUIDCompetitorResolver.get_competitor_uuid_by_domain(
-                            db, domain_id, url
-                        )
-                        
-                        if not competitor_uuid:
-                            logger.debug(f"跳过缓存查询，competitor不存在: {domain_id}")
-                            continue
-                        
-                        # 使用cache_key查询（保持原有逻辑）
-                        cache_key = models.ChangeDetectionCache.generate_cache_key(domain_id, url)
-                        
-                        cached_record = db.query(models.ChangeDetectionCache).filter(
-                            models.ChangeDetectionCache.cache_key == cache_key,
-                            models.ChangeDetectionCache.expires_at > datetime.utcnow()
-                        ).first()
-                        
-                        if cached_record:
-                            results[url] = cached_record.result_data
-                            logger.debug(f"缓存命中: {url}")
-                    
-                    except Exception as e:
-                        logger.warning(f"查询单个缓存记录失败 {url}: {e}")
-                        continue
+                    if url not in uuid_by_url:
+                        logger.debug(f"跳过缓存查询，competitor不存在: {domain_id}")
+                
+                results = cache_crud.get_cached_results_batch(db, list(uuid_by_url.items()))
             
             logger.info(f"缓存查询完成: {len(results)}/{len(url_competitor_pairs)} 命中")
             return results
@@ -225,71 +243,83 @@ class ChangeDetectionCacheManager:
         
         logger.info(f"开始缓存 {len(results)} 个结果（UUID修复版）")
         
-        # 逐个处理每个缓存项
-        for url, result_data in results.items():
-            try:
-                domain_id = competitor_id_mapping.get(url)
-                
-                if not domain_id:
-                    logger.warning(f"跳过无映射的URL: {url}")
-                    continue
+        url_domain_pairs = []
+        for url in results:
+            domain_id = competitor_id_mapping.get(url)
+            if not domain_id:
+                logger.warning(f"跳过无映射的URL: {url}")
+                continue
+            url_domain_pairs.append((url, domain_id))
+        
+        if not url_domain_pairs:
+            return cached_urls
+        
+        from .connection import get_db_session
+        from . import models
+        from .crud import _upsert_insert, cache_crud, unit_of_work
+        
+        try:
+            # 整批共用一个会话与一次提交（补建竞争对手也只 flush）
+            with get_db_session() as db, unit_of_work(db):
+                # 关键修复：外键使用 competitors.id（UUID）；已有竞争对手一次 IN 查询解析，未命中的再逐个补建
+                competitor_uuids = UUIDCompetitorResolver.resolve_competitor_uuids(db, url_domain_pairs)
+                for url, domain_id in url_domain_pairs:
+                    if url in competitor_uuids:
+                        continue
+                    competitor_uuid = UUIDCompetitorResolver.ensure_competitor_exists_and_get_uuid(db, domain_id, url)
+                    if competitor_uuid:
+                        competitor_uuids[url] = competitor_uuid
+                    else:
+                        logger.error(f"无法获取competitor UUID，跳过: {domain_id}")
                 
-                # 为每个缓存项创建独立的数据库会话
-                from .connection import get_db_session
-                from . import models
+                now = datetime.utcnow()
+                expires_at = now + timedelta(hours=ttl)
+                rows = [
+                    {
+                        'competitor_id': competitor_uuids[url],  # ← 使用UUID，不是域名字符串
+                        'url': url,
+                        'result_data': results[url],
+                        'created_at': now,
+                        'expires_at': expires_at
+                    }
+                    for url, _ in url_domain_pairs
+                    if url in competitor_uuids
+                ]
                 
-                with get_db_session() as db:
-                    # 关键修复：获取正确的UUID用于外键
-                    competitor_uuid = UUIDCompetitorResolver.ensure_competitor_exists_and_get_uuid(
-                        db, domain_id, url
+                if rows:
+                    # 一条 INSERT ... ON CONFLICT (competitor_id, url) DO UPDATE，以 executemany 写入整批
+                    stmt = _upsert_insert(db, models.ChangeDetectionCache)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=['competitor_id', 'url'],
+                        set_={
+                            'result_data': stmt.excluded.result_data,
+                            'expires_at': stmt.excluded.expires_at,
+                            'created_at': stmt.excluded.created_at
+                        }
                     )
-                    
-                    if not competitor_uuid:
-                        logger.error(f"无法获取competitor UUID: {domain_id}")
-                        continue
-                    
-                    # 创建或更新缓存记录
-                    expires_at = datetime.utcnow() + timedelta(hours=ttl)
-                    cache_key = models.ChangeDetectionCache.generate_cache_key(domain_id, url)
-                    
-                    # 检查现有缓存
-                    existing_cache = db.query(models.ChangeDetectionCache).filter(
-                        models.ChangeDetectionCache.cache_key == cache_key
-                    ).first()
-                    
-                    if existing_cache:
-                        # 更新现有缓存
-                        existing_cache.result_data = result_data
-                        existing_cache.expires_at = expires_at
-                        existing_cache.created_at = datetime.utcnow()
-                        # 确保使用正确的UUID
-                        existing_cache.competitor_id = competitor_uuid
-                        logger.debug(f"更新缓存: {url} -> UUID: {competitor_uuid}")
-                    else:
-                        # 创建新缓存记录 - 关键修复：使用UUID而不是域名
-                        cache_record = models.ChangeDetectionCache(
-                            competitor_id=competitor_uuid,  # ← 使用UUID，不是域名字符串
-                            url=url,
-                            cache_key=cache_key,
-                            result_data=result_data,
-                            expires_at=expires_at
-                        )
-                        db.add(cache_record)
-                        logger.debug(f"创建缓存: {url} -> UUID: {competitor_uuid}")
-                    
-                    # 提交缓存记录
                     try:
-                        db.commit()
-                        cached_urls.append(url)
-                        logger.debug(f"成功缓存: {url}")
+                        with db.begin_nested():
+                            db.execute(stmt, rows)
+                        cached_urls = [row['url'] for row in rows]
                     except Exception as e:
-                        db.rollback()
-                        logger.error(f"缓存提交失败 {url}: {e}")
-                        continue
-            
-            except Exception as e:
-                logger.error(f"处理缓存项失败 {url}: {e}", exc_info=True)
-                continue
+                        # 整批失败时逐行重试，坏行记录后跳过，其余照常提交
+                        logger.warning(f"批量缓存写入失败，逐条重试: {e}")
+                        for row in rows:
+                            try:
+                                with db.begin_nested():
+                                    db.execute(stmt, row)
+                                cached_urls.append(row['url'])
+                            except Exception as row_error:
+                                logger.error(f"缓存写入失败，跳过 {row['url']}: {row_error}")
+        
+        except Exception as e:
+            logger.error(f"批量缓存提交失败: {e}", exc_info=True)
+            return []
+        
+        # 提交后再驱逐进程内一级缓存，避免并发读取在提交前回填旧值
+        cache_crud.evict_cached_results(
+            (competitor_uuids[url], url) for url in cached_urls
+        )
         
         logger.info(f"缓存完成: 成功 {len(cached_urls)}/{len(results)} 个")
         return cached_urls
@@ -323,6 +353,14 @@ class ChangeDetectionCacheManager:
     async def cleanup_expired_cache(self) -> int:
         """清理所有过期的缓存记录"""
         try:
+            from .connection import ASYNC_DB_AVAILABLE
+            if ASYNC_DB_AVAILABLE:
+                from .crud import cache_crud
+                deleted_count = await _run_crud_async(cache_crud.cleanup_expired_cache)
+                if deleted_count > 0:
+                    logger.info(f"清理了 {deleted_count} 个过期缓存记录")
+                return deleted_count
+            
             loop = asyncio.get_event_loop()
             return await loop.run_in_executor(self._executor, self._sync_cleanup_expired_cache)
         except Exception as e:
@@ -333,14 +371,10 @@ class ChangeDetectionCacheManager:
         """同步版本的缓存清理"""
         try:
             from .connection import get_db_session
-            from . import models
+            from .crud import cache_crud
             
             with get_db_session() as db:
-                deleted_count = db.query(models.ChangeDetectionCache).filter(
-                    models.ChangeDetectionCache.expires_at <= datetime.utcnow()
-                ).delete()
-                
-                db.commit()
+                deleted_count = cache_crud.cleanup_expired_cache(db)
                 if deleted_count > 0:
                     logger.info(f"清理了 {deleted_count} 个过期缓存记录")
                 return deleted_count
@@ -349,6 +383,53 @@ class ChangeDetectionCacheManager:
             logger.error(f"清理过期缓存失败: {e}")
             return 0
     
+    def _sync_maintain_change_partitions(self) -> None:
+        """预建未来月份的 change_detections 分区，并整块删除超出保留期的月份
+
+        每一步单独提交：某一步失败（如与其他 worker 并发）不会回滚其余步骤。
+        """
+        try:
+            from .connection import get_db_session
+            from .models import (
+                delete_orphaned_read_receipts,
+                drop_change_detection_partition,
+                ensure_change_detection_partitions,
+                expired_change_detection_partitions,
+            )
+            
+            with get_db_session() as db:
+                created = ensure_change_detection_partitions(db.connection())
+            if created:
+                logger.info(f"创建变化检测分区: {created}")
+            
+            if self._change_retention_days > 0:
+                cutoff = datetime.utcnow() - timedelta(days=self._change_retention_days)
+                with get_db_session() as db:
+                    expired = expired_change_detection_partitions(db.connection(), cutoff)
+                for name in expired:
+                    # DETACH/DROP 在父表上持强锁，每个分区一个短事务；
+                    # 其他 worker 已删掉同一分区时只记日志，继续处理下一个
+                    try:
+                        with get_db_session() as db:
+                            drop_change_detection_partition(db.connection(), name)
+                        logger.info(f"删除过期变化检测分区: {name}")
+                    except Exception as e:
+                        logger.warning(f"删除变化检测分区 {name} 失败: {e}")
+            
+            if self._orphan_receipt_batch > 0:
+                orphaned = 0
+                while True:
+                    with get_db_session() as db:
+                        deleted = delete_orphaned_read_receipts(db.connection(), self._orphan_receipt_batch)
+                    orphaned += deleted
+                    if deleted < self._orphan_receipt_batch:
+                        break
+                if orphaned:
+                    logger.info(f"清理了 {orphaned} 条孤立的已读回执")
+                        
+        except Exception as e:
+            logger.error(f"维护变化检测分区失败: {e}")
+    
     async def start_background_cleanup(self):
         """启动后台清理任务"""
         if self._cleanup_task and not self._cleanup_task.done():
@@ -378,6 +459,8 @@ class ChangeDetectionCacheManager:
                 deleted = await self.cleanup_expired_cache()
                 if deleted > 0:
                     logger.info(f"后台清理删除了 {deleted} 个过期记录")
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(self._executor, self._sync_maintain_change_partitions)
             except asyncio.CancelledError:
                 break
             except Exception as e:
@@ -506,6 +589,11 @@ class ContentCacheManager:
     async def get_previous_content(self, urls: List[str], tag: str) -> Dict[str, str]:
         """获取URLs的上次保存的内容"""
         try:
+            from .connection import ASYNC_DB_AVAILABLE
+            if ASYNC_DB_AVAILABLE:
+                from .crud import content_storage_crud
+                return await _run_crud_async(content_storage_crud.get_previous_content, urls, tag)
+            
             loop = asyncio.get_event_loop()
             return await loop.run_in_executor(
                 self._executor, 
@@ -521,29 +609,10 @@ class ContentCacheManager:
         """同步版本的获取内容"""
         try:
             from .connection import get_db_session
-            from . import models
-            from sqlalchemy import func, and_
+            from .crud import content_storage_crud
             
             with get_db_session() as db:
-                subquery = db.query(
-                    models.ContentStorage.url,
-                    func.max(models.ContentStorage.created_at).label('latest_created')
-                ).filter(
-                    and_(
-                        models.ContentStorage.url.in_(urls),
-                        models.ContentStorage.tag == tag
-                    )
-                ).group_by(models.ContentStorage.url).subquery()
-                
-                records = db.query(models.ContentStorage).join(
-                    subquery,
-                    and_(
-                        models.ContentStorage.url == subquery.c.url,
-                        models.ContentStorage.created_at == subquery.c.latest_created
-                    )
-                ).all()
-                
-                return {record.url: record.content for record in records}
+                return content_storage_crud.get_previous_content(db, urls, tag)
                 
         except Exception as e:
             logger.error(f"获取历史内容失败: {e}")
@@ -552,13 +621,20 @@ class ContentCacheManager:
     async def save_current_content(self, content_mapping: Dict[str, str], tag: str) -> bool:
         """保存当前内容"""
         try:
-            loop = asyncio.get_event_loop()
-            records = await loop.run_in_executor(
-                self._executor,
-                self._sync_save_current_content,
-                content_mapping,
-                tag
-            )
+            from .connection import ASYNC_DB_AVAILABLE
+            if ASYNC_DB_AVAILABLE:
+                from .crud import content_storage_crud
+                records = await _run_crud_async(
+                    content_storage_crud.save_current_content, content_mapping, tag
+                )
+            else:
+                loop = asyncio.get_event_loop()
+                records = await loop.run_in_executor(
+                    self._executor,
+                    self._sync_save_current_content,
+                    content_mapping,
+                    tag
+                )
             success = len(records) > 0 or len(content_mapping) == 0
             logger.info(f"保存了 {len(records)} 条内容记录，标签: '{tag}'")
             return success
@@ -570,42 +646,10 @@ class ContentCacheManager:
         """同步版本的保存内容"""
         try:
             from .connection import get_db_session
-            from . import models
-            from sqlalchemy import and_
-            
-            records = []
+            from .crud import content_storage_crud
             
             with get_db_session() as db:
-                for url, content in content_mapping.items():
-                    if not content:
-                        continue
-                        
-                    content_hash = models.ContentStorage.generate_content_hash(content)
-                    
-                    existing = db.query(models.ContentStorage).filter(
-                        and_(
-                            models.ContentStorage.url == url,
-                            models.ContentStorage.tag == tag,
-                            models.ContentStorage.content_hash == content_hash
-                        )
-                    ).first()
-                    
-                    if not existing:
-                        record = models.ContentStorage(
-                            url=url,
-                            tag=tag,
-                            content_hash=content_hash,
-                            content=content
-                        )
-                        db.add(record)
-                        records.append(record)
-                
-                if records:
-                    db.commit()
-                    for record in records:
-                        db.refresh(record)
-            
-            return records
+                return content_storage_crud.save_current_content(db, content_mapping, tag)
                 
         except Exception as e:
             logger.error(f"同步保存内容失败: {e}")
@@ -1,9 +1,10 @@
 # backend/database/connection.py
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 import os
-from typing import Generator
+from typing import Generator, AsyncGenerator
 from .models import Base
 import logging
 import urllib.parse
@@ -50,13 +51,52 @@ def get_safe_database_url():
 # 安全获取数据库URL
 DATABASE_URL = get_safe_database_url()
 
+# 请求路径（get_db）单条语句超时（毫秒），防止卡住的查询长期占用连接池；0 表示不限制。
+# 只在请求会话的事务内以 SET LOCAL 生效，init_db、迁移、回填与后台清理的连接不受限制
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+
+# executemany 每批行数：INSERT ... RETURNING 走 insertmanyvalues，UPDATE/DELETE 走 execute_batch
+EXECUTEMANY_PAGE_SIZE = int(os.getenv("DB_EXECUTEMANY_PAGE_SIZE", "500"))
+
+# 编译缓存条目数：热点 CRUD 语句只编译一次（SQLAlchemy 默认 500）
+QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))
+
+# 连接池参数：持续跟踪会并发处理数百个URL，默认池容易排队等待连接；
+# 等待超时缩短以尽早暴露池耗尽，回收周期短于常见的服务端/代理空闲断开时间
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "25"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "25"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# 异步引擎单独一个小池：只承担缓存清理、内容存取等少量批量读写。
+# 每个进程最多占用 (POOL_SIZE + POOL_MAX_OVERFLOW) + (ASYNC_POOL_SIZE + ASYNC_POOL_MAX_OVERFLOW)
+# 个连接（默认 50 + 10 = 60），乘以 worker 数后须低于服务端 max_connections（默认 100）
+ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "5"))
+ASYNC_POOL_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_POOL_MAX_OVERFLOW", "5"))
+
+# psycopg2 专用：多行 VALUES 合并为一条语句，仍能拿回 RETURNING 的主键；其他驱动不接受这些参数
+_EXECUTEMANY_KWARGS = (
+    {
+        "executemany_mode": "values_plus_batch",
+        "executemany_batch_page_size": EXECUTEMANY_PAGE_SIZE,
+    }
+    if make_url(DATABASE_URL).get_driver_name() == "psycopg2"
+    else {}
+)
+
 # Create engine with robust configuration - FIXED: removed 'encoding' parameter
 engine = create_engine(
     DATABASE_URL,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
     pool_pre_ping=True,
-    pool_recycle=3600,
+    pool_recycle=POOL_RECYCLE,
+    # LIFO：优先复用最近归还的热连接，空闲的溢出连接更快被回收
+    pool_use_lifo=True,
+    insertmanyvalues_page_size=EXECUTEMANY_PAGE_SIZE,
+    **_EXECUTEMANY_KWARGS,
+    query_cache_size=QUERY_CACHE_SIZE,
     echo=False,
     # 关键修复：添加编码和连接参数
     connect_args={
@@ -71,6 +111,46 @@ engine = create_engine(
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+@event.listens_for(SessionLocal, "after_begin")
+def _apply_request_statement_timeout(session, transaction, connection):
+    """带 statement_timeout 标记的会话：每个事务开始时设置 SET LOCAL，事务结束即失效"""
+    if (
+        session.info.get("statement_timeout")
+        and STATEMENT_TIMEOUT_MS > 0
+        and connection.dialect.name == "postgresql"
+    ):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {STATEMENT_TIMEOUT_MS}")
+
+# 异步引擎（可选依赖 asyncpg）：协程里的批量读写不再占用线程池线程
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+    import asyncpg  # noqa: F401
+    ASYNC_DB_AVAILABLE = make_url(DATABASE_URL).get_backend_name() == "postgresql"
+except ImportError:
+    ASYNC_DB_AVAILABLE = False
+
+if ASYNC_DB_AVAILABLE:
+    async_engine = create_async_engine(
+        make_url(DATABASE_URL).set(drivername="postgresql+asyncpg"),
+        pool_size=ASYNC_POOL_SIZE,
+        max_overflow=ASYNC_POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_pre_ping=True,
+        pool_recycle=POOL_RECYCLE,
+        pool_use_lifo=True,
+        query_cache_size=QUERY_CACHE_SIZE,
+        echo=False,
+        connect_args={
+            "server_settings": {
+                "timezone": "utc",
+            },
+        },
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
 def test_database_encoding():
     """测试数据库连接的编码设置"""
     try:
@@ -165,21 +245,26 @@ def init_db():
                 'analysis_archives', 'users'
             ]
             
-            missing_tables = []
-            for table in required_tables:
-                try:
-                    result = conn.execute(text(
-                        "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = :table_name)"
-                    ), {"table_name": table})
-                    
-                    if result.scalar():
-                        logger.info(f"✅ Table '{table}' created successfully")
-                    else:
-                        missing_tables.append(table)
-                        logger.error(f"❌ Table '{table}' missing")
-                except Exception as e:
-                    logger.error(f"检查表 {table} 时出错: {e}")
-                    missing_tables.append(table)
+            # 一次 pg_class 查询确认全部表，而不是每张表查一次 information_schema
+            try:
+                result = conn.execute(text("""
+                    SELECT c.relname
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = current_schema()
+                      AND c.relkind IN ('r', 'p')
+                      AND c.relname = ANY(:table_names)
+                """), {"table_names": required_tables})
+                existing_tables = {row[0] for row in result}
+            except Exception as e:
+                logger.error(f"检查表时出错: {e}")
+                existing_tables = set()
+            
+            missing_tables = [table for table in required_tables if table not in existing_tables]
+            if existing_tables:
+                logger.info(f"✅ {len(existing_tables)}/{len(required_tables)} tables created successfully")
+            for table in missing_tables:
+                logger.error(f"❌ Table '{table}' missing")
             
             if missing_tables:
                 raise Exception(f"Failed to create tables: {missing_tables}")
@@ -204,14 +289,28 @@ def _create_additional_indexes():
                    ON tenant_competitors(tenant_id, competitor_id)""",
                 """CREATE INDEX IF NOT EXISTS idx_cache_expires_at 
                    ON change_detection_cache(expires_at)""",
-                """CREATE INDEX IF NOT EXISTS idx_content_url_tag_created 
-                   ON content_storage(url, tag, created_at DESC)""",
-                """CREATE INDEX IF NOT EXISTS idx_competitor_id_url
+                """CREATE INDEX IF NOT EXISTS idx_content_tag_url_created
+                   ON content_storage(tag, url, created_at DESC)""",
+                """CREATE UNIQUE INDEX IF NOT EXISTS uq_cache_competitor_url
                    ON change_detection_cache(competitor_id, url)""",
                 """CREATE INDEX IF NOT EXISTS idx_tenant_id_lookup
                    ON tenants(tenant_id)""",
                 """CREATE INDEX IF NOT EXISTS idx_competitor_id_lookup
-                   ON competitors(competitor_id)"""
+                   ON competitors(competitor_id)""",
+                """CREATE UNIQUE INDEX IF NOT EXISTS uq_content_url_tag_hash
+                   ON content_storage(url, tag, content_hash)""",
+                """CREATE INDEX IF NOT EXISTS idx_monitor_user_active
+                   ON monitors(user_id, is_active, archived_at)""",
+                # 缓存表按 TTL 整批删除/覆盖写，调低阈值让 autovacuum 及时回收死元组
+                """ALTER TABLE change_detection_cache SET (
+                   autovacuum_vacuum_scale_factor = 0.02,
+                   autovacuum_analyze_scale_factor = 0.02,
+                   autovacuum_vacuum_cost_limit = 1000)""",
+                """CREATE INDEX IF NOT EXISTS idx_archive_user_created
+                   ON analysis_archives(user_id, created_at DESC)""",
+                """CREATE INDEX IF NOT EXISTS idx_monitor_user_live
+                   ON monitors(user_id, created_at DESC)
+                   WHERE is_active AND archived_at IS NULL"""
             ]
             
             success_count = 0
@@ -229,8 +328,8 @@ def _create_additional_indexes():
         logger.warning(f"⚠️ Error creating indexes: {e}")
 
 def get_db() -> Generator[Session, None, None]:
-    """Get database session for FastAPI dependency injection"""
-    db = SessionLocal()
+    """Get database session for FastAPI dependency injection (request-path statement timeout)"""
+    db = SessionLocal(info={"statement_timeout": True})
     try:
         yield db
     finally:
@@ -250,6 +349,23 @@ def get_db_session() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+@asynccontextmanager
+async def get_async_db_session() -> AsyncGenerator["AsyncSession", None]:
+    """Async counterpart of get_db_session (requires asyncpg)"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database support requires asyncpg and a PostgreSQL DATABASE_URL")
+    
+    db = AsyncSessionLocal()
+    try:
+        yield db
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Async database session error: {e}")
+        raise
+    finally:
+        await db.close()
+
 def check_database_connection():
     """Check database connection with detailed diagnostics"""
     try:
@@ -1,17 +1,367 @@
 # backend/database/crud.py
 """Enhanced CRUD operations with proper foreign key handling"""
-from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import desc, and_, or_, func
-from typing import List, Optional, Dict, Any, Tuple
-from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, selectinload, noload, raiseload
+from sqlalchemy import desc, and_, or_, func, select, delete, bindparam, tuple_, case, any_, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import List, Optional, Dict, Any, Tuple, NamedTuple, Hashable, Iterable, Iterator
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from urllib.parse import urlparse
 from . import models
+import copy
 import json
 import hashlib
 import logging
+import os
+import re
+import threading
+import time
+from itertools import islice
 
 logger = logging.getLogger(__name__)
 
+def _utcnow() -> datetime:
+    """Naive UTC timestamp matching the DateTime columns (``datetime.utcnow`` is deprecated)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _upsert_insert(db: Session, model):
+    """Dialect-specific INSERT supporting ON CONFLICT (PostgreSQL / SQLite)"""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(model)
+    return pg_insert(model)
+
+# IN 列表分块大小，保持在规划器友好的范围内
+_IN_CHUNK_SIZE = 500
+
+def _chunked(items, size: int = _IN_CHUNK_SIZE):
+    """Yield successive lists of at most ``size`` items"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _upsert_entity(
+    db: Session,
+    model,
+    key: str,
+    key_value: str,
+    data: Dict[str, Any],
+    defaults: Dict[str, Any]
+) -> Tuple[Any, bool]:
+    """INSERT ... ON CONFLICT (key) DO UPDATE ... RETURNING in one round-trip.
+
+    New rows take missing fields from ``defaults``; existing rows only have the
+    fields present in ``data`` overwritten. Returns ``(record, created)``.
+    """
+    now = _utcnow()
+    values = {field: data.get(field, default) for field, default in defaults.items()}
+    stmt = _upsert_insert(db, model).values(
+        **{key: key_value}, created_at=now, updated_at=now, **values
+    )
+    updates = {field: stmt.excluded[field] for field in defaults if field in data}
+    updates['updated_at'] = stmt.excluded.updated_at
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key], set_=updates
+    ).returning(model)
+    
+    record = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+    # 新插入的行 created_at 与 updated_at 相同；冲突更新只刷新 updated_at
+    return record, record.created_at == record.updated_at
+
+def _upsert_entities(
+    db: Session,
+    model,
+    key: str,
+    rows: Dict[str, Dict[str, Any]],
+    defaults: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Multi-row variant of ``_upsert_entity``: ``{key_value: data}`` -> ``{key_value: record}``.
+
+    Rows are grouped by the set of fields they carry so that each group is a
+    single INSERT ... ON CONFLICT DO UPDATE ... RETURNING statement.
+    """
+    now = _utcnow()
+    groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for key_value, data in rows.items():
+        present = frozenset(field for field in defaults if field in data)
+        values = {field: data.get(field, default) for field, default in defaults.items()}
+        groups.setdefault(present, []).append(
+            {key: key_value, 'created_at': now, 'updated_at': now, **values}
+        )
+    
+    records: Dict[str, Any] = {}
+    for present, group_rows in groups.items():
+        for chunk in _chunked(group_rows):
+            stmt = _upsert_insert(db, model).values(chunk)
+            updates = {field: stmt.excluded[field] for field in present}
+            updates['updated_at'] = stmt.excluded.updated_at
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[key], set_=updates
+            ).returning(model)
+            for record in db.scalars(stmt, execution_options={"populate_existing": True}):
+                records[getattr(record, key)] = record
+    return records
+
+# 热点查询在导入时构建一次，调用时只绑定参数
+_GET_TENANT_BY_ID = select(models.Tenant).where(
+    models.Tenant.tenant_id == bindparam('tenant_id')
+)
+
+_GET_TENANT_PK = select(models.Tenant.id).where(
+    models.Tenant.tenant_id == bindparam('tenant_id')
+)
+
+_GET_LIVE_CACHE = select(
+    models.ChangeDetectionCache.competitor_id,
+    models.ChangeDetectionCache.url,
+    models.ChangeDetectionCache.result_data,
+    models.ChangeDetectionCache.created_at,
+    models.ChangeDetectionCache.expires_at
+).where(
+    models.ChangeDetectionCache.competitor_id == bindparam('competitor_id'),
+    models.ChangeDetectionCache.url == bindparam('url'),
+    models.ChangeDetectionCache.expires_at > func.now()
+)
+
+_GET_MONITOR_BY_USER_URLS = select(models.Monitor).options(
+    selectinload(models.Monitor.latest_task),
+    selectinload(models.Monitor.tracked_competitors).selectinload(models.MonitorCompetitor.competitor),
+).where(
+    models.Monitor.user_id == bindparam('user_id'),
+    models.Monitor.url.in_(bindparam('urls', expanding=True))
+).limit(1)
+
+# PostgreSQL 专用：每个 URL 最新一条内容（DISTINCT ON + 数组参数）
+_GET_LATEST_CONTENT_PG = select(
+    models.ContentStorage.url,
+    models.ContentStorage.content
+).distinct(models.ContentStorage.url).where(
+    models.ContentStorage.tag == bindparam('tag'),
+    models.ContentStorage.url == any_(bindparam('urls', type_=ARRAY(String)))
+).order_by(
+    models.ContentStorage.url,
+    models.ContentStorage.created_at.desc()
+)
+
+_GET_TENANT_COMPETITORS = select(models.Competitor).join(
+    models.TenantCompetitor
+).where(
+    models.TenantCompetitor.tenant_id == bindparam('tenant_pk')
+)
+
+_GET_MONITOR = select(models.Monitor).options(
+    selectinload(models.Monitor.latest_task),
+    selectinload(models.Monitor.tracked_competitors).selectinload(models.MonitorCompetitor.competitor),
+    raiseload('*'),  # 其余关系禁止懒加载，避免 N+1
+).where(
+    models.Monitor.id == bindparam('monitor_id'),
+    models.Monitor.user_id == bindparam('user_id')  # 确保用户只能访问自己的monitor
+).limit(1)
+
+_GET_TRACKED_COMPETITOR_IDS = select(models.MonitorCompetitor.competitor_id).where(
+    models.MonitorCompetitor.monitor_id == bindparam('monitor_id'),
+    models.MonitorCompetitor.tracked.is_(True)
+)
+
+_GET_USER_BY_ID = select(models.User).where(
+    models.User.id == bindparam('user_id')
+).limit(1)
+
+_GET_USER_BY_EMAIL = select(models.User).where(
+    models.User.email == bindparam('email')
+).limit(1)
+
+_GET_PREFERENCES = select(models.UserPreferences).where(
+    models.UserPreferences.user_id == bindparam('user_id')
+).limit(1)
+
+_GET_READ_RECEIPT = select(models.ChangeReadReceipt).where(
+    models.ChangeReadReceipt.user_id == bindparam('user_id'),
+    models.ChangeReadReceipt.change_id == bindparam('change_id')
+)
+
+_GET_READ_AT = select(
+    models.ChangeReadReceipt.change_id,
+    models.ChangeReadReceipt.read_at
+).where(
+    models.ChangeReadReceipt.user_id == bindparam('user_id'),
+    models.ChangeReadReceipt.change_id.in_(bindparam('change_ids', expanding=True))
+)
+
+# PostgreSQL：整批 id 作为一个数组参数绑定
+_GET_READ_AT_PG = select(
+    models.ChangeReadReceipt.change_id,
+    models.ChangeReadReceipt.read_at
+).where(
+    models.ChangeReadReceipt.user_id == bindparam('user_id'),
+    models.ChangeReadReceipt.change_id == any_(bindparam('change_ids', type_=ARRAY(String)))
+)
+
+_GET_MONITOR_COMPETITOR = select(models.MonitorCompetitor).where(
+    models.MonitorCompetitor.monitor_id == bindparam('monitor_id'),
+    models.MonitorCompetitor.competitor_id == bindparam('competitor_id')
+)
+
+class _TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class CachedResult(NamedTuple):
+    """Read-only snapshot of a change_detection_cache row"""
+    competitor_id: str
+    url: str
+    result_data: Dict[str, Any]
+    created_at: datetime
+    expires_at: datetime
+
+
+# 只读列表返回 NamedTuple 投影，不构造 ORM 实例（无 identity map / 属性插装开销）；
+# ORM 实例只用于写路径
+class CompetitorRecordRow(NamedTuple):
+    """Read-only projection of a competitor_records row"""
+    id: str
+    domain: str
+    display_name: str
+    primary_url: str
+    confidence: float
+
+_LIST_TASK_COMPETITORS = select(
+    models.CompetitorRecord.id,
+    models.CompetitorRecord.domain,
+    models.CompetitorRecord.display_name,
+    models.CompetitorRecord.primary_url,
+    models.CompetitorRecord.confidence
+).where(
+    models.CompetitorRecord.task_id == bindparam('task_id')
+).order_by(models.CompetitorRecord.created_at)
+
+
+# 以下均为进程内缓存，多 worker 之间不互相失效：
+# 变化检测缓存的一级缓存，键为 (competitor_id, url)：批量读取先查这里，只有未命中的才回库
+# （行本身 TTL 为 72 小时）；本进程写入后即驱逐，其他 worker 覆盖写入的行最多 5 分钟后才看到
+_cached_result_l1 = _TTLCache(maxsize=10000, ttl=300)
+
+# 已读状态缓存：user_id -> {change_id: read_at}，只记已读的 id（回执只增不删），
+# 未读的 id 每次都回库查询，其他 worker 标记已读立即可见；
+# 只有重复标记时更新的 read_at 时间戳可能滞后最多 ttl 秒。ttl 为 0 时关闭缓存
+_read_ids_l1 = _TTLCache(maxsize=5000, ttl=float(os.getenv("READ_STATE_CACHE_TTL_SECONDS", "30")))
+
+# 插入新行时使用的默认值；更新时只覆盖调用方提供的字段
+# 请求级缓存：只存不可变的映射（如 tenant_id -> 主键），与具体 Session 无关
+_request_cache: ContextVar[Optional[Dict[Hashable, Any]]] = ContextVar('crud_request_cache', default=None)
+
+@contextmanager
+def request_cache_scope() -> Iterator[None]:
+    """Memoize immutable lookups for the duration of one request / task"""
+    token = _request_cache.set({})
+    try:
+        yield
+    finally:
+        _request_cache.reset(token)
+
+@contextmanager
+def unit_of_work(db: Session, keep_loaded: bool = False) -> Iterator[Session]:
+    """Group several CRUD calls into one transaction.
+
+    Inside the scope CRUD methods only flush; a single COMMIT is issued on exit
+    (or a ROLLBACK if the block raises). Nested scopes defer to the outermost one.
+    """
+    if db.info.get('defer_commit'):
+        yield db
+        db.flush()
+        return
+    
+    db.info['defer_commit'] = True
+    try:
+        yield db
+        _commit_session(db, keep_loaded)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.info.pop('defer_commit', None)
+
+def _commit_session(db: Session, keep_loaded: bool) -> None:
+    """COMMIT, optionally without expiring the session's loaded objects"""
+    if not keep_loaded:
+        db.commit()
+        return
+    # 服务器端默认值（created_at 等）已由 eager_defaults 在 flush 时 RETURNING 带回，
+    # flush 之后内存状态即数据库状态：提交时不过期对象，省掉随后 refresh 的 SELECT，会话关闭后属性仍可读
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+def _commit(db: Session, keep_loaded: bool = False) -> None:
+    """Commit, or only flush when running inside unit_of_work()
+
+    ``keep_loaded`` leaves the session's objects unexpired, replacing a
+    post-commit ``db.refresh()``.
+    """
+    if db.info.get('defer_commit'):
+        db.flush()
+    else:
+        _commit_session(db, keep_loaded)
+
+_TENANT_DEFAULTS = {
+    'tenant_name': 'Unknown',
+    'tenant_url': '',
+    'tenant_description': '',
+    'target_market': '',
+    'key_features': [],
+}
+
+_COMPETITOR_DEFAULTS = {
+    'display_name': 'Unknown',
+    'primary_url': '',
+    'brief_description': '',
+    'demographics': '',
+    'source': 'search',
+    'extra_data': {},
+}
+
 class TenantCRUD:
     """Tenant CRUD operations"""
     
@@ -23,36 +373,15 @@ class TenantCRUD:
     ) -> Tuple[models.Tenant, bool]:
         """Get or create tenant record"""
         try:
-            # Try to get existing tenant
-            tenant = db.query(models.Tenant).filter(
-                models.Tenant.tenant_id == tenant_id
-            ).first()
-            
-            if tenant:
-                # Update existing tenant
-                tenant.tenant_name = tenant_data.get('tenant_name', tenant.tenant_name)
-                tenant.tenant_url = tenant_data.get('tenant_url', tenant.tenant_url)
-                tenant.tenant_description = tenant_data.get('tenant_description', tenant.tenant_description)
-                tenant.target_market = tenant_data.get('target_market', tenant.target_market)
-                tenant.key_features = tenant_data.get('key_features', tenant.key_features)
-                tenant.updated_at = datetime.utcnow()
-                db.commit()
-                db.refresh(tenant)
-                return tenant, False
-            
-            # Create new tenant
-            tenant = models.Tenant(
-                tenant_id=tenant_id,
-                tenant_name=tenant_data.get('tenant_name', 'Unknown'),
-                tenant_url=tenant_data.get('tenant_url', ''),
-                tenant_description=tenant_data.get('tenant_description', ''),
-                target_market=tenant_data.get('target_market', ''),
-                key_features=tenant_data.get('key_features', [])
+            tenant, created = _upsert_entity(
+                db, models.Tenant, 'tenant_id', tenant_id, tenant_data, _TENANT_DEFAULTS
             )
-            db.add(tenant)
-            db.commit()
-            db.refresh(tenant)
-            return tenant, True
+            tenant_pk = tenant.id
+            _commit(db)
+            cache = _request_cache.get()
+            if cache is not None:
+                cache[('tenant', tenant_id)] = tenant_pk
+            return tenant, created
             
         except Exception as e:
             db.rollback()
@@ -62,24 +391,44 @@ class TenantCRUD:
     @staticmethod
     def get_tenant_by_id(db: Session, tenant_id: str) -> Optional[models.Tenant]:
         """Get tenant by tenant_id"""
-        return db.query(models.Tenant).filter(
-            models.Tenant.tenant_id == tenant_id
-        ).first()
+        cache = _request_cache.get()
+        tenant_pk = cache.get(('tenant', tenant_id)) if cache is not None else None
+        if tenant_pk is not None:
+            # 主键查找优先命中当前 Session 的 identity map
+            return db.get(models.Tenant, tenant_pk)
+        
+        tenant = db.execute(
+            _GET_TENANT_BY_ID, {'tenant_id': tenant_id}
+        ).scalar_one_or_none()
+        if tenant is not None and cache is not None:
+            cache[('tenant', tenant_id)] = tenant.id
+        return tenant
+    
+    @staticmethod
+    def get_tenant_pk(db: Session, tenant_id: str) -> Optional[str]:
+        """Resolve tenant_id to the tenants.id primary key (memoized per request)"""
+        cache = _request_cache.get()
+        key = ('tenant', tenant_id)
+        if cache is not None and key in cache:
+            return cache[key]
+        
+        tenant_pk = db.execute(_GET_TENANT_PK, {'tenant_id': tenant_id}).scalar_one_or_none()
+        if tenant_pk is not None and cache is not None:
+            cache[key] = tenant_pk
+        return tenant_pk
     
     @staticmethod
     def get_tenant_competitors(db: Session, tenant_id: str) -> List[models.Competitor]:
         """获取租户的所有竞争对手 - 修复缺失方法"""
         try:
-            tenant = TenantCRUD.get_tenant_by_id(db, tenant_id)
-            if not tenant:
+            tenant_pk = TenantCRUD.get_tenant_pk(db, tenant_id)
+            if not tenant_pk:
                 return []
             
             # 通过关联表查询
-            competitors = db.query(models.Competitor).join(
-                models.TenantCompetitor
-            ).filter(
-                models.TenantCompetitor.tenant_id == tenant.id
-            ).all()
+            competitors = db.execute(
+                _GET_TENANT_COMPETITORS, {'tenant_pk': tenant_pk}
+            ).scalars().all()
             
             return competitors
             
@@ -98,42 +447,62 @@ class CompetitorCRUD:
     ) -> Tuple[models.Competitor, bool]:
         """Get or create competitor record"""
         try:
-            competitor = db.query(models.Competitor).filter(
-                models.Competitor.competitor_id == competitor_id
-            ).first()
-            
-            if competitor:
-                # Update existing
-                competitor.display_name = competitor_data.get('display_name', competitor.display_name)
-                competitor.primary_url = competitor_data.get('primary_url', competitor.primary_url)
-                competitor.brief_description = competitor_data.get('brief_description', competitor.brief_description)
-                competitor.demographics = competitor_data.get('demographics', competitor.demographics)
-                competitor.source = competitor_data.get('source', competitor.source)
-                competitor.extra_data = competitor_data.get('extra_data', competitor.extra_data)
-                competitor.updated_at = datetime.utcnow()
-                db.commit()
-                db.refresh(competitor)
-                return competitor, False
-            
-            # Create new competitor
-            competitor = models.Competitor(
-                competitor_id=competitor_id,
-                display_name=competitor_data.get('display_name', 'Unknown'),
-                primary_url=competitor_data.get('primary_url', ''),
-                brief_description=competitor_data.get('brief_description', ''),
-                demographics=competitor_data.get('demographics', ''),
-                source=competitor_data.get('source', 'search'),
-                extra_data=competitor_data.get('extra_data', {})
+            competitor, created = _upsert_entity(
+                db, models.Competitor, 'competitor_id', competitor_id, competitor_data, _COMPETITOR_DEFAULTS
             )
-            db.add(competitor)
-            db.commit()
-            db.refresh(competitor)
-            return competitor, True
+            _commit(db)
+            return competitor, created
             
         except Exception as e:
             db.rollback()
             logger.error(f"Error in get_or_create_competitor: {e}")
             raise
+    
+    @staticmethod
+    def ensure_competitor(
+        db: Session,
+        competitor_id: str,
+        competitor_data: Dict[str, Any]
+    ) -> str:
+        """Insert the competitor or fill in its blanks; returns competitors.id
+
+        One INSERT ... ON CONFLICT DO UPDATE ... RETURNING replaces the
+        select-then-insert. A provided display_name replaces the stored one;
+        a provided primary_url / brief_description only fills an empty column.
+        """
+        try:
+            now = _utcnow()
+            values = {
+                field: competitor_data.get(field, default)
+                for field, default in _COMPETITOR_DEFAULTS.items()
+            }
+            stmt = _upsert_insert(db, models.Competitor).values(
+                competitor_id=competitor_id, created_at=now, updated_at=now, **values
+            )
+            updates = {'updated_at': stmt.excluded.updated_at}
+            if competitor_data.get('display_name'):
+                updates['display_name'] = stmt.excluded.display_name
+            for field in ('primary_url', 'brief_description'):
+                if competitor_data.get(field):
+                    column = getattr(models.Competitor, field)
+                    updates[field] = case(
+                        (func.coalesce(column, '') == '', stmt.excluded[field]),
+                        else_=column
+                    )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['competitor_id'], set_=updates
+            ).returning(models.Competitor.id)
+            
+            competitor_pk = db.execute(stmt).scalar_one()
+            _commit(db)
+            return competitor_pk
+            
+        except Exception as e:
+            # Inside a SAVEPOINT the caller rolls back just that savepoint
+            if not db.in_nested_transaction():
+                db.rollback()
+            logger.error(f"Error in ensure_competitor: {e}")
+            raise
 
 class TenantCompetitorCRUD:
     """Tenant-Competitor relationship CRUD"""
@@ -145,62 +514,85 @@ class TenantCompetitorCRUD:
         competitors_data: List[Dict[str, Any]],
         task_id: Optional[str] = None
     ) -> List[models.TenantCompetitor]:
-        """Link tenant with competitors (idempotent)"""
+        """Link tenant with competitors (idempotent)
+
+        Returned links are committed but not refreshed; attributes reload on access.
+        """
+        if not competitors_data:
+            return []
+        
         try:
-            # Get tenant
-            tenant = TenantCRUD.get_tenant_by_id(db, tenant_id)
-            if not tenant:
-                raise ValueError(f"Tenant {tenant_id} not found")
-            
-            created_links = []
-            
-            for comp_data in competitors_data:
-                competitor_id = comp_data.get('id') or comp_data.get('competitor_id')
-                if not competitor_id:
-                    logger.warning(f"Skipping competitor without id: {comp_data}")
-                    continue
-                
-                # Get or create competitor
-                competitor, _ = CompetitorCRUD.get_or_create_competitor(
-                    db, competitor_id, comp_data
-                )
-                
-                # Check existing link
-                existing_link = db.query(models.TenantCompetitor).filter(
-                    and_(
-                        models.TenantCompetitor.tenant_id == tenant.id,
-                        models.TenantCompetitor.competitor_id == competitor.id
-                    )
-                ).first()
-                
-                if not existing_link:
-                    # Create new link
-                    link = models.TenantCompetitor(
-                        tenant_id=tenant.id,
-                        competitor_id=competitor.id,
-                        task_id=task_id,
-                        confidence=comp_data.get('confidence', 0.5)
-                    )
-                    db.add(link)
-                    created_links.append(link)
-                else:
-                    # Update confidence
-                    existing_link.confidence = max(
-                        existing_link.confidence, 
-                        comp_data.get('confidence', 0.5)
-                    )
-                    created_links.append(existing_link)
-            
-            db.commit()
-            for link in created_links:
-                db.refresh(link)
-            
-            return created_links
+            links = TenantCompetitorCRUD._link_tenant_competitors(
+                db, tenant_id, competitors_data, task_id
+            )
+            _commit(db)
+            return links
             
         except Exception as e:
             db.rollback()
             logger.error(f"Error linking tenant competitors: {e}")
             raise
+    
+    @staticmethod
+    def _link_tenant_competitors(
+        db: Session,
+        tenant_id: str,
+        competitors_data: List[Dict[str, Any]],
+        task_id: Optional[str] = None
+    ) -> List[models.TenantCompetitor]:
+        """Link without committing, so callers can keep the whole batch in one transaction"""
+        # Get tenant (only the primary key is needed for the links)
+        tenant_pk = TenantCRUD.get_tenant_pk(db, tenant_id)
+        if not tenant_pk:
+            raise ValueError(f"Tenant {tenant_id} not found")
+        
+        # Merge repeated competitors within this batch: later fields win, confidence keeps the max
+        merged: Dict[str, Dict[str, Any]] = {}
+        confidences: Dict[str, float] = {}
+        for comp_data in competitors_data:
+            competitor_id = comp_data.get('id') or comp_data.get('competitor_id')
+            if not competitor_id:
+                logger.warning(f"Skipping competitor without id: {comp_data}")
+                continue
+            
+            merged.setdefault(competitor_id, {}).update(comp_data)
+            confidence = comp_data.get('confidence', 0.5)
+            confidences[competitor_id] = max(confidences.get(competitor_id, confidence), confidence)
+        
+        if not merged:
+            return []
+        
+        # One upsert for all competitors (no intermediate commit)
+        competitors = _upsert_entities(
+            db, models.Competitor, 'competitor_id', merged, _COMPETITOR_DEFAULTS
+        )
+        
+        # One upsert for all links; existing links keep the higher confidence
+        link_rows = [
+            {
+                'tenant_id': tenant_pk,
+                'competitor_id': competitors[competitor_id].id,
+                'task_id': task_id,
+                'confidence': confidence,
+            }
+            for competitor_id, confidence in confidences.items()
+        ]
+        links: List[models.TenantCompetitor] = []
+        for chunk in _chunked(link_rows):
+            stmt = _upsert_insert(db, models.TenantCompetitor).values(chunk)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['tenant_id', 'competitor_id'],
+                set_={
+                    'confidence': case(
+                        (stmt.excluded.confidence > models.TenantCompetitor.confidence,
+                         stmt.excluded.confidence),
+                        else_=models.TenantCompetitor.confidence
+                    )
+                }
+            ).returning(models.TenantCompetitor)
+            links.extend(db.scalars(stmt, execution_options={"populate_existing": True}))
+        
+        return links
 
 class ChangeDetectionCacheCRUD:
     """Change detection cache CRUD with proper foreign key handling"""
@@ -210,18 +602,23 @@ class ChangeDetectionCacheCRUD:
         db: Session, 
         competitor_id: str, 
         url: str
-    ) -> Optional[models.ChangeDetectionCache]:
-        """Get cached change detection result"""
-        cache_key = models.ChangeDetectionCache.generate_cache_key(competitor_id, url)
+    ) -> Optional[CachedResult]:
+        """Get cached change detection result (process-local TTL cache in front of the DB)"""
+        now = _utcnow()
+        l1_key = (competitor_id, url)
         
-        cache_record = db.query(models.ChangeDetectionCache).filter(
-            and_(
-                models.ChangeDetectionCache.cache_key == cache_key,
-                models.ChangeDetectionCache.expires_at > datetime.utcnow()
-            )
-        ).first()
+        cached = _cached_result_l1.get(l1_key)
+        if cached is None or cached.expires_at <= now:
+            # 直接按 (competitor_id, url) 唯一索引查找，读路径不再计算哈希
+            row = db.execute(_GET_LIVE_CACHE, {'competitor_id': competitor_id, 'url': url}).first()
+            if row is None:
+                _cached_result_l1.pop(l1_key)
+                return None
+            cached = CachedResult(*row)
+            _cached_result_l1.set(l1_key, cached)
         
-        return cache_record
+        # result_data 为缓存内共享的 dict，返回副本，调用方修改不会污染缓存
+        return cached._replace(result_data=copy.deepcopy(cached.result_data))
     
     @staticmethod
     def set_cached_result(
@@ -234,54 +631,43 @@ class ChangeDetectionCacheCRUD:
     ) -> models.ChangeDetectionCache:
         """Set cached change detection result with proper FK handling"""
         try:
-            # Ensure competitor exists if requested
+            # Ensure competitor exists if requested (no-op when it already does)
             if ensure_competitor_exists:
-                competitor = db.query(models.Competitor).filter(
-                    models.Competitor.competitor_id == competitor_id
-                ).first()
-                
-                if not competitor:
-                    # Create minimal competitor record
-                    competitor_data = {
-                        'display_name': f'Auto-created for {competitor_id}',
-                        'primary_url': url,
-                        'brief_description': '',
-                        'demographics': '',
-                        'source': 'cache'
-                    }
-                    competitor, _ = CompetitorCRUD.get_or_create_competitor(
-                        db, competitor_id, competitor_data
-                    )
+                parent_stmt = _upsert_insert(db, models.Competitor).values(
+                    competitor_id=competitor_id,
+                    display_name=f'Auto-created for {competitor_id}',
+                    primary_url=url,
+                    brief_description='',
+                    demographics='',
+                    source='cache'
+                ).on_conflict_do_nothing(index_elements=['competitor_id'])
+                if db.execute(parent_stmt).rowcount:
                     logger.info(f"Auto-created competitor {competitor_id} for caching")
             
-            cache_key = models.ChangeDetectionCache.generate_cache_key(competitor_id, url)
-            expires_at = datetime.utcnow() + timedelta(hours=ttl_hours)
+            now = _utcnow()
             
-            # Check existing cache
-            existing = db.query(models.ChangeDetectionCache).filter(
-                models.ChangeDetectionCache.cache_key == cache_key
-            ).first()
-            
-            if existing:
-                # Update existing
-                existing.result_data = result_data
-                existing.expires_at = expires_at
-                existing.created_at = datetime.utcnow()
-                db.commit()
-                db.refresh(existing)
-                return existing
-            
-            # Create new cache record
-            cache_record = models.ChangeDetectionCache(
+            # Single-statement upsert keyed on (competitor_id, url)
+            stmt = _upsert_insert(db, models.ChangeDetectionCache).values(
                 competitor_id=competitor_id,
                 url=url,
-                cache_key=cache_key,
                 result_data=result_data,
-                expires_at=expires_at
+                created_at=now,
+                expires_at=now + timedelta(hours=ttl_hours)
             )
-            db.add(cache_record)
-            db.commit()
-            db.refresh(cache_record)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['competitor_id', 'url'],
+                set_={
+                    'result_data': stmt.excluded.result_data,
+                    'expires_at': stmt.excluded.expires_at,
+                    'created_at': stmt.excluded.created_at
+                }
+            ).returning(models.ChangeDetectionCache)
+            
+            cache_record = db.scalars(
+                stmt, execution_options={"populate_existing": True}
+            ).one()
+            _commit(db)
+            _cached_result_l1.pop((competitor_id, url))
             return cache_record
             
         except Exception as e:
@@ -289,44 +675,108 @@ class ChangeDetectionCacheCRUD:
             logger.error(f"Error setting cached result: {e}")
             raise
     
+    @staticmethod
+    def evict_cached_results(keys: Iterable[Tuple[str, str]]) -> None:
+        """Drop (competitor_id, url) entries from the in-process cache after their rows were rewritten"""
+        for key in keys:
+            _cached_result_l1.pop(key)
+    
     @staticmethod
     def get_cached_results_batch(
         db: Session,
         url_competitor_pairs: List[Tuple[str, str]]
     ) -> Dict[str, Dict[str, Any]]:
-        """Batch get cached results"""
+        """Batch get cached results (process-local TTL cache in front of the DB)"""
+        if not url_competitor_pairs:
+            return {}
+        
         try:
-            cache_keys = [
-                models.ChangeDetectionCache.generate_cache_key(comp_id, url)
-                for url, comp_id in url_competitor_pairs
-            ]
+            now = _utcnow()
+            results = {}
+            missing = []
+            for url, comp_id in url_competitor_pairs:
+                cached = _cached_result_l1.get((comp_id, url))
+                if cached is not None and cached.expires_at > now:
+                    results[url] = cached.result_data
+                else:
+                    missing.append((url, comp_id))
             
-            cached_records = db.query(models.ChangeDetectionCache).filter(
-                and_(
-                    models.ChangeDetectionCache.cache_key.in_(cache_keys),
-                    models.ChangeDetectionCache.expires_at > datetime.utcnow()
-                )
-            ).all()
+            columns = _GET_LIVE_CACHE.selected_columns
+            if missing and db.get_bind().dialect.name == "postgresql":
+                # 两个数组参数 unnest 成 (competitor_id, url) 行集，整批只有两个绑定参数
+                comp_ids = [comp_id for _, comp_id in missing]
+                urls = [url for url, _ in missing]
+                wanted = func.unnest(
+                    bindparam('comp_ids', comp_ids, type_=ARRAY(String)),
+                    bindparam('urls', urls, type_=ARRAY(String))
+                ).table_valued('competitor_id', 'url')
+                stmts = [select(*columns).where(
+                    tuple_(
+                        models.ChangeDetectionCache.competitor_id,
+                        models.ChangeDetectionCache.url
+                    ).in_(select(wanted.c.competitor_id, wanted.c.url)),
+                    models.ChangeDetectionCache.expires_at > func.now()
+                )]
+            else:
+                # 分块查询，避免超长 IN 列表；直接按 (competitor_id, url) 走 uq_cache_competitor_url
+                stmts = [
+                    select(*columns).where(
+                        tuple_(
+                            models.ChangeDetectionCache.competitor_id,
+                            models.ChangeDetectionCache.url
+                        ).in_(chunk),
+                        models.ChangeDetectionCache.expires_at > func.now()
+                    )
+                    for chunk in _chunked([(comp_id, url) for url, comp_id in missing])
+                ]
             
-            results = {}
-            for record in cached_records:
-                results[record.url] = record.result_data
+            for stmt in stmts:
+                for row in db.execute(stmt.execution_options(yield_per=_IN_CHUNK_SIZE)):
+                    cached = CachedResult(*row)
+                    _cached_result_l1.set((cached.competitor_id, cached.url), cached)
+                    results[cached.url] = cached.result_data
             
-            return results
+            # result_data 为缓存内共享的 dict，返回副本，调用方修改不会污染缓存
+            return {url: copy.deepcopy(result_data) for url, result_data in results.items()}
             
         except Exception as e:
             logger.error(f"Error getting batch cached results: {e}")
             return {}
     
     @staticmethod
-    def cleanup_expired_cache(db: Session) -> int:
-        """Clean expired cache records"""
+    def cleanup_expired_cache(db: Session, batch_size: int = 1000) -> int:
+        """Clean expired cache records (batched on PostgreSQL to keep locks short)"""
         try:
-            deleted_count = db.query(models.ChangeDetectionCache).filter(
-                models.ChangeDetectionCache.expires_at <= datetime.utcnow()
-            ).delete()
+            # 过期判断在数据库侧用 now()，语句不再携带客户端时间字面量
+            if db.get_bind().dialect.name != "postgresql":
+                # 集合式删除，不回扫 Session 的 identity map
+                deleted_count = db.query(models.ChangeDetectionCache).filter(
+                    models.ChangeDetectionCache.expires_at <= func.now()
+                ).delete(synchronize_session=False)
+                _commit(db)
+                _cached_result_l1.clear()
+                return deleted_count
             
-            db.commit()
+            # WITH expired AS (SELECT id ... LIMIT n FOR UPDATE SKIP LOCKED) DELETE ... WHERE id IN expired
+            expired = select(models.ChangeDetectionCache.id).where(
+                models.ChangeDetectionCache.expires_at <= func.now()
+            ).limit(batch_size).with_for_update(skip_locked=True).cte('expired')
+            stmt = delete(models.ChangeDetectionCache).where(
+                models.ChangeDetectionCache.id.in_(select(expired.c.id))
+            )
+            
+            deleted_count = 0
+            while True:
+                batch_deleted = db.execute(
+                    stmt, execution_options={"synchronize_session": False}
+                ).rowcount
+                # 每批单独提交，尽快释放行锁
+                db.commit()
+                deleted_count += batch_deleted
+                if batch_deleted < batch_size:
+                    break
+            
+            _cached_result_l1.clear()
             return deleted_count
             
         except Exception as e:
@@ -344,27 +794,38 @@ class ContentStorageCRUD:
         tag: str
     ) -> Dict[str, str]:
         """Get previous content for URLs"""
+        if not urls:
+            return {}
+        
         try:
-            # Get latest content for each URL with the given tag
-            subquery = db.query(
-                models.ContentStorage.url,
-                func.max(models.ContentStorage.created_at).label('latest_created')
-            ).filter(
-                and_(
-                    models.ContentStorage.url.in_(urls),
-                    models.ContentStorage.tag == tag
-                )
-            ).group_by(models.ContentStorage.url).subquery()
+            use_distinct_on = db.get_bind().dialect.name == "postgresql"
+            results = {}
             
-            records = db.query(models.ContentStorage).join(
-                subquery,
-                and_(
-                    models.ContentStorage.url == subquery.c.url,
-                    models.ContentStorage.created_at == subquery.c.latest_created
-                )
-            ).all()
+            # 超长 URL 列表分块查询，避免规划器退化
+            for chunk in _chunked(urls):
+                if use_distinct_on:
+                    # DISTINCT ON 沿 idx_content_tag_url_created 每个 URL 只取第一行，无需窗口排名
+                    rows = db.execute(_GET_LATEST_CONTENT_PG, {'tag': tag, 'urls': chunk})
+                else:
+                    # Get latest content for each URL with the given tag (single pass window)
+                    ranked = db.query(
+                        models.ContentStorage.url,
+                        models.ContentStorage.content,
+                        func.row_number().over(
+                            partition_by=models.ContentStorage.url,
+                            order_by=models.ContentStorage.created_at.desc()
+                        ).label('rn')
+                    ).filter(
+                        and_(
+                            models.ContentStorage.tag == tag,
+                            models.ContentStorage.url.in_(chunk)
+                        )
+                    ).subquery()
+                    rows = db.query(ranked.c.url, ranked.c.content).filter(ranked.c.rn == 1)
+                
+                results.update({url: content for url, content in rows})
             
-            return {record.url: record.content for record in records}
+            return results
             
         except Exception as e:
             logger.error(f"Error getting previous content: {e}")
@@ -378,37 +839,36 @@ class ContentStorageCRUD:
     ) -> List[models.ContentStorage]:
         """Save current content with deduplication"""
         try:
-            records = []
+            hashed = {
+                url: (content, models.ContentStorage.generate_content_hash(content))
+                for url, content in content_mapping.items()
+                if content
+            }
+            if not hashed:
+                return []
             
-            for url, content in content_mapping.items():
-                if not content:
-                    continue
-                    
-                content_hash = models.ContentStorage.generate_content_hash(content)
-                
-                # Check for duplicate content
-                existing = db.query(models.ContentStorage).filter(
-                    and_(
-                        models.ContentStorage.url == url,
-                        models.ContentStorage.tag == tag,
-                        models.ContentStorage.content_hash == content_hash
-                    )
-                ).first()
-                
-                if not existing:
-                    record = models.ContentStorage(
-                        url=url,
-                        tag=tag,
-                        content_hash=content_hash,
-                        content=content
-                    )
-                    db.add(record)
-                    records.append(record)
+            # 整批共用一个时间戳，不再逐行调用模型默认值
+            now = _utcnow()
+            rows = [
+                {
+                    'url': url,
+                    'tag': tag,
+                    'content_hash': content_hash,
+                    'content': content,
+                    'created_at': now
+                }
+                for url, (content, content_hash) in hashed.items()
+            ]
             
-            if records:
-                db.commit()
-                for record in records:
-                    db.refresh(record)
+            # 已存在的 (url, tag, content_hash) 由 uq_content_url_tag_hash 跳过；
+            # RETURNING 只带回真正插入的记录，无需预查询或逐条 refresh
+            records = []
+            for chunk in _chunked(rows):
+                stmt = _upsert_insert(db, models.ContentStorage).values(chunk).on_conflict_do_nothing(
+                    index_elements=['url', 'tag', 'content_hash']
+                ).returning(models.ContentStorage)
+                records.extend(db.scalars(stmt))
+            _commit(db)
             
             return records
             
@@ -429,22 +889,22 @@ class EnhancedTaskCRUD:
     ) -> models.AnalysisTask:
         """Create task and link with tenant"""
         try:
-            # Create or get tenant
-            tenant_id = tenant_data.get('tenant_id', company_name.lower().replace(' ', '_'))
-            tenant, _ = TenantCRUD.get_or_create_tenant(db, tenant_id, tenant_data)
-            
-            # Create task
-            task = models.AnalysisTask(
-                company_name=company_name,
-                task_type="analysis",
-                config=config or {},
-                status="queued",
-                progress=0,
-                message="Task queued"
-            )
-            db.add(task)
-            db.commit()
-            db.refresh(task)
+            # Tenant upsert and task insert share one transaction
+            with unit_of_work(db, keep_loaded=True):
+                # Create or get tenant
+                tenant_id = tenant_data.get('tenant_id', company_name.lower().replace(' ', '_'))
+                tenant, _ = TenantCRUD.get_or_create_tenant(db, tenant_id, tenant_data)
+                
+                # Create task
+                task = models.AnalysisTask(
+                    company_name=company_name,
+                    task_type="analysis",
+                    config=config or {},
+                    status="queued",
+                    progress=0,
+                    message="Task queued"
+                )
+                db.add(task)
             
             return task
             
@@ -453,6 +913,14 @@ class EnhancedTaskCRUD:
             logger.error(f"Error creating task with tenant: {e}")
             raise
     
+    @staticmethod
+    def list_competitors_for_task(db: Session, task_id: str) -> List[CompetitorRecordRow]:
+        """List a task's competitor records as read-only row projections"""
+        return [
+            CompetitorRecordRow(*row)
+            for row in db.execute(_LIST_TASK_COMPETITORS, {'task_id': task_id})
+        ]
+    
     @staticmethod
     def save_competitors_with_mapping(
         db: Session,
@@ -460,33 +928,33 @@ class EnhancedTaskCRUD:
         tenant_id: str,
         competitors: List[dict]
     ) -> Tuple[List[models.CompetitorRecord], List[models.TenantCompetitor]]:
-        """Save competitors and create mappings"""
+        """Save competitors and create mappings
+
+        Returned records are committed but not refreshed (ids are generated client-side).
+        """
         try:
-            # Save competitor records (backward compatibility)
-            competitor_records = []
-            for comp_data in competitors:
-                record = models.CompetitorRecord(
-                    task_id=task_id,
-                    domain=comp_data.get("id", comp_data.get("domain", "unknown")),
-                    display_name=comp_data.get("display_name", "Unknown"),
-                    primary_url=comp_data.get("primary_url", ""),
-                    brief_description=comp_data.get("brief_description", ""),
-                    demographics=comp_data.get("demographics", ""),
-                    confidence=comp_data.get("confidence", 0.5),
-                    source=comp_data.get("source", "search"),
-                    extra_data=comp_data.get("metadata", comp_data.get("extra_data", {}))
-                )
-                db.add(record)
-                competitor_records.append(record)
+            # Save competitor records (backward compatibility) in one bulk INSERT
+            rows = [
+                {
+                    "domain": comp_data.get("id", comp_data.get("domain", "unknown")),
+                    "display_name": comp_data.get("display_name", "Unknown"),
+                    "primary_url": comp_data.get("primary_url", ""),
+                    "brief_description": comp_data.get("brief_description", ""),
+                    "demographics": comp_data.get("demographics", ""),
+                    "confidence": comp_data.get("confidence", 0.5),
+                    "source": comp_data.get("source", "search"),
+                    "extra_data": comp_data.get("metadata", comp_data.get("extra_data", {}))
+                }
+                for comp_data in competitors
+            ]
+            competitor_records = models.bulk_save_competitors(db, task_id, rows)
             
-            # Create tenant-competitor mappings
-            tenant_competitor_links = TenantCompetitorCRUD.link_tenant_competitors(
+            # Create tenant-competitor mappings in the same transaction
+            tenant_competitor_links = TenantCompetitorCRUD._link_tenant_competitors(
                 db, tenant_id, competitors, task_id
             )
             
-            db.commit()
-            for record in competitor_records:
-                db.refresh(record)
+            _commit(db)
             
             return competitor_records, tenant_competitor_links
             
@@ -495,70 +963,108 @@ class EnhancedTaskCRUD:
             logger.error(f"Error saving competitors with mapping: {e}")
             raise
 
-class MonitorCRUD:
-    """Monitor CRUD operations"""
+# URL helpers are pure functions of their input and the same monitor /
+# competitor URLs recur across users, so memoize them at module level.
 
-    @staticmethod
-    def _ensure_str(value: Optional[str]) -> str:
-        return (value or "").strip()
+# 单次匹配拆出 host/path/query/fragment，省去 urlparse 的 ParseResult 分配
+_URL_RE = re.compile(
+    r'^https?://(?P<host>[^/?#]*)(?P<path>[^?#]*)(?:\?(?P<query>[^#]*))?(?:#(?P<fragment>.*))?$',
+    re.DOTALL
+)
+# urlparse 会特殊处理的字符（路径参数、IPv6、控制字符），遇到时交给 urlparse
+_URL_SLOW_PATH_CHARS = frozenset(';[]\t\r\n')
 
-    @classmethod
-    def normalize_url(cls, url: Optional[str]) -> str:
-        """Return a normalized, scheme-less URL for consistent storage."""
-        cleaned = cls._ensure_str(url)
-        if not cleaned:
-            return ""
+def _split_url(candidate: str) -> Tuple[str, str, str, str]:
+    """Return (netloc, path, query, fragment) for an http(s) URL"""
+    match = None
+    if _URL_SLOW_PATH_CHARS.isdisjoint(candidate):
+        match = _URL_RE.match(candidate)
+    if match:
+        return (
+            match.group('host'),
+            match.group('path'),
+            match.group('query') or "",
+            match.group('fragment') or "",
+        )
+    parsed = urlparse(candidate)
+    return parsed.netloc, parsed.path, parsed.query, parsed.fragment
 
-        candidate = cleaned if cleaned.startswith(("http://", "https://")) else f"https://{cleaned}"
-        try:
-            parsed = urlparse(candidate)
-        except Exception:
-            return cleaned.lower()
+@lru_cache(maxsize=8192)
+def _normalize_url(url: str) -> str:
+    cleaned = url.strip()
+    if not cleaned:
+        return ""
 
-        host = (parsed.netloc or "").lower()
-        path = parsed.path.rstrip("/") if parsed.path else ""
+    candidate = cleaned if cleaned.startswith(("http://", "https://")) else f"https://{cleaned}"
+    try:
+        netloc, raw_path, query, fragment = _split_url(candidate)
+    except Exception:
+        return cleaned.lower()
 
-        if not host:
-            # Handle inputs that are not valid URLs (e.g., company names)
-            return parsed.path.strip().lower()
+    host = (netloc or "").lower()
+    path = raw_path.rstrip("/") if raw_path else ""
 
-        normalized = host
-        if path and path not in ("", "/"):
-            normalized = f"{normalized}{path}"
+    if not host:
+        # Handle inputs that are not valid URLs (e.g., company names)
+        return raw_path.strip().lower()
 
-        if parsed.query:
-            normalized = f"{normalized}?{parsed.query}"
+    normalized = host
+    if path and path not in ("", "/"):
+        normalized = f"{normalized}{path}"
 
-        if parsed.fragment:
-            normalized = f"{normalized}#{parsed.fragment}"
+    if query:
+        normalized = f"{normalized}?{query}"
 
-        return normalized
+    if fragment:
+        normalized = f"{normalized}#{fragment}"
 
-    @classmethod
-    def canonical_url(cls, url: Optional[str]) -> str:
+    return normalized
+
+@lru_cache(maxsize=8192)
+def _canonical_url(url: str) -> str:
+    normalized = _normalize_url(url)
+    target = normalized or url.strip()
+    if not target:
+        return ""
+    if target.startswith(("http://", "https://")):
+        return target
+    return f"https://{target}"
+
+@lru_cache(maxsize=8192)
+def _display_domain(url: str) -> str:
+    candidate = _canonical_url(url)
+    if not candidate:
+        return ""
+    try:
+        parsed = urlparse(candidate)
+        host = (parsed.hostname or "").lower()
+        if host:
+            return host.replace("www.", "")
+    except Exception:
+        pass
+    return candidate.replace("http://", "").replace("https://", "")
+
+class MonitorCRUD:
+    """Monitor CRUD operations"""
+
+    @staticmethod
+    def _ensure_str(value: Optional[str]) -> str:
+        return (value or "").strip()
+
+    @staticmethod
+    def normalize_url(url: Optional[str]) -> str:
+        """Return a normalized, scheme-less URL for consistent storage."""
+        return _normalize_url(url or "")
+
+    @staticmethod
+    def canonical_url(url: Optional[str]) -> str:
         """Ensure the URL includes a scheme for display or linking."""
-        normalized = cls.normalize_url(url)
-        target = normalized or cls._ensure_str(url)
-        if not target:
-            return ""
-        if target.startswith(("http://", "https://")):
-            return target
-        return f"https://{target}"
+        return _canonical_url(url or "")
 
-    @classmethod
-    def display_domain(cls, url: Optional[str]) -> str:
+    @staticmethod
+    def display_domain(url: Optional[str]) -> str:
         """Return a hostname suitable for dropdown labels."""
-        candidate = cls.canonical_url(url)
-        if not candidate:
-            return ""
-        try:
-            parsed = urlparse(candidate)
-            host = (parsed.hostname or "").lower()
-            if host:
-                return host.replace("www.", "")
-        except Exception:
-            pass
-        return candidate.replace("http://", "").replace("https://", "")
+        return _display_domain(url or "")
 
     @staticmethod
     def clean_name(name: Optional[str]) -> str:
@@ -592,10 +1098,23 @@ class MonitorCRUD:
         return "Untitled monitor"
 
     @staticmethod
-    def list_monitors(db: Session, user_id: str, include_archived: bool = False) -> List[models.Monitor]:
+    def list_monitors(
+        db: Session,
+        user_id: str,
+        include_archived: bool = False,
+        lightweight: bool = False
+    ) -> List[models.Monitor]:
+        """列出用户的monitor；lightweight=True 时不加载跟踪的竞争对手"""
+        if lightweight:
+            # 仅列表展示：跳过 tracked_competitors -> competitor 两次 selectin 查询
+            tracked_option = noload(models.Monitor.tracked_competitors)
+        else:
+            tracked_option = selectinload(models.Monitor.tracked_competitors).selectinload(models.MonitorCompetitor.competitor)
+
         query = db.query(models.Monitor).options(
             selectinload(models.Monitor.latest_task),
-            selectinload(models.Monitor.tracked_competitors).selectinload(models.MonitorCompetitor.competitor),
+            tracked_option,
+            raiseload('*'),  # 其余关系禁止懒加载，避免 N+1
         ).filter(
             models.Monitor.user_id == user_id  # 确保过滤user_id
         )
@@ -608,13 +1127,9 @@ class MonitorCRUD:
 
     @staticmethod
     def get_monitor(db: Session, monitor_id: str, user_id: str) -> Optional[models.Monitor]:
-        return db.query(models.Monitor).options(
-            selectinload(models.Monitor.latest_task),
-            selectinload(models.Monitor.tracked_competitors).selectinload(models.MonitorCompetitor.competitor),
-        ).filter(
-            models.Monitor.id == monitor_id,
-            models.Monitor.user_id == user_id  # 确保用户只能访问自己的monitor
-        ).first()
+        return db.execute(
+            _GET_MONITOR, {'monitor_id': monitor_id, 'user_id': user_id}
+        ).scalars().first()
 
     @staticmethod
     def create_monitor(
@@ -638,8 +1153,7 @@ class MonitorCRUD:
             is_active=True
         )
         db.add(monitor)
-        db.commit()
-        db.refresh(monitor)
+        _commit(db, keep_loaded=True)
         return monitor
 
     @staticmethod
@@ -648,22 +1162,22 @@ class MonitorCRUD:
         user_id: str,
         url: str,
         name: Optional[str] = None,
-        tenant_id: Optional[str] = None
+        tenant_id: Optional[str] = None,
+        reactivate: bool = False
     ) -> models.Monitor:
+        """按规范化URL或原始URL查找用户的monitor，找不到则创建
+
+        reactivate=True 时恢复已归档的monitor；默认保持用户的归档状态。
+        """
         normalized_url = MonitorCRUD.normalize_url(url)
         raw_url = MonitorCRUD._ensure_str(url)
         candidate_urls = [value for value in {normalized_url, raw_url} if value]
 
-        query = db.query(models.Monitor).filter(
-            models.Monitor.user_id == user_id  # 确保过滤user_id
-        )
-
-        if candidate_urls:
-            query = query.filter(models.Monitor.url.in_(candidate_urls))
-        else:
-            query = query.filter(models.Monitor.url == "")
-
-        monitor = query.first()
+        # 确保过滤user_id；没有候选URL时按空URL查找
+        monitor = db.execute(
+            _GET_MONITOR_BY_USER_URLS,
+            {'user_id': user_id, 'urls': candidate_urls or [""]}
+        ).scalars().first()
         
         if monitor:
             updated = False
@@ -686,47 +1200,117 @@ class MonitorCRUD:
                 monitor.tenant_id = tenant_id
                 updated = True
 
-            if not monitor.is_active or monitor.archived_at is not None:
+            if reactivate and (not monitor.is_active or monitor.archived_at is not None):
                 monitor.is_active = True
                 monitor.archived_at = None
                 updated = True
 
             if updated:
-                monitor.updated_at = datetime.utcnow()
-                db.commit()
-                db.refresh(monitor)
+                monitor.updated_at = _utcnow()
+                _commit(db, keep_loaded=True)
             return monitor
+
+        if db.get_bind().dialect.name == "postgresql":
+            # 并发创建同一URL时由 ON CONFLICT (user_id, url) 兜底，不会撞唯一约束
+            return MonitorCRUD._upsert_monitor(
+                db, user_id, normalized_url or raw_url, name=name, tenant_id=tenant_id,
+                reactivate=reactivate
+            )
             
         return MonitorCRUD.create_monitor(db, user_id, url, name=name, tenant_id=tenant_id)
 
+    @staticmethod
+    def _upsert_monitor(
+        db: Session,
+        user_id: str,
+        stored_url: str,
+        name: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        reactivate: bool = False
+    ) -> models.Monitor:
+        """INSERT ... ON CONFLICT (user_id, url) DO UPDATE ... RETURNING (PostgreSQL)
+
+        冲突时不改动归档状态，除非 reactivate=True。
+        """
+        cleaned_name = MonitorCRUD.clean_name(name)
+        current = models.Monitor.__table__.c
+
+        stmt = pg_insert(models.Monitor).values(
+            user_id=user_id,
+            url=stored_url,
+            name=cleaned_name or MonitorCRUD.derive_display_name(stored_url),
+            tenant_id=tenant_id,
+            is_active=True,
+            archived_at=None,
+            updated_at=_utcnow()
+        )
+        if cleaned_name:
+            name_value = stmt.excluded.name
+        else:
+            # 未提供名称时保留已有名称，只有为空才用推导出的名称
+            name_value = case(
+                (func.trim(func.coalesce(current.name, '')) == '', stmt.excluded.name),
+                else_=current.name
+            )
+        updates = {
+            'name': name_value,
+            'tenant_id': func.coalesce(stmt.excluded.tenant_id, current.tenant_id),
+            'updated_at': stmt.excluded.updated_at
+        }
+        if reactivate:
+            updates['is_active'] = True
+            updates['archived_at'] = None
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'url'], set_=updates
+        ).returning(models.Monitor)
+
+        monitor = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+        _commit(db)
+        return monitor
+
     @staticmethod
     def update_monitor_name(db: Session, monitor: models.Monitor, new_name: str) -> models.Monitor:
         cleaned = MonitorCRUD.clean_name(new_name)
         monitor.name = cleaned or MonitorCRUD.derive_display_name(monitor.url, new_name)
-        monitor.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(monitor)
+        monitor.updated_at = _utcnow()
+        _commit(db, keep_loaded=True)
         return monitor
 
     @staticmethod
     def deactivate_monitor(db: Session, monitor: models.Monitor) -> None:
+        now = _utcnow()
         monitor.is_active = False
-        monitor.archived_at = datetime.utcnow()
-        monitor.updated_at = datetime.utcnow()
-        db.commit()
+        monitor.archived_at = now
+        monitor.updated_at = now
+        _commit(db, keep_loaded=True)
 
     @staticmethod
     def set_latest_task(db: Session, monitor: models.Monitor, task_id: str) -> None:
+        now = _utcnow()
         monitor.latest_task_id = task_id
-        monitor.last_run_at = datetime.utcnow()
-        monitor.updated_at = datetime.utcnow()
-        db.commit()
+        monitor.last_run_at = now
+        monitor.updated_at = now
+        # latest_task 随外键变化需重新加载：照常过期，由读路径的 selectinload 重新带回
+        _commit(db)
 
     @staticmethod
     def attach_tenant(db: Session, monitor: models.Monitor, tenant: models.Tenant) -> None:
         monitor.tenant_id = tenant.id
-        monitor.updated_at = datetime.utcnow()
-        db.commit()
+        monitor.updated_at = _utcnow()
+        _commit(db, keep_loaded=True)
+
+class UserCRUD:
+    """用户查询CRUD（认证热路径，走预构建语句）"""
+
+    @staticmethod
+    def get_by_id(db: Session, user_id: str) -> Optional[models.User]:
+        return db.execute(_GET_USER_BY_ID, {'user_id': user_id}).scalars().first()
+
+    @staticmethod
+    def get_by_email(db: Session, email: str) -> Optional[models.User]:
+        return db.execute(_GET_USER_BY_EMAIL, {'email': email}).scalars().first()
+
+user_crud = UserCRUD()
 
 class UserPreferencesCRUD:
     """用户偏好设置CRUD"""
@@ -734,9 +1318,7 @@ class UserPreferencesCRUD:
     @staticmethod
     def get_or_create_preferences(db: Session, user_id: str) -> models.UserPreferences:
         """获取或创建用户偏好设置"""
-        pref = db.query(models.UserPreferences).filter(
-            models.UserPreferences.user_id == user_id
-        ).first()
+        pref = db.execute(_GET_PREFERENCES, {'user_id': user_id}).scalars().first()
         
         if not pref:
             pref = models.UserPreferences(
@@ -746,8 +1328,7 @@ class UserPreferencesCRUD:
                 email_alerts_enabled=False
             )
             db.add(pref)
-            db.commit()
-            db.refresh(pref)
+            _commit(db, keep_loaded=True)
         
         return pref
     
@@ -764,30 +1345,40 @@ class UserPreferencesCRUD:
             if hasattr(pref, key):
                 setattr(pref, key, value)
         
-        pref.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(pref)
+        pref.updated_at = _utcnow()
+        _commit(db, keep_loaded=True)
         return pref
     
     @staticmethod
     def get_users_for_email_alerts(
         db: Session, 
         threshold: float = None
-    ) -> List[Tuple[models.User, models.UserPreferences]]:
-        """获取需要发送邮件提醒的用户"""
-        query = db.query(models.User, models.UserPreferences).join(
-            models.UserPreferences
-        ).filter(
-            models.UserPreferences.email_alerts_enabled == True,
-            models.User.is_active == True
+    ) -> Iterator[Any]:
+        """获取需要发送邮件提醒的用户
+
+        只选取发送邮件所需的列并流式返回行 (user_id, email, name, email_frequency,
+        email_alert_threshold, last_email_sent)，不构造完整的ORM对象。
+        """
+        stmt = select(
+            models.User.id.label('user_id'),
+            models.User.email,
+            models.User.name,
+            models.UserPreferences.email_frequency,
+            models.UserPreferences.email_alert_threshold,
+            models.UserPreferences.last_email_sent
+        ).join(
+            models.UserPreferences, models.UserPreferences.user_id == models.User.id
+        ).where(
+            models.UserPreferences.email_alerts_enabled.is_(True),
+            models.User.is_active.is_(True)
         )
         
         if threshold is not None:
-            query = query.filter(
+            stmt = stmt.where(
                 models.UserPreferences.email_alert_threshold <= threshold
             )
         
-        return query.all()
+        yield from db.execute(stmt.execution_options(yield_per=1000))
 
 # 添加实例
 user_preferences_crud = UserPreferencesCRUD()
@@ -802,14 +1393,14 @@ class MonitorCompetitorCRUD:
         competitor_id: str,
         tracked: bool = True
     ) -> models.MonitorCompetitor:
-        record = db.query(models.MonitorCompetitor).filter(
-            models.MonitorCompetitor.monitor_id == monitor_id,
-            models.MonitorCompetitor.competitor_id == competitor_id
-        ).first()
+        record = db.execute(
+            _GET_MONITOR_COMPETITOR,
+            {'monitor_id': monitor_id, 'competitor_id': competitor_id}
+        ).scalar_one_or_none()
 
         if record:
             record.tracked = tracked
-            record.updated_at = datetime.utcnow()
+            record.updated_at = _utcnow()
         else:
             record = models.MonitorCompetitor(
                 monitor_id=monitor_id,
@@ -818,27 +1409,23 @@ class MonitorCompetitorCRUD:
             )
             db.add(record)
 
-        db.commit()
-        db.refresh(record)
+        _commit(db, keep_loaded=True)
         return record
 
     @staticmethod
     def remove_tracking(db: Session, monitor_id: str, competitor_id: str) -> None:
-        record = db.query(models.MonitorCompetitor).filter(
-            models.MonitorCompetitor.monitor_id == monitor_id,
-            models.MonitorCompetitor.competitor_id == competitor_id
-        ).first()
+        record = db.execute(
+            _GET_MONITOR_COMPETITOR, {'monitor_id': monitor_id, 'competitor_id': competitor_id}
+        ).scalars().first()
         if record:
             db.delete(record)
-            db.commit()
+            _commit(db)
 
     @staticmethod
     def get_tracked_competitor_ids(db: Session, monitor_id: str) -> List[str]:
-        records = db.query(models.MonitorCompetitor).filter(
-            models.MonitorCompetitor.monitor_id == monitor_id,
-            models.MonitorCompetitor.tracked.is_(True)
-        ).all()
-        return [record.competitor_id for record in records]
+        return list(db.execute(
+            _GET_TRACKED_COMPETITOR_IDS, {'monitor_id': monitor_id}
+        ).scalars())
 
 
 class ChangeReadCRUD:
@@ -846,52 +1433,101 @@ class ChangeReadCRUD:
 
     @staticmethod
     def mark_read(db: Session, user_id: str, change_id: str) -> models.ChangeReadReceipt:
-        record = db.query(models.ChangeReadReceipt).filter(
-            models.ChangeReadReceipt.user_id == user_id,
-            models.ChangeReadReceipt.change_id == change_id
-        ).first()
+        record = db.execute(
+            _GET_READ_RECEIPT, {'user_id': user_id, 'change_id': change_id}
+        ).scalars().first()
 
         if record:
-            record.read_at = datetime.utcnow()
+            record.read_at = _utcnow()
         else:
             record = models.ChangeReadReceipt(
                 user_id=user_id,
                 change_id=change_id,
-                read_at=datetime.utcnow()
+                read_at=_utcnow()
             )
             db.add(record)
 
-        db.commit()
-        db.refresh(record)
+        _commit(db, keep_loaded=True)
+        _read_ids_l1.pop(user_id)
         return record
 
     @staticmethod
     def bulk_mark_read(db: Session, user_id: str, change_ids: List[str]) -> int:
-        count = 0
-        for change_id in change_ids:
-            ChangeReadCRUD.mark_read(db, user_id, change_id)
-            count += 1
-        return count
+        if not change_ids:
+            return 0
+
+        # 同一条 ON CONFLICT 语句不能两次命中同一行，先去重（保持顺序）
+        unique_ids = list(dict.fromkeys(change_ids))
+        now = _utcnow()
+        try:
+            for chunk in _chunked(unique_ids):
+                stmt = _upsert_insert(db, models.ChangeReadReceipt).values([
+                    {"user_id": user_id, "change_id": change_id, "read_at": now}
+                    for change_id in chunk
+                ])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["user_id", "change_id"],
+                    set_={"read_at": stmt.excluded.read_at}
+                )
+                db.execute(stmt)
+            _commit(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error bulk marking changes read: {e}")
+            raise
+        finally:
+            _read_ids_l1.pop(user_id)
+        return len(change_ids)
 
     @staticmethod
     def fetch_read_ids(db: Session, user_id: str, change_ids: List[str]) -> Dict[str, datetime]:
         if not change_ids:
             return {}
-        records = db.query(models.ChangeReadReceipt).filter(
-            models.ChangeReadReceipt.user_id == user_id,
-            models.ChangeReadReceipt.change_id.in_(change_ids)
-        ).all()
-        return {record.change_id: record.read_at for record in records}
+        
+        known = _read_ids_l1.get(user_id) or {}
+        missing = [change_id for change_id in change_ids if change_id not in known]
+        if missing:
+            # 新字典替换旧条目，不在共享对象上原地修改；未读的 id 不入缓存，下次仍回库确认
+            found = {}
+            # 只取两列，不构造 ORM 对象
+            stmt = _GET_READ_AT_PG if db.get_bind().dialect.name == "postgresql" else _GET_READ_AT
+            for chunk in _chunked(missing):
+                rows = db.execute(stmt, {'user_id': user_id, 'change_ids': chunk})
+                found.update({change_id: read_at for change_id, read_at in rows if read_at is not None})
+            if found:
+                known = {**known, **found}
+                _read_ids_l1.set(user_id, known)
+        
+        return {
+            change_id: known[change_id]
+            for change_id in change_ids
+            if change_id in known
+        }
 
 
 class ArchiveCRUD:
     """Archive CRUD"""
 
     @staticmethod
-    def list_archives(db: Session, user_id: str) -> List[models.AnalysisArchive]:
-        return db.query(models.AnalysisArchive).filter(
-            models.AnalysisArchive.user_id == user_id
-        ).order_by(models.AnalysisArchive.created_at.desc()).all()
+    def list_archives(
+        db: Session,
+        user_id: str,
+        limit: int = 50,
+        before: Optional[datetime] = None,
+        before_id: Optional[str] = None
+    ) -> List[models.AnalysisArchive]:
+        """按 (created_at, id) 倒序分页；(before, before_id) 为上一页最后一条的键（keyset 游标）
+
+        created_at 由数据库 now() 写入，同一事务内的行取值相同，必须带上 id 才能区分页边界。
+        """
+        archive = models.AnalysisArchive
+        stmt = select(archive).where(archive.user_id == user_id)
+        if before is not None and before_id is not None:
+            stmt = stmt.where(tuple_(archive.created_at, archive.id) < tuple_(before, before_id))
+        elif before is not None:
+            stmt = stmt.where(archive.created_at < before)
+        stmt = stmt.order_by(archive.created_at.desc(), archive.id.desc()).limit(limit)
+        return db.execute(stmt).scalars().all()
 
     @staticmethod
     def create_archive(
@@ -918,8 +1554,7 @@ class ArchiveCRUD:
             search_text=search_text
         )
         db.add(archive)
-        db.commit()
-        db.refresh(archive)
+        _commit(db, keep_loaded=True)
         return archive
 
 # Create CRUD instances
@@ -9,77 +9,129 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-from sqlalchemy import text
-from backend.database.connection import engine, get_db_session
-from backend.database.models import UserPreferences, User
+from sqlalchemy import text, insert
+from backend.database.connection import engine
+from backend.database.models import UserPreferences, generate_uuid
+from datetime import datetime
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 与 UserPreferences 模型默认值保持一致
+_DEFAULT_PREFERENCES = {
+    'change_view_threshold': 0.0,
+    'email_alert_threshold': 7.0,
+    'email_alerts_enabled': False,
+    'email_frequency': 'daily',
+    'email_time': '09:00',
+    'default_page_size': 10,
+    'theme': 'system',
+}
+
+# 客户端回填时每批 executemany 的行数
+_BACKFILL_BATCH_SIZE = 1000
+
+def _backfill_default_preferences(conn) -> int:
+    """为还没有偏好设置的用户补齐默认值，返回插入的行数"""
+    if conn.dialect.name == "postgresql":
+        # 服务端集合操作：一条 INSERT ... SELECT，不往返逐个用户
+        result = conn.execute(text("""
+            INSERT INTO user_preferences (
+                id, user_id, change_view_threshold, email_alert_threshold,
+                email_alerts_enabled, email_frequency, email_time,
+                default_page_size, theme, created_at, updated_at
+            )
+            SELECT gen_random_uuid()::text, u.id, :change_view_threshold, :email_alert_threshold,
+                   :email_alerts_enabled, :email_frequency, :email_time,
+                   :default_page_size, :theme, now(), now()
+            FROM users u
+            LEFT JOIN user_preferences p ON p.user_id = u.id
+            WHERE p.user_id IS NULL
+        """), _DEFAULT_PREFERENCES)
+        return result.rowcount
+
+    # 其他数据库：按 id 键集分页读取缺失的用户，每页一次 executemany，内存只占一页；
+    # 不边遍历游标边插入同一张表
+    page_query = text("""
+        SELECT u.id FROM users u
+        WHERE u.id > :after
+          AND NOT EXISTS (SELECT 1 FROM user_preferences p WHERE p.user_id = u.id)
+        ORDER BY u.id
+        LIMIT :limit
+    """)
+    now = datetime.utcnow()
+    statement = insert(UserPreferences.__table__)
+    created = 0
+    after = ""
+    while True:
+        page = conn.execute(page_query, {'after': after, 'limit': _BACKFILL_BATCH_SIZE}).scalars().all()
+        if not page:
+            break
+        conn.execute(statement, [
+            {'id': generate_uuid(), 'user_id': user_id, **_DEFAULT_PREFERENCES, 'created_at': now, 'updated_at': now}
+            for user_id in page
+        ])
+        created += len(page)
+        after = page[-1]
+    return created
+
+# CONCURRENTLY 不能在事务（或多语句字符串）中执行，只能逐条在自动提交连接上跑
+_CHANGE_DETECTION_INDEXES = (
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_change_is_first_true
+       ON change_detections(detected_at DESC) WHERE is_first""",
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_change_monitor
+       ON change_detections(monitor_id)""",
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_change_monitor_detected
+       ON change_detections(monitor_id, detected_at DESC) INCLUDE (threat_level, is_first)""",
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_change_detection_threat
+       ON change_detections(threat_level, detected_at DESC)""",
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_change_detected_brin
+       ON change_detections USING brin (detected_at)""",
+    # 被上面的部分/覆盖索引取代
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_change_is_first",
+    "DROP INDEX CONCURRENTLY IF EXISTS ix_change_detections_is_first",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_change_detection_query",
+)
+
+def _create_change_detection_indexes():
+    """并发创建 change_detections 索引：生产写入不被 ShareLock 阻塞"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as index_conn:
+        # 按月分区后父表不支持 CONCURRENTLY；普通 CREATE INDEX 会级联到各分区，
+        # 每个分区只短暂持锁，DROP 同样级联删除分区上的索引
+        partitioned = index_conn.execute(text("""
+            SELECT 1 FROM pg_partitioned_table
+            WHERE partrelid = to_regclass('change_detections')
+        """)).first() is not None
+        for index_sql in _CHANGE_DETECTION_INDEXES:
+            if partitioned:
+                index_sql = index_sql.replace(" CONCURRENTLY", "")
+            index_conn.execute(text(index_sql))
+
 def migrate_change_enhancements():
     """添加Change Radar增强功能"""
     try:
         with engine.connect() as conn:
-            # 1. 添加is_first字段到change_detections表
-            logger.info("检查change_detections表的is_first字段...")
-            result = conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name='change_detections' AND column_name='is_first'
-            """))
-            
-            if not result.fetchone():
-                logger.info("添加is_first字段到change_detections表...")
-                conn.execute(text("""
-                    ALTER TABLE change_detections 
-                    ADD COLUMN is_first BOOLEAN DEFAULT TRUE
-                """))
-                
-                # 创建索引
-                conn.execute(text("""
-                    CREATE INDEX IF NOT EXISTS idx_change_is_first 
-                    ON change_detections(is_first)
-                """))
-            
-            # 2. 添加monitor_id字段到change_detections表
-            logger.info("检查change_detections表的monitor_id字段...")
-            result = conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name='change_detections' AND column_name='monitor_id'
-            """))
-            
-            if not result.fetchone():
-                logger.info("添加monitor_id字段到change_detections表...")
-                conn.execute(text("""
-                    ALTER TABLE change_detections 
-                    ADD COLUMN monitor_id VARCHAR
-                """))
-                
-                # 添加外键约束
-                conn.execute(text("""
-                    ALTER TABLE change_detections 
-                    ADD CONSTRAINT fk_change_monitor 
-                    FOREIGN KEY (monitor_id) REFERENCES monitors(id)
-                """))
-                
-                # 创建索引
-                conn.execute(text("""
-                    CREATE INDEX IF NOT EXISTS idx_change_monitor 
-                    ON change_detections(monitor_id)
-                """))
-                
-                # 创建复合索引
-                conn.execute(text("""
-                    CREATE INDEX IF NOT EXISTS idx_change_detection_query 
-                    ON change_detections(monitor_id, detected_at DESC, is_first)
-                """))
-                
-                conn.execute(text("""
-                    CREATE INDEX IF NOT EXISTS idx_change_detection_threat 
-                    ON change_detections(threat_level, detected_at DESC)
-                """))
+            # 1/2. 一条 ALTER 同时添加 is_first、monitor_id 和外键：只拿一次排他锁
+            logger.info("为change_detections表添加is_first/monitor_id字段...")
+            alter_clauses = [
+                "ADD COLUMN IF NOT EXISTS is_first BOOLEAN DEFAULT TRUE",
+                "ADD COLUMN IF NOT EXISTS monitor_id VARCHAR",
+            ]
+            # ADD CONSTRAINT 没有 IF NOT EXISTS，仍需确认外键是否已存在；
+            # 直接查 pg_constraint（按 conrelid 走索引），不经过 information_schema 视图
+            has_fk = conn.execute(text("""
+                SELECT 1
+                FROM pg_constraint
+                WHERE conrelid = to_regclass('change_detections')
+                  AND conname = 'fk_change_monitor'
+                LIMIT 1
+            """)).first()
+            if not has_fk:
+                alter_clauses.append(
+                    "ADD CONSTRAINT fk_change_monitor FOREIGN KEY (monitor_id) REFERENCES monitors(id) ON DELETE SET NULL"
+                )
+            conn.execute(text("ALTER TABLE change_detections " + ", ".join(alter_clauses)))
             
             # 3. 创建user_preferences表
             logger.info("创建user_preferences表...")
@@ -107,27 +159,15 @@ def migrate_change_enhancements():
             """))
             
             conn.commit()
+            
+            # change_detections 索引在事务外并发创建，不阻塞写入
+            _create_change_detection_indexes()
             logger.info("✅ 数据库迁移完成")
             
             # 4. 为现有用户创建默认偏好设置
-            with get_db_session() as db:
-                users = db.query(User).all()
-                for user in users:
-                    existing_pref = db.query(UserPreferences).filter(
-                        UserPreferences.user_id == user.id
-                    ).first()
-                    
-                    if not existing_pref:
-                        pref = UserPreferences(
-                            user_id=user.id,
-                            change_view_threshold=0.0,
-                            email_alert_threshold=7.0,
-                            email_alerts_enabled=False
-                        )
-                        db.add(pref)
-                        logger.info(f"为用户 {user.email} 创建默认偏好设置")
-                
-                db.commit()
+            created = _backfill_default_preferences(conn)
+            conn.commit()
+            logger.info(f"为 {created} 个用户创建默认偏好设置")
             
             return True
             
@@ -12,25 +12,74 @@ branch_labels = None
 depends_on = None
 
 
-def _ensure_column(inspector, table_name: str, column_name: str) -> bool:
-    columns = {col["name"] for col in inspector.get_columns(table_name)}
-    return column_name in columns
-
-
-def _ensure_index(inspector, table_name: str, index_name: str) -> bool:
-    indexes = {index["name"] for index in inspector.get_indexes(table_name)}
-    return index_name in indexes
-
-
-def _ensure_fk(inspector, table_name: str, fk_name: str) -> bool:
-    fks = {fk["name"] for fk in inspector.get_foreign_keys(table_name)}
-    return fk_name in fks
+# Tables whose existence this revision checks
+_TABLES = (
+    "monitors",
+    "monitor_competitors",
+    "change_read_receipts",
+    "analysis_archives",
+    "analysis_tasks",
+    "users",
+)
+
+
+def _existing_tables(bind) -> set:
+    """Which of ``_TABLES`` exist, via one targeted pg_class lookup on PostgreSQL"""
+    if bind.dialect.name != "postgresql":
+        return set(sa.inspect(bind).get_table_names()) & set(_TABLES)
+    rows = bind.execute(
+        sa.text(
+            """
+            SELECT c.relname
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema()
+              AND c.relkind IN ('r', 'p')
+              AND c.relname = ANY(:names)
+            """
+        ),
+        {"names": list(_TABLES)},
+    )
+    return {row[0] for row in rows}
+
+
+def _schema_snapshot(bind, table_name: str):
+    """Names of a table's columns, indexes and foreign keys, as sets
+
+    On PostgreSQL this is a single pg_catalog round-trip instead of three
+    information_schema reflections.
+    """
+    if bind.dialect.name != "postgresql":
+        inspector = sa.inspect(bind)
+        columns = {col["name"] for col in inspector.get_columns(table_name)}
+        indexes = {index["name"] for index in inspector.get_indexes(table_name)}
+        fks = {fk["name"] for fk in inspector.get_foreign_keys(table_name)}
+        return columns, indexes, fks
+
+    rows = bind.execute(
+        sa.text(
+            """
+            SELECT 'column', attname FROM pg_attribute
+            WHERE attrelid = to_regclass(:table_name) AND attnum > 0 AND NOT attisdropped
+            UNION ALL
+            SELECT 'index', c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = to_regclass(:table_name)
+            UNION ALL
+            SELECT 'fk', conname FROM pg_constraint
+            WHERE conrelid = to_regclass(:table_name) AND contype = 'f'
+            """
+        ),
+        {"table_name": table_name},
+    )
+    snapshot = {"column": set(), "index": set(), "fk": set()}
+    for kind, name in rows:
+        snapshot[kind].add(name)
+    return snapshot["column"], snapshot["index"], snapshot["fk"]
 
 
 def upgrade() -> None:
     bind = op.get_bind()
-    inspector = sa.inspect(bind)
-    tables = set(inspector.get_table_names())
+    tables = _existing_tables(bind)
 
     if "monitors" not in tables:
         op.create_table(
@@ -48,8 +97,9 @@ def upgrade() -> None:
             sa.Column("latest_task_id", sa.String(length=255), sa.ForeignKey("analysis_tasks.id", ondelete="SET NULL"), nullable=True),
         )
         op.create_unique_constraint("uq_monitor_user_url", "monitors", ["user_id", "url"])
-        op.create_index("idx_monitor_user", "monitors", ["user_id"])
-        op.create_index("idx_monitor_tenant", "monitors", ["tenant_id"])
+        # Same names as the model's column-level index=True, so no duplicates get created
+        op.create_index("ix_monitors_user_id", "monitors", ["user_id"])
+        op.create_index("ix_monitors_tenant_id", "monitors", ["tenant_id"])
         tables.add("monitors")
 
     if "monitor_competitors" not in tables:
@@ -97,22 +147,22 @@ def upgrade() -> None:
         tables.add("analysis_archives")
 
     if "analysis_tasks" in tables:
-        if not _ensure_column(inspector, "analysis_tasks", "user_id"):
-            op.add_column("analysis_tasks", sa.Column("user_id", sa.String(length=255), nullable=True))
-        if not _ensure_column(inspector, "analysis_tasks", "monitor_id"):
-            op.add_column("analysis_tasks", sa.Column("monitor_id", sa.String(length=255), nullable=True))
-        if not _ensure_column(inspector, "analysis_tasks", "latest_stage"):
-            op.add_column("analysis_tasks", sa.Column("latest_stage", sa.String(length=255), nullable=True))
+        # Reflect once; the sets are updated in place as objects are created
+        columns, indexes, fks = _schema_snapshot(bind, "analysis_tasks")
 
-        inspector = sa.inspect(bind)  # refresh schema cache
+        for column_name in ("user_id", "monitor_id", "latest_stage"):
+            if column_name not in columns:
+                op.add_column("analysis_tasks", sa.Column(column_name, sa.String(length=255), nullable=True))
+                columns.add(column_name)
 
-        if not _ensure_index(inspector, "analysis_tasks", "ix_analysis_tasks_user_id"):
+        if "ix_analysis_tasks_user_id" not in indexes:
             op.create_index("ix_analysis_tasks_user_id", "analysis_tasks", ["user_id"])
-        if not _ensure_index(inspector, "analysis_tasks", "ix_analysis_tasks_monitor_id"):
+            indexes.add("ix_analysis_tasks_user_id")
+        if "ix_analysis_tasks_monitor_id" not in indexes:
             op.create_index("ix_analysis_tasks_monitor_id", "analysis_tasks", ["monitor_id"])
+            indexes.add("ix_analysis_tasks_monitor_id")
 
-        inspector = sa.inspect(bind)
-        if "monitors" in tables and not _ensure_fk(inspector, "analysis_tasks", "fk_analysis_tasks_monitor_id"):
+        if "monitors" in tables and "fk_analysis_tasks_monitor_id" not in fks:
             op.create_foreign_key(
                 "fk_analysis_tasks_monitor_id",
                 "analysis_tasks",
@@ -121,8 +171,8 @@ def upgrade() -> None:
                 ["id"],
                 ondelete="SET NULL",
             )
-        inspector = sa.inspect(bind)
-        if "users" in tables and not _ensure_fk(inspector, "analysis_tasks", "fk_analysis_tasks_user_id"):
+            fks.add("fk_analysis_tasks_monitor_id")
+        if "users" in tables and "fk_analysis_tasks_user_id" not in fks:
             op.create_foreign_key(
                 "fk_analysis_tasks_user_id",
                 "analysis_tasks",
@@ -135,27 +185,20 @@ def upgrade() -> None:
 
 def downgrade() -> None:
     bind = op.get_bind()
-    inspector = sa.inspect(bind)
-    tables = set(inspector.get_table_names())
+    tables = _existing_tables(bind)
 
     if "analysis_tasks" in tables:
-        if _ensure_fk(inspector, "analysis_tasks", "fk_analysis_tasks_monitor_id"):
-            op.drop_constraint("fk_analysis_tasks_monitor_id", "analysis_tasks", type_="foreignkey")
-        if _ensure_fk(inspector, "analysis_tasks", "fk_analysis_tasks_user_id"):
-            op.drop_constraint("fk_analysis_tasks_user_id", "analysis_tasks", type_="foreignkey")
-
-        inspector = sa.inspect(bind)
-        if _ensure_index(inspector, "analysis_tasks", "ix_analysis_tasks_monitor_id"):
-            op.drop_index("ix_analysis_tasks_monitor_id", table_name="analysis_tasks")
-        inspector = sa.inspect(bind)
-        if _ensure_index(inspector, "analysis_tasks", "ix_analysis_tasks_user_id"):
-            op.drop_index("ix_analysis_tasks_user_id", table_name="analysis_tasks")
-
-        inspector = sa.inspect(bind)
+        columns, indexes, fks = _schema_snapshot(bind, "analysis_tasks")
+
+        for fk_name in ("fk_analysis_tasks_monitor_id", "fk_analysis_tasks_user_id"):
+            if fk_name in fks:
+                op.drop_constraint(fk_name, "analysis_tasks", type_="foreignkey")
+        for index_name in ("ix_analysis_tasks_monitor_id", "ix_analysis_tasks_user_id"):
+            if index_name in indexes:
+                op.drop_index(index_name, table_name="analysis_tasks")
         for column_name in ("latest_stage", "monitor_id", "user_id"):
-            if _ensure_column(inspector, "analysis_tasks", column_name):
+            if column_name in columns:
                 op.drop_column("analysis_tasks", column_name)
-                inspector = sa.inspect(bind)
 
     for table_name in (
         "analysis_archives",
@@ -163,6 +206,5 @@ def downgrade() -> None:
         "monitor_competitors",
         "monitors",
     ):
-        inspector = sa.inspect(bind)
-        if table_name in inspector.get_table_names():
+        if table_name in tables:
             op.drop_table(table_name)
@@ -0,0 +1,49 @@
+"""Store analysis_archives snapshots as JSONB and index search_text for full-text search"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_archive_jsonb"
+down_revision = "20251016_cache_autovacuum"
+branch_labels = None
+depends_on = None
+
+
+_JSON_COLUMNS = ("tenant_snapshot", "competitor_snapshot", "change_snapshot", "metadata_json")
+
+
+def _applies(bind) -> bool:
+    return bind.dialect.name == "postgresql" and "analysis_archives" in sa.inspect(bind).get_table_names()
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not _applies(bind):
+        return
+
+    # One ALTER rewrites the table once for all four columns
+    op.execute(
+        "ALTER TABLE analysis_archives "
+        + ", ".join(f"ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb" for column in _JSON_COLUMNS)
+    )
+    op.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_archive_search_text
+        ON analysis_archives USING GIN (to_tsvector('english', coalesce(search_text, '')))
+        """
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if not _applies(bind):
+        return
+
+    op.execute("DROP INDEX IF EXISTS idx_archive_search_text")
+    op.execute(
+        "ALTER TABLE analysis_archives "
+        + ", ".join(f"ALTER COLUMN {column} TYPE JSON USING {column}::json" for column in _JSON_COLUMNS)
+    )
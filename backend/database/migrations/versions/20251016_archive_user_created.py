@@ -0,0 +1,40 @@
+"""Index analysis_archives for keyset pagination by (user_id, created_at DESC, id DESC)"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_archive_user_created"
+down_revision = "20251016_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def _has_index(inspector, table_name: str, index_name: str) -> bool:
+    return index_name in {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "analysis_archives" not in inspector.get_table_names():
+        return
+
+    if not _has_index(inspector, "analysis_archives", "idx_archive_user_created"):
+        op.create_index(
+            "idx_archive_user_created",
+            "analysis_archives",
+            ["user_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "analysis_archives" not in inspector.get_table_names():
+        return
+
+    if _has_index(inspector, "analysis_archives", "idx_archive_user_created"):
+        op.drop_index("idx_archive_user_created", table_name="analysis_archives")
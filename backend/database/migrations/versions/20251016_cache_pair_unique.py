@@ -0,0 +1,67 @@
+"""Make (competitor_id, url) the unique lookup key of change_detection_cache"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_cache_pair_unique"
+down_revision = "20250114_api_integration"
+branch_labels = None
+depends_on = None
+
+
+def _ensure_index(inspector, table_name: str, index_name: str) -> bool:
+    indexes = {index["name"] for index in inspector.get_indexes(table_name)}
+    return index_name in indexes
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "change_detection_cache" not in inspector.get_table_names():
+        return
+
+    # Keep only the freshest row per (competitor_id, url) before enforcing uniqueness
+    op.execute(
+        """
+        DELETE FROM change_detection_cache
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY competitor_id, url
+                    ORDER BY expires_at DESC, created_at DESC
+                ) AS rn
+                FROM change_detection_cache
+            ) ranked
+            WHERE rn > 1
+        )
+        """
+    )
+
+    if not _ensure_index(inspector, "change_detection_cache", "uq_cache_competitor_url"):
+        op.create_index(
+            "uq_cache_competitor_url",
+            "change_detection_cache",
+            ["competitor_id", "url"],
+            unique=True,
+        )
+
+    # The unique index supersedes the plain composite ones
+    inspector = sa.inspect(bind)
+    for index_name in ("idx_competitor_url", "idx_competitor_id_url"):
+        if _ensure_index(inspector, "change_detection_cache", index_name):
+            op.drop_index(index_name, table_name="change_detection_cache")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "change_detection_cache" not in inspector.get_table_names():
+        return
+
+    if not _ensure_index(inspector, "change_detection_cache", "idx_competitor_url"):
+        op.create_index("idx_competitor_url", "change_detection_cache", ["competitor_id", "url"])
+    if _ensure_index(inspector, "change_detection_cache", "uq_cache_competitor_url"):
+        op.drop_index("uq_cache_competitor_url", table_name="change_detection_cache")
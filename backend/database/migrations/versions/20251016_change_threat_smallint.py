@@ -0,0 +1,41 @@
+"""Store change_detections.threat_level as smallint"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_change_threat_smallint"
+down_revision = "20251016_archive_user_created"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "change_detections" not in sa.inspect(bind).get_table_names():
+        return
+
+    # threat_level only holds 0-10
+    op.alter_column(
+        "change_detections",
+        "threat_level",
+        type_=sa.SmallInteger(),
+        existing_type=sa.Integer(),
+        existing_nullable=True,
+    )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if "change_detections" not in sa.inspect(bind).get_table_names():
+        return
+
+    op.alter_column(
+        "change_detections",
+        "threat_level",
+        type_=sa.Integer(),
+        existing_type=sa.SmallInteger(),
+        existing_nullable=True,
+    )
@@ -0,0 +1,49 @@
+"""Make (task_id, domain) unique on competitor_records and drop the lone domain index"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_competitor_record_task_domain"
+down_revision = "20251016_user_oauth_partial_unique"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "competitor_records" not in inspector.get_table_names():
+        return
+
+    # Earlier code saved the same competitors twice per task; keep the newest row
+    op.execute(
+        """
+        DELETE FROM competitor_records
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY task_id, domain
+                    ORDER BY created_at DESC, id
+                ) AS rn
+                FROM competitor_records
+            ) ranked
+            WHERE rn > 1
+        )
+        """
+    )
+    with op.batch_alter_table("competitor_records") as batch_op:
+        batch_op.create_unique_constraint("uq_competitor_record_task_domain", ["task_id", "domain"])
+    op.execute("DROP INDEX IF EXISTS ix_competitor_records_domain")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if "competitor_records" not in sa.inspect(bind).get_table_names():
+        return
+
+    op.execute("CREATE INDEX IF NOT EXISTS ix_competitor_records_domain ON competitor_records (domain)")
+    with op.batch_alter_table("competitor_records") as batch_op:
+        batch_op.drop_constraint("uq_competitor_record_task_domain", type_="unique")
@@ -0,0 +1,35 @@
+"""Drop content_storage indexes covered by idx_content_tag_url_created / uq_content_url_tag_hash"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_content_index_consolidate"
+down_revision = "20251016_updated_at_trigger"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "content_storage" not in sa.inspect(bind).get_table_names():
+        return
+
+    # Latest-content lookups use (tag, url, created_at DESC); plain (url, tag)
+    # filters use the prefix of the unique (url, tag, content_hash) index
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_content_tag_url_created "
+        "ON content_storage (tag, url, created_at DESC)"
+    )
+    op.execute("DROP INDEX IF EXISTS idx_url_tag")
+    op.execute("DROP INDEX IF EXISTS idx_content_url_tag_created")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if "content_storage" not in sa.inspect(bind).get_table_names():
+        return
+
+    op.execute("CREATE INDEX IF NOT EXISTS idx_url_tag ON content_storage (url, tag)")
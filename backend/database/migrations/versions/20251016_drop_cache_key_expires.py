@@ -0,0 +1,28 @@
+"""Drop idx_cache_key_expires; cache hits are looked up by (competitor_id, url)"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_drop_cache_key_expires"
+down_revision = "20251016_content_index_consolidate"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "change_detection_cache" not in sa.inspect(bind).get_table_names():
+        return
+
+    op.execute("DROP INDEX IF EXISTS idx_cache_key_expires")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if "change_detection_cache" not in sa.inspect(bind).get_table_names():
+        return
+
+    op.execute("CREATE INDEX IF NOT EXISTS idx_cache_key_expires ON change_detection_cache (cache_key, expires_at)")
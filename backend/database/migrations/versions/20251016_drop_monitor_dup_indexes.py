@@ -0,0 +1,39 @@
+"""Drop idx_monitor_user/idx_monitor_tenant in favour of the column-level ix_monitors_* indexes"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_drop_monitor_dup_indexes"
+down_revision = "20251016_drop_user_dup_indexes"
+branch_labels = None
+depends_on = None
+
+
+# (duplicate index, canonical index kept by the model, column)
+_INDEXES = (
+    ("idx_monitor_user", "ix_monitors_user_id", "user_id"),
+    ("idx_monitor_tenant", "ix_monitors_tenant_id", "tenant_id"),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "monitors" not in sa.inspect(bind).get_table_names():
+        return
+
+    for duplicate, canonical, column in _INDEXES:
+        # Schemas built by the previous migration only have the idx_* variant
+        op.execute(f"CREATE INDEX IF NOT EXISTS {canonical} ON monitors ({column})")
+        op.execute(f"DROP INDEX IF EXISTS {duplicate}")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if "monitors" not in sa.inspect(bind).get_table_names():
+        return
+
+    for duplicate, _, column in _INDEXES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {duplicate} ON monitors ({column})")
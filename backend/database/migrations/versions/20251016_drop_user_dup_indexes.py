@@ -0,0 +1,36 @@
+"""Drop users indexes that duplicate the unique constraints on email/google_id/github_id"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_drop_user_dup_indexes"
+down_revision = "20251016_archive_jsonb"
+branch_labels = None
+depends_on = None
+
+
+_DUPLICATE_INDEXES = (
+    ("idx_user_email", "email"),
+    ("idx_user_google_id", "google_id"),
+    ("idx_user_github_id", "github_id"),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if "users" not in sa.inspect(bind).get_table_names():
+        return
+
+    op.execute("DROP INDEX IF EXISTS " + ", ".join(name for name, _ in _DUPLICATE_INDEXES))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if "users" not in sa.inspect(bind).get_table_names():
+        return
+
+    for index_name, column in _DUPLICATE_INDEXES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON users ({column})")
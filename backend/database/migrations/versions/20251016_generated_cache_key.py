@@ -0,0 +1,41 @@
+"""Drop change_detection_cache.cache_key; rows are keyed by uq_cache_competitor_url"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_generated_cache_key"
+down_revision = "20251016_server_timestamp_defaults"
+branch_labels = None
+depends_on = None
+
+
+def _applies(bind) -> bool:
+    return bind.dialect.name == "postgresql" and "change_detection_cache" in sa.inspect(bind).get_table_names()
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not _applies(bind):
+        return
+
+    # 读写均走 (competitor_id, url) 唯一索引，cache_key 及其唯一索引只增加写入开销
+    op.execute("DROP INDEX IF EXISTS ix_change_detection_cache_cache_key")
+    op.execute("ALTER TABLE change_detection_cache DROP COLUMN IF EXISTS cache_key")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if not _applies(bind):
+        return
+
+    # 恢复为应用层写入的普通列（md5(competitor_id:url)）
+    op.execute("ALTER TABLE change_detection_cache ADD COLUMN IF NOT EXISTS cache_key VARCHAR")
+    op.execute("UPDATE change_detection_cache SET cache_key = md5(competitor_id || ':' || url)")
+    op.execute("ALTER TABLE change_detection_cache ALTER COLUMN cache_key SET NOT NULL")
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_change_detection_cache_cache_key "
+        "ON change_detection_cache (cache_key)"
+    )
@@ -0,0 +1,76 @@
+"""Ensure the unique/composite indexes the CRUD upserts and hot lookups rely on"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_hot_path_indexes"
+down_revision = "20251016_cache_pair_unique"
+branch_labels = None
+depends_on = None
+
+
+# (table, index name, columns, unique, keep-newest ordering used to drop duplicates first)
+_INDEXES = (
+    ("change_read_receipts", "uq_user_change_read", ["user_id", "change_id"], True, "read_at DESC"),
+    ("tenant_competitors", "unique_tenant_competitor", ["tenant_id", "competitor_id"], True, "confidence DESC"),
+    ("content_storage", "uq_content_url_tag_hash", ["url", "tag", "content_hash"], True, "created_at DESC"),
+    ("content_storage", "idx_content_tag_url_created", ["tag", "url", sa.text("created_at DESC")], False, None),
+    ("change_detection_cache", "idx_cache_key_expires", ["cache_key", "expires_at"], False, None),
+)
+
+
+def _has_index(inspector, table_name: str, index_name: str) -> bool:
+    names = {index["name"] for index in inspector.get_indexes(table_name)}
+    names.update(constraint["name"] for constraint in inspector.get_unique_constraints(table_name))
+    return index_name in names
+
+
+def _drop_duplicates(table_name: str, columns, order_by: str) -> None:
+    partition = ", ".join(columns)
+    op.execute(
+        f"""
+        DELETE FROM {table_name}
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY {partition}
+                    ORDER BY {order_by}, id
+                ) AS rn
+                FROM {table_name}
+            ) ranked
+            WHERE rn > 1
+        )
+        """
+    )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    for table_name, index_name, columns, unique, order_by in _INDEXES:
+        if table_name not in tables or _has_index(inspector, table_name, index_name):
+            continue
+        if unique:
+            _drop_duplicates(table_name, columns, order_by)
+        op.create_index(index_name, table_name, columns, unique=unique)
+        inspector = sa.inspect(bind)
+
+
+def downgrade() -> None:
+    # The unique constraints predate this revision on freshly created schemas,
+    # so only the plain composite indexes are removed.
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    for table_name, index_name, _, unique, _ in _INDEXES:
+        if unique or table_name not in tables:
+            continue
+        if index_name in {index["name"] for index in inspector.get_indexes(table_name)}:
+            op.drop_index(index_name, table_name=table_name)
+            inspector = sa.inspect(bind)
@@ -0,0 +1,49 @@
+"""Store the remaining JSON payload columns as JSONB on PostgreSQL"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_jsonb_columns"
+down_revision = "20251016_recency_composite_indexes"
+branch_labels = None
+depends_on = None
+
+
+_JSON_COLUMNS = {
+    "analysis_tasks": ("config", "results"),
+    "tenants": ("key_features",),
+    "competitors": ("extra_data",),
+    "competitor_records": ("extra_data",),
+    "change_detection_cache": ("result_data",),
+    "users": ("extra_data",),
+}
+
+
+def _alter(target_type: str) -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name, columns in _JSON_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        # One ALTER per table so each table is rewritten once
+        op.execute(
+            f"ALTER TABLE {table_name} "
+            + ", ".join(
+                f"ALTER COLUMN {column} TYPE {target_type} USING {column}::{target_type.lower()}"
+                for column in columns
+            )
+        )
+
+
+def upgrade() -> None:
+    _alter("JSONB")
+
+
+def downgrade() -> None:
+    _alter("JSON")
@@ -0,0 +1,38 @@
+"""Store content_storage/change_detection_cache primary keys as native uuid"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_native_uuid_ids"
+down_revision = "20251016_drop_monitor_dup_indexes"
+branch_labels = None
+depends_on = None
+
+
+# High-volume tables whose ids are generated internally and never referenced by a foreign key
+_TABLES = ("content_storage", "change_detection_cache")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name in _TABLES:
+        if table_name in tables:
+            op.execute(f"ALTER TABLE {table_name} ALTER COLUMN id TYPE uuid USING id::uuid")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name in _TABLES:
+        if table_name in tables:
+            op.execute(f"ALTER TABLE {table_name} ALTER COLUMN id TYPE varchar USING id::text")
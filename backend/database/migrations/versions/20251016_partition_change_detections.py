@@ -0,0 +1,132 @@
+"""Rebuild change_detections as a RANGE (detected_at) monthly-partitioned table"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_partition_change_detections"
+down_revision = "20251016_generated_cache_key"
+branch_labels = None
+depends_on = None
+
+_COLUMNS = (
+    "id, competitor_id, url, change_type, content, threat_level, "
+    "why_matter, suggestions, detected_at, is_first, monitor_id"
+)
+
+_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_change_detections_monitor_id ON change_detections (monitor_id)",
+    "CREATE INDEX IF NOT EXISTS idx_change_monitor_detected "
+    "ON change_detections (monitor_id, detected_at DESC) INCLUDE (threat_level, is_first)",
+    "CREATE INDEX IF NOT EXISTS idx_change_detection_threat ON change_detections (threat_level, detected_at)",
+    "CREATE INDEX IF NOT EXISTS idx_competitor_detected ON change_detections (competitor_id, detected_at DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_change_is_first_true ON change_detections (detected_at DESC) WHERE is_first",
+    "CREATE INDEX IF NOT EXISTS idx_change_detected_brin ON change_detections USING brin (detected_at)",
+)
+
+
+def _applies(bind) -> bool:
+    return bind.dialect.name == "postgresql" and "change_detections" in sa.inspect(bind).get_table_names()
+
+
+def _is_partitioned(bind) -> bool:
+    return bool(bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'change_detections'::regclass"
+    )).scalar())
+
+
+def _rename_legacy_table() -> None:
+    op.execute("ALTER TABLE change_read_receipts DROP CONSTRAINT IF EXISTS change_read_receipts_change_id_fkey")
+    op.execute("ALTER TABLE change_detections RENAME TO change_detections_legacy")
+    # 旧表的索引与约束名会与新表冲突；数据复制完成前旧表只读，先行删除即可
+    op.execute("ALTER TABLE change_detections_legacy DROP CONSTRAINT IF EXISTS change_detections_pkey")
+    for statement in _INDEXES:
+        name = statement.split(" IF NOT EXISTS ")[1].split(" ")[0]
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("DROP INDEX IF EXISTS ix_change_detections_is_first")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not _applies(bind) or _is_partitioned(bind):
+        return
+
+    _rename_legacy_table()
+    op.execute("""
+        CREATE TABLE change_detections (
+            id VARCHAR NOT NULL,
+            competitor_id VARCHAR NOT NULL,
+            url VARCHAR NOT NULL,
+            change_type VARCHAR NOT NULL,
+            content TEXT NOT NULL,
+            threat_level SMALLINT,
+            why_matter TEXT,
+            suggestions TEXT,
+            detected_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            is_first BOOLEAN,
+            monitor_id VARCHAR REFERENCES monitors (id) ON DELETE SET NULL,
+            PRIMARY KEY (id, detected_at)
+        ) PARTITION BY RANGE (detected_at)
+    """)
+    op.execute("CREATE TABLE IF NOT EXISTS change_detections_default PARTITION OF change_detections DEFAULT")
+
+    # 已有数据覆盖的每个月份以及未来两个月各建一个分区，历史行不会落进 DEFAULT
+    op.execute("""
+        DO $$
+        DECLARE
+            month date;
+            last_month date;
+        BEGIN
+            SELECT date_trunc('month', COALESCE(min(detected_at), now()))::date INTO month
+            FROM change_detections_legacy;
+            last_month := (date_trunc('month', now()) + interval '2 months')::date;
+            WHILE month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF change_detections FOR VALUES FROM (%L) TO (%L)',
+                    'change_detections_' || to_char(month, 'YYYYMM'),
+                    month,
+                    (month + interval '1 month')::date
+                );
+                month := (month + interval '1 month')::date;
+            END LOOP;
+        END
+        $$
+    """)
+
+    op.execute(
+        f"INSERT INTO change_detections ({_COLUMNS}) "
+        f"SELECT {_COLUMNS.replace('detected_at', 'COALESCE(detected_at, now())')} FROM change_detections_legacy"
+    )
+    op.execute("DROP TABLE change_detections_legacy")
+    for statement in _INDEXES:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if not _applies(bind) or not _is_partitioned(bind):
+        return
+
+    op.execute("ALTER TABLE change_detections RENAME TO change_detections_partitioned")
+    for statement in _INDEXES:
+        name = statement.split(" IF NOT EXISTS ")[1].split(" ")[0]
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER TABLE change_detections_partitioned DROP CONSTRAINT IF EXISTS change_detections_pkey")
+    op.execute(
+        "CREATE TABLE change_detections (LIKE change_detections_partitioned INCLUDING DEFAULTS)"
+    )
+    op.execute(
+        "ALTER TABLE change_detections ADD PRIMARY KEY (id), "
+        "ADD FOREIGN KEY (monitor_id) REFERENCES monitors (id) ON DELETE SET NULL"
+    )
+    op.execute(f"INSERT INTO change_detections ({_COLUMNS}) SELECT {_COLUMNS} FROM change_detections_partitioned")
+    op.execute("DROP TABLE change_detections_partitioned CASCADE")
+    for statement in _INDEXES:
+        op.execute(statement)
+    op.execute("DELETE FROM change_read_receipts WHERE change_id NOT IN (SELECT id FROM change_detections)")
+    op.execute(
+        "ALTER TABLE change_read_receipts ADD CONSTRAINT change_read_receipts_change_id_fkey "
+        "FOREIGN KEY (change_id) REFERENCES change_detections (id) ON DELETE CASCADE"
+    )
@@ -0,0 +1,49 @@
+"""Replace single-column task_id / competitor_id indexes with recency composites"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_recency_composite_indexes"
+down_revision = "20251016_drop_cache_key_expires"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if "competitor_records" in tables:
+        op.execute("DROP INDEX IF EXISTS ix_competitor_records_task_id")
+        op.create_index(
+            "idx_task_created",
+            "competitor_records",
+            ["task_id", "created_at"],
+            postgresql_include=["display_name", "primary_url"],
+            if_not_exists=True,
+        )
+
+    if "change_detections" in tables:
+        op.execute("DROP INDEX IF EXISTS ix_change_detections_competitor_id")
+        op.create_index(
+            "idx_competitor_detected",
+            "change_detections",
+            ["competitor_id", sa.text("detected_at DESC")],
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if "competitor_records" in tables:
+        op.execute("DROP INDEX IF EXISTS idx_task_created")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_competitor_records_task_id ON competitor_records (task_id)")
+
+    if "change_detections" in tables:
+        op.execute("DROP INDEX IF EXISTS idx_competitor_detected")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_change_detections_competitor_id ON change_detections (competitor_id)")
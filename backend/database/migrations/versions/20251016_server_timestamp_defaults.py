@@ -0,0 +1,53 @@
+"""Default created_at / updated_at to now() on the database side"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_server_timestamp_defaults"
+down_revision = "20251016_competitor_record_task_domain"
+branch_labels = None
+depends_on = None
+
+
+_TIMESTAMP_COLUMNS = {
+    "analysis_tasks": ("created_at",),
+    "tenants": ("created_at", "updated_at"),
+    "competitors": ("created_at", "updated_at"),
+    "tenant_competitors": ("created_at",),
+    "competitor_records": ("created_at",),
+    "monitors": ("created_at", "updated_at"),
+    "monitor_competitors": ("created_at", "updated_at"),
+    "change_detection_cache": ("created_at",),
+    "user_preferences": ("created_at", "updated_at"),
+    "content_storage": ("created_at",),
+    "change_read_receipts": ("created_at",),
+    "analysis_archives": ("created_at",),
+    "users": ("created_at", "updated_at"),
+}
+
+
+def _alter(default_clause: str) -> None:
+    bind = op.get_bind()
+    # SQLite cannot change a column default in place; fresh SQLite schemas get it from the models
+    if bind.dialect.name != "postgresql":
+        return
+
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name, columns in _TIMESTAMP_COLUMNS.items():
+        if table_name not in tables:
+            continue
+        op.execute(
+            f"ALTER TABLE {table_name} "
+            + ", ".join(f"ALTER COLUMN {column} {default_clause}" for column in columns)
+        )
+
+
+def upgrade() -> None:
+    _alter("SET DEFAULT now()")
+
+
+def downgrade() -> None:
+    _alter("DROP DEFAULT")
@@ -0,0 +1,41 @@
+"""Generate content_storage/change_detection_cache ids in the database"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_server_uuid_defaults"
+down_revision = "20251016_native_uuid_ids"
+branch_labels = None
+depends_on = None
+
+
+_TABLES = ("content_storage", "change_detection_cache")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    # gen_random_uuid() is built in from PostgreSQL 13; pgcrypto provides it before that
+    if bind.dialect.server_version_info < (13,):
+        op.execute("CREATE EXTENSION IF NOT EXISTS pgcrypto")
+
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name in _TABLES:
+        if table_name in tables:
+            op.execute(f"ALTER TABLE {table_name} ALTER COLUMN id SET DEFAULT gen_random_uuid()")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name in _TABLES:
+        if table_name in tables:
+            op.execute(f"ALTER TABLE {table_name} ALTER COLUMN id DROP DEFAULT")
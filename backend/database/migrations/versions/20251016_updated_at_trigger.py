@@ -0,0 +1,54 @@
+"""Maintain updated_at with a BEFORE UPDATE trigger instead of ORM onupdate"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_updated_at_trigger"
+down_revision = "20251016_server_uuid_defaults"
+branch_labels = None
+depends_on = None
+
+
+_TABLES = ("tenants", "competitors", "monitors", "monitor_competitors", "user_preferences", "users")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = now();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name in _TABLES:
+        if table_name not in tables:
+            continue
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table_name}_updated_at ON {table_name}")
+        op.execute(
+            f"CREATE TRIGGER trg_{table_name}_updated_at BEFORE UPDATE ON {table_name} "
+            "FOR EACH ROW EXECUTE FUNCTION set_updated_at()"
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    tables = set(sa.inspect(bind).get_table_names())
+    for table_name in _TABLES:
+        if table_name in tables:
+            op.execute(f"DROP TRIGGER IF EXISTS trg_{table_name}_updated_at ON {table_name}")
+    op.execute("DROP FUNCTION IF EXISTS set_updated_at()")
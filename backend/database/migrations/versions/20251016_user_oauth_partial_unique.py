@@ -0,0 +1,47 @@
+"""Enforce google_id/github_id uniqueness with partial indexes over non-NULL rows"""
+
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "20251016_user_oauth_partial_unique"
+down_revision = "20251016_jsonb_columns"
+branch_labels = None
+depends_on = None
+
+
+# (partial index, column, unique constraint it replaces)
+_OAUTH_COLUMNS = (
+    ("idx_user_google", "google_id", "users_google_id_key"),
+    ("idx_user_github", "github_id", "users_github_id_key"),
+)
+
+
+def _applies(bind) -> bool:
+    # SQLite cannot drop a table-level unique constraint in place
+    return bind.dialect.name == "postgresql" and "users" in sa.inspect(bind).get_table_names()
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if not _applies(bind):
+        return
+
+    for index_name, column, constraint_name in _OAUTH_COLUMNS:
+        op.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON users ({column}) "
+            f"WHERE {column} IS NOT NULL"
+        )
+        op.execute(f"ALTER TABLE users DROP CONSTRAINT IF EXISTS {constraint_name}")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if not _applies(bind):
+        return
+
+    for index_name, column, constraint_name in _OAUTH_COLUMNS:
+        op.execute(f"ALTER TABLE users ADD CONSTRAINT {constraint_name} UNIQUE ({column})")
+        op.execute(f"DROP INDEX IF EXISTS {index_name}")
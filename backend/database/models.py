@@ -1,93 +1,127 @@
 # backend/database/models.py
-from sqlalchemy import create_engine, Column, String, Integer, Float, DateTime, JSON, Boolean, Text, ForeignKey, Index, UniqueConstraint
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy import create_engine, event, DDL, FetchedValue, String, Integer, SmallInteger, Float, DateTime, JSON, Boolean, Text, ForeignKey, Index, UniqueConstraint, Uuid, text, func, literal_column
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Union
+import os
+import time
 import uuid
+import xxhash
 
-Base = declarative_base()
+class Base(DeclarativeBase):
+    """SQLAlchemy 2.0 声明式基类：列用 Mapped[...] + mapped_column 声明，可空性与注解中的 Optional 一致"""
+
+    # 各模型继承：INSERT/UPDATE ... RETURNING 带回数据库写入的 created_at/updated_at 等服务端默认值
+    __mapper_args__ = {"eager_defaults": True}
+
+# PostgreSQL 上存为 JSONB（解码后的二进制形式，可建 GIN 索引），其他数据库保持通用 JSON
+JSONVariant = JSON().with_variant(JSONB(), "postgresql")
 
 def generate_uuid():
-    return str(uuid.uuid4())
+    """UUIDv7（RFC 9562）：高 48 位为毫秒时间戳，新主键按时间递增，插入集中在 B-tree 最右侧叶子页"""
+    unix_ms = time.time_ns() // 1_000_000
+    value = (unix_ms & 0xFFFF_FFFF_FFFF) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = value & ~(0xF << 76) | (0x7 << 76)  # version 7
+    value = value & ~(0x3 << 62) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+class gen_random_uuid(FunctionElement):
+    """数据库侧生成 UUID，批量 INSERT 不必由 Python 逐行生成并回传主键"""
+    type = Uuid(as_uuid=False)
+    inherit_cache = True
+
+@compiles(gen_random_uuid, "postgresql")
+def _compile_gen_random_uuid_pg(element, compiler, **kw):
+    return "gen_random_uuid()"  # PostgreSQL 13+ 内置；更早版本由 pgcrypto 提供
+
+@compiles(gen_random_uuid, "sqlite")
+def _compile_gen_random_uuid_sqlite(element, compiler, **kw):
+    # 与非原生 Uuid 的存储格式一致：32 位十六进制
+    return "(lower(hex(randomblob(16))))"
 
 class AnalysisTask(Base):
     """分析任务模型 - 存储所有分析任务"""
     __tablename__ = "analysis_tasks"
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    company_name = Column(String, nullable=False)
-    task_type = Column(String, default="analysis")  # 'analysis', 'monitoring'
-    status = Column(String, default="queued")  # queued, running, completed, failed
-    progress = Column(Integer, default=0)
-    message = Column(Text)
-    config = Column(JSON)  # 存储任务配置 (enable_research, max_competitors等)
-    results = Column(JSON)  # 存储完整的分析结果
-    started_at = Column(DateTime)
-    completed_at = Column(DateTime)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    latest_stage = Column(String, nullable=True)
-
-    user_id = Column(String, ForeignKey('users.id'), nullable=True, index=True)
-    monitor_id = Column(String, ForeignKey('monitors.id', name='fk_analysis_tasks_monitor_id'), nullable=True, index=True)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    company_name: Mapped[str] = mapped_column(String, nullable=False)
+    task_type: Mapped[Optional[str]] = mapped_column(String, default="analysis")  # 'analysis', 'monitoring'
+    status: Mapped[Optional[str]] = mapped_column(String, default="queued")  # queued, running, completed, failed
+    progress: Mapped[Optional[int]] = mapped_column(Integer, default=0)
+    message: Mapped[Optional[str]] = mapped_column(Text)
+    # 大 JSON 列延迟加载：状态轮询只读行头，访问属性时才单独取出
+    config: Mapped[Optional[Any]] = mapped_column(JSONVariant, deferred=True)  # 存储任务配置 (enable_research, max_competitors等)
+    results: Mapped[Optional[Any]] = mapped_column(JSONVariant, deferred=True)  # 存储完整的分析结果
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    completed_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+    latest_stage: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
+    user_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey('users.id'), nullable=True, index=True)
+    monitor_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey('monitors.id', name='fk_analysis_tasks_monitor_id', ondelete='SET NULL'), nullable=True, index=True)
 
     # 关系
-    competitors = relationship("CompetitorRecord", back_populates="task", cascade="all, delete-orphan")
-    tenant_competitors = relationship("TenantCompetitor", back_populates="task", cascade="all, delete-orphan")
-    monitor = relationship("Monitor", back_populates="tasks", foreign_keys=[monitor_id])
-    user = relationship("User", back_populates="analysis_tasks", foreign_keys=[user_id])
-    archive_entry = relationship("AnalysisArchive", back_populates="task", uselist=False)
+    competitors: Mapped[List["CompetitorRecord"]] = relationship("CompetitorRecord", back_populates="task", cascade="all, delete-orphan")
+    tenant_competitors: Mapped[List["TenantCompetitor"]] = relationship("TenantCompetitor", back_populates="task", cascade="all, delete-orphan")
+    monitor: Mapped[Optional["Monitor"]] = relationship("Monitor", back_populates="tasks", foreign_keys=[monitor_id])
+    user: Mapped[Optional["User"]] = relationship("User", back_populates="analysis_tasks", foreign_keys=[user_id])
+    archive_entry: Mapped[Optional["AnalysisArchive"]] = relationship("AnalysisArchive", back_populates="task", uselist=False)
 
 class Tenant(Base):
     """租户信息表 - 存储公司基础信息"""
     __tablename__ = "tenants"
     
-    id = Column(String, primary_key=True, default=generate_uuid)
-    tenant_id = Column(String, nullable=False, unique=True, index=True)  # 域名标识如 'stripe.com'
-    tenant_url = Column(String, nullable=False)  # 主页URL
-    tenant_name = Column(String, nullable=False)
-    tenant_description = Column(Text)
-    target_market = Column(String)
-    key_features = Column(JSON)  # List[str]
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    tenant_id: Mapped[str] = mapped_column(String, nullable=False, unique=True, index=True)  # 域名标识如 'stripe.com'
+    tenant_url: Mapped[str] = mapped_column(String, nullable=False)  # 主页URL
+    tenant_name: Mapped[str] = mapped_column(String, nullable=False)
+    tenant_description: Mapped[Optional[str]] = mapped_column(Text)
+    target_market: Mapped[Optional[str]] = mapped_column(String)
+    key_features: Mapped[Optional[Any]] = mapped_column(JSONVariant)  # List[str]
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now(), server_onupdate=FetchedValue())  # 由 set_updated_at 触发器维护
     
     # 关系
-    tenant_competitors = relationship("TenantCompetitor", back_populates="tenant")
+    tenant_competitors: Mapped[List["TenantCompetitor"]] = relationship("TenantCompetitor", back_populates="tenant")
 
 class Competitor(Base):
     """竞争对手主表 - 存储竞争对手基础信息"""
     __tablename__ = "competitors"
     
-    id = Column(String, primary_key=True, default=generate_uuid)
-    competitor_id = Column(String, nullable=False, unique=True, index=True)  # 域名标识
-    display_name = Column(String, nullable=False)
-    primary_url = Column(String, nullable=False)
-    brief_description = Column(Text)
-    demographics = Column(Text)
-    source = Column(String, default="search")
-    extra_data = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    competitor_id: Mapped[str] = mapped_column(String, nullable=False, unique=True, index=True)  # 域名标识
+    display_name: Mapped[str] = mapped_column(String, nullable=False)
+    primary_url: Mapped[str] = mapped_column(String, nullable=False)
+    brief_description: Mapped[Optional[str]] = mapped_column(Text)
+    demographics: Mapped[Optional[str]] = mapped_column(Text)
+    source: Mapped[Optional[str]] = mapped_column(String, default="search")
+    extra_data: Mapped[Optional[Any]] = mapped_column(JSONVariant)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now(), server_onupdate=FetchedValue())  # 由 set_updated_at 触发器维护
     
     # 关系
-    tenant_competitors = relationship("TenantCompetitor", back_populates="competitor")
-    change_detections = relationship("ChangeDetectionCache", back_populates="competitor")
+    tenant_competitors: Mapped[List["TenantCompetitor"]] = relationship("TenantCompetitor", back_populates="competitor")
+    change_detections: Mapped[List["ChangeDetectionCache"]] = relationship("ChangeDetectionCache", back_populates="competitor")
 
 class TenantCompetitor(Base):
     """租户-竞争对手关联表"""
     __tablename__ = "tenant_competitors"
     
-    id = Column(String, primary_key=True, default=generate_uuid)
-    tenant_id = Column(String, ForeignKey('tenants.id'), nullable=False)
-    competitor_id = Column(String, ForeignKey('competitors.id'), nullable=False)
-    task_id = Column(String, ForeignKey('analysis_tasks.id'), nullable=True)  # 可选：记录发现来源
-    confidence = Column(Float, default=0.5)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    tenant_id: Mapped[str] = mapped_column(String, ForeignKey('tenants.id'), nullable=False)
+    competitor_id: Mapped[str] = mapped_column(String, ForeignKey('competitors.id'), nullable=False)
+    task_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey('analysis_tasks.id'), nullable=True)  # 可选：记录发现来源
+    confidence: Mapped[Optional[float]] = mapped_column(Float, default=0.5)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
     
     # 关系
-    tenant = relationship("Tenant", back_populates="tenant_competitors")
-    competitor = relationship("Competitor", back_populates="tenant_competitors")
-    task = relationship("AnalysisTask", back_populates="tenant_competitors")
+    tenant: Mapped[Optional["Tenant"]] = relationship("Tenant", back_populates="tenant_competitors")
+    competitor: Mapped[Optional["Competitor"]] = relationship("Competitor", back_populates="tenant_competitors")
+    task: Mapped[Optional["AnalysisTask"]] = relationship("AnalysisTask", back_populates="tenant_competitors")
     
     # 唯一约束
     __table_args__ = (
@@ -99,64 +133,109 @@ class CompetitorRecord(Base):
     """竞争对手记录 - 兼容现有代码，保留原有字段"""
     __tablename__ = "competitor_records"
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    task_id = Column(String, ForeignKey('analysis_tasks.id'), nullable=False, index=True)
-    domain = Column(String, nullable=False, index=True)
-    display_name = Column(String, nullable=False)
-    primary_url = Column(String, nullable=False)
-    brief_description = Column(Text)
-    demographics = Column(Text)
-    confidence = Column(Float, default=0.5)
-    source = Column(String, default="search")
-    extra_data = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    task_id: Mapped[str] = mapped_column(String, ForeignKey('analysis_tasks.id'), nullable=False)
+    domain: Mapped[str] = mapped_column(String, nullable=False)
+    display_name: Mapped[str] = mapped_column(String, nullable=False)
+    primary_url: Mapped[str] = mapped_column(String, nullable=False)
+    brief_description: Mapped[Optional[str]] = mapped_column(Text)
+    demographics: Mapped[Optional[str]] = mapped_column(Text)
+    confidence: Mapped[Optional[float]] = mapped_column(Float, default=0.5)
+    source: Mapped[Optional[str]] = mapped_column(String, default="search")
+    extra_data: Mapped[Optional[Any]] = mapped_column(JSONVariant)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
 
     # 关系
-    task = relationship("AnalysisTask", back_populates="competitors")
+    task: Mapped[Optional["AnalysisTask"]] = relationship("AnalysisTask", back_populates="competitors")
+
+    __table_args__ = (
+        # 同一任务内每个域名只保留一条；(task_id, domain) 查找直接命中该唯一索引
+        UniqueConstraint('task_id', 'domain', name='uq_competitor_record_task_domain'),
+        # 按任务列出竞争对手并按时间排序；前导 task_id 同时覆盖原单列查询
+        Index(
+            'idx_task_created',
+            'task_id',
+            'created_at',
+            postgresql_include=['display_name', 'primary_url'],
+        ),
+    )
+
+
+def bulk_save_competitors(session, task_id: str, rows: List[Dict]) -> List[CompetitorRecord]:
+    """批量写入 CompetitorRecord：一条 INSERT ... ON CONFLICT ... RETURNING，绕过逐行 unit-of-work
+
+    rows 只需包含列值；task_id 统一填入，id/created_at 由列默认值生成。
+    同一任务重复保存的域名按 (task_id, domain) 就地更新，批内重复以最后一条为准。
+    调用方负责 commit。
+    """
+    if not rows:
+        return []
+    by_domain = {row["domain"]: {**row, "task_id": task_id} for row in rows}
+    if session.get_bind().dialect.name == "sqlite":
+        stmt = sqlite_insert(CompetitorRecord).values(list(by_domain.values()))
+    else:
+        stmt = pg_insert(CompetitorRecord).values(list(by_domain.values()))
+    updates = {
+        column: stmt.excluded[column]
+        for column in next(iter(by_domain.values()))
+        if column not in ("task_id", "domain")
+    }
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["task_id", "domain"], set_=updates
+    ).returning(CompetitorRecord)
+    return session.scalars(stmt, execution_options={"populate_existing": True}).all()
 
 
 class Monitor(Base):
     """监控实体 - 绑定用户与租户分析记录"""
     __tablename__ = "monitors"
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    user_id = Column(String, ForeignKey('users.id'), nullable=False, index=True)  # 添加这行
-    tenant_id = Column(String, ForeignKey('tenants.id'), nullable=True, index=True)
-    name = Column(String, nullable=False)
-    url = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    last_run_at = Column(DateTime, nullable=True)
-    archived_at = Column(DateTime, nullable=True)
-    is_active = Column(Boolean, default=True)
-    latest_task_id = Column(String, ForeignKey('analysis_tasks.id', name='fk_monitors_latest_task_id'), nullable=True, index=True)
-
-    user = relationship("User", back_populates="monitors")  # 添加这行
-    tenant = relationship("Tenant")
-    tasks = relationship("AnalysisTask", back_populates="monitor", foreign_keys="AnalysisTask.monitor_id")
-    latest_task = relationship("AnalysisTask", foreign_keys=[latest_task_id], post_update=True)
-    tracked_competitors = relationship("MonitorCompetitor", back_populates="monitor", cascade="all, delete-orphan")
-    archives = relationship("AnalysisArchive", back_populates="monitor")
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    user_id: Mapped[str] = mapped_column(String, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)  # 添加这行
+    tenant_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey('tenants.id'), nullable=True, index=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    url: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now(), server_onupdate=FetchedValue())  # 由 set_updated_at 触发器维护
+    last_run_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    archived_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    is_active: Mapped[Optional[bool]] = mapped_column(Boolean, default=True)
+    latest_task_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey('analysis_tasks.id', name='fk_monitors_latest_task_id'), nullable=True, index=True)
+
+    user: Mapped[Optional["User"]] = relationship("User", back_populates="monitors")  # 添加这行
+    tenant: Mapped[Optional["Tenant"]] = relationship("Tenant")
+    tasks: Mapped[List["AnalysisTask"]] = relationship("AnalysisTask", back_populates="monitor", foreign_keys="AnalysisTask.monitor_id")
+    latest_task: Mapped[Optional["AnalysisTask"]] = relationship("AnalysisTask", foreign_keys=[latest_task_id], post_update=True)
+    # 默认懒加载，需要跟踪列表的查询自行 selectinload；删除交给数据库 ON DELETE CASCADE
+    tracked_competitors: Mapped[List["MonitorCompetitor"]] = relationship(
+        "MonitorCompetitor", back_populates="monitor", cascade="all, delete-orphan",
+        passive_deletes=True
+    )
+    archives: Mapped[List["AnalysisArchive"]] = relationship("AnalysisArchive", back_populates="monitor")
 
     __table_args__ = (
         UniqueConstraint('user_id', 'url', name='uq_monitor_user_url'),
-        Index('idx_monitor_user', 'user_id'),
-        Index('idx_monitor_tenant', 'tenant_id'),
+        Index('idx_monitor_user_active', 'user_id', 'is_active', 'archived_at'),
+        # list_monitors 默认路径：只看未归档的活跃monitor
+        Index(
+            'idx_monitor_user_live', 'user_id', created_at.desc(),
+            postgresql_where=text('is_active AND archived_at IS NULL')
+        ),
     )
 
 class MonitorCompetitor(Base):
     """用户监控的竞争对手映射表"""
     __tablename__ = "monitor_competitors"
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    monitor_id = Column(String, ForeignKey('monitors.id'), nullable=False)
-    competitor_id = Column(String, ForeignKey('competitors.id'), nullable=False)
-    tracked = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    monitor_id: Mapped[str] = mapped_column(String, ForeignKey('monitors.id', ondelete='CASCADE'), nullable=False)
+    competitor_id: Mapped[str] = mapped_column(String, ForeignKey('competitors.id'), nullable=False)
+    tracked: Mapped[Optional[bool]] = mapped_column(Boolean, default=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now(), server_onupdate=FetchedValue())  # 由 set_updated_at 触发器维护
 
-    monitor = relationship("Monitor", back_populates="tracked_competitors")
-    competitor = relationship("Competitor")
+    monitor: Mapped[Optional["Monitor"]] = relationship("Monitor", back_populates="tracked_competitors")
+    competitor: Mapped[Optional["Competitor"]] = relationship("Competitor")
 
     __table_args__ = (
         UniqueConstraint('monitor_id', 'competitor_id', name='uq_monitor_competitor'),
@@ -168,30 +247,23 @@ class ChangeDetectionCache(Base):
     """变化检测缓存表 - 3天TTL"""
     __tablename__ = "change_detection_cache"
     
-    id = Column(String, primary_key=True, default=generate_uuid)
-    competitor_id = Column(String, ForeignKey('competitors.id'), nullable=False, index=True)
-    url = Column(String, nullable=False, index=True)
-    cache_key = Column(String, nullable=False, unique=True, index=True)  # competitor_id:url的哈希
-    result_data = Column(JSON, nullable=False)  # 缓存的检测结果
-    created_at = Column(DateTime, default=datetime.utcnow)
-    expires_at = Column(DateTime, nullable=False)  # TTL过期时间
+    id: Mapped[str] = mapped_column(Uuid(as_uuid=False), primary_key=True, server_default=gen_random_uuid())  # 原生 16 字节 UUID，仅内部使用
+    competitor_id: Mapped[str] = mapped_column(String, ForeignKey('competitors.id'), nullable=False, index=True)
+    url: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    result_data: Mapped[Any] = mapped_column(JSONVariant, nullable=False)  # 缓存的检测结果
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)  # TTL过期时间
     
     # 关系
-    competitor = relationship("Competitor", back_populates="change_detections")
+    competitor: Mapped[Optional["Competitor"]] = relationship("Competitor", back_populates="change_detections")
     
     # 索引优化
     __table_args__ = (
-        Index('idx_cache_key_expires', 'cache_key', 'expires_at'),
-        Index('idx_competitor_url', 'competitor_id', 'url'),
+        # 命中检查走 (competitor_id, url) 唯一索引再过滤 expires_at；
+        # now() 不是 IMMUTABLE，无法写成 WHERE expires_at > now() 的部分索引
+        Index('uq_cache_competitor_url', 'competitor_id', 'url', unique=True),
     )
     
-    @classmethod
-    def generate_cache_key(cls, competitor_id: str, url: str) -> str:
-        """生成缓存键"""
-        import hashlib
-        key_string = f"{competitor_id}:{url}"
-        return hashlib.md5(key_string.encode()).hexdigest()
-    
     @classmethod
     def is_expired(cls, cache_record) -> bool:
         """检查缓存是否过期"""
@@ -201,92 +273,138 @@ class ChangeDetection(Base):
     """变化检测记录 - 增强版本"""
     __tablename__ = "change_detections"
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    competitor_id = Column(String, nullable=False, index=True)
-    url = Column(String, nullable=False)
-    change_type = Column(String, nullable=False)  # Added, Removed, Modified
-    content = Column(Text, nullable=False)
-    threat_level = Column(Integer, default=5)
-    why_matter = Column(Text)
-    suggestions = Column(Text)
-    detected_at = Column(DateTime, default=datetime.utcnow)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    competitor_id: Mapped[str] = mapped_column(String, nullable=False)
+    url: Mapped[str] = mapped_column(String, nullable=False)
+    change_type: Mapped[str] = mapped_column(String, nullable=False)  # Added, Removed, Modified
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    threat_level: Mapped[Optional[int]] = mapped_column(SmallInteger, default=5)  # 0-10
+    why_matter: Mapped[Optional[str]] = mapped_column(Text)
+    suggestions: Mapped[Optional[str]] = mapped_column(Text)
+    # 分区键：PostgreSQL 要求主键包含分区列，故与 id 组成复合主键
+    detected_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow)
     
     # 新增字段
-    is_first = Column(Boolean, default=True, index=True)  # 区分首次/持续检测
-    monitor_id = Column(String, ForeignKey('monitors.id'), nullable=True, index=True)  # 关联monitor
+    is_first: Mapped[Optional[bool]] = mapped_column(Boolean, default=True)  # 区分首次/持续检测
+    monitor_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey('monitors.id', ondelete='SET NULL'), nullable=True, index=True)  # 关联monitor
     
     # 关系
-    read_receipts = relationship("ChangeReadReceipt", back_populates="change", cascade="all, delete-orphan")
-    monitor = relationship("Monitor", backref="change_detections")
+    read_receipts: Mapped[List["ChangeReadReceipt"]] = relationship(
+        "ChangeReadReceipt",
+        primaryjoin="ChangeDetection.id == foreign(ChangeReadReceipt.change_id)",
+        back_populates="change",
+        cascade="all, delete-orphan",
+    )
+    monitor: Mapped[Optional["Monitor"]] = relationship("Monitor", backref="change_detections")
     
     # 添加索引优化查询
     __table_args__ = (
-        Index('idx_change_detection_query', 'monitor_id', 'detected_at', 'is_first'),
+        # 覆盖索引：邮件摘要按 monitor + 时间范围过滤 threat_level，可走 index-only scan
+        Index(
+            'idx_change_monitor_detected',
+            'monitor_id',
+            detected_at.desc(),
+            postgresql_include=['threat_level', 'is_first'],
+        ),
         Index('idx_change_detection_threat', 'threat_level', 'detected_at'),
+        # 按竞争对手取最近变化：索引顺序即结果顺序，省去排序
+        Index('idx_competitor_detected', 'competitor_id', detected_at.desc()),
+        # 布尔列选择性极低，只索引首次检测的行
+        Index('idx_change_is_first_true', detected_at.desc(), postgresql_where=text('is_first')),
+        # 只追加、按时间顺序写入：BRIN 以极小体积让时间范围扫描只读相关块
+        Index('idx_change_detected_brin', 'detected_at', postgresql_using='brin').ddl_if(dialect='postgresql'),
+        # 按月 RANGE 分区：近期查询只扫热分区，过期月份整块 DETACH/DROP
+        {'postgresql_partition_by': 'RANGE (detected_at)'},
     )
 
 class UserPreferences(Base):
     """用户偏好设置"""
     __tablename__ = "user_preferences"
     
-    id = Column(String, primary_key=True, default=generate_uuid)
-    user_id = Column(String, ForeignKey('users.id'), unique=True, nullable=False)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    user_id: Mapped[str] = mapped_column(String, ForeignKey('users.id'), unique=True, nullable=False)
     
     # Change Radar阈值设置
-    change_view_threshold = Column(Float, default=0.0)  # 前端显示阈值
-    email_alert_threshold = Column(Float, default=7.0)  # 邮件通知阈值
-    email_alerts_enabled = Column(Boolean, default=False)  # 是否启用邮件通知
+    change_view_threshold: Mapped[Optional[float]] = mapped_column(Float, default=0.0)  # 前端显示阈值
+    email_alert_threshold: Mapped[Optional[float]] = mapped_column(Float, default=7.0)  # 邮件通知阈值
+    email_alerts_enabled: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)  # 是否启用邮件通知
     
     # 邮件设置
-    email_frequency = Column(String, default="daily")  # daily, weekly, immediate
-    email_time = Column(String, default="09:00")  # 发送时间 HH:MM
-    last_email_sent = Column(DateTime, nullable=True)
+    email_frequency: Mapped[Optional[str]] = mapped_column(String, default="daily")  # daily, weekly, immediate
+    email_time: Mapped[Optional[str]] = mapped_column(String, default="09:00")  # 发送时间 HH:MM
+    last_email_sent: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
     
     # 其他偏好
-    default_page_size = Column(Integer, default=10)
-    theme = Column(String, default="system")
+    default_page_size: Mapped[Optional[int]] = mapped_column(Integer, default=10)
+    theme: Mapped[Optional[str]] = mapped_column(String, default="system")
     
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now(), server_onupdate=FetchedValue())  # 由 set_updated_at 触发器维护
     
     # 关系
-    user = relationship("User", backref="preferences", uselist=False)
+    user: Mapped[Optional["User"]] = relationship("User", backref="preferences", uselist=False)
     
 class ContentStorage(Base):
     """内容存储表 - 支持OngoingTracker的previous content存储"""
     __tablename__ = "content_storage"
     
-    id = Column(String, primary_key=True, default=generate_uuid)
-    url = Column(String, nullable=False, index=True)
-    tag = Column(String, nullable=False, index=True)
-    content_hash = Column(String, nullable=False)  # 内容哈希，用于去重
-    content = Column(Text)  # 存储的markdown内容
-    created_at = Column(DateTime, default=datetime.utcnow)
+    id: Mapped[str] = mapped_column(Uuid(as_uuid=False), primary_key=True, server_default=gen_random_uuid())  # 原生 16 字节 UUID，仅内部使用
+    url: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    tag: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    content_hash: Mapped[str] = mapped_column(String, nullable=False)  # 内容哈希，用于去重
+    content: Mapped[Optional[str]] = mapped_column(Text)  # 存储的markdown内容
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
     
     # 复合索引
     __table_args__ = (
-        Index('idx_url_tag', 'url', 'tag'),
+        # 最新内容查找（tag、url 等值 + created_at 倒序）直接沿该索引取首行，无需排序；
+        # 仅按 (url, tag) 过滤的查询由 uq_content_url_tag_hash 的前缀覆盖
+        Index('idx_content_tag_url_created', 'tag', 'url', created_at.desc()),
+        UniqueConstraint('url', 'tag', 'content_hash', name='uq_content_url_tag_hash'),
     )
     
+    # 超过该长度的字符串分段编码后流式哈希，避免一次性复制出整页 UTF-8 字节
+    HASH_CHUNK_CHARS = 1 << 20
+
+    @classmethod
+    def generate_content_hash(cls, content: Union[str, bytes]) -> str:
+        """生成内容哈希（仅用于去重，xxh3-128 远快于 SHA-256）；已是 bytes 时不再复制"""
+        if isinstance(content, str):
+            if len(content) > cls.HASH_CHUNK_CHARS:
+                step = cls.HASH_CHUNK_CHARS
+                return cls.generate_content_hash_stream(
+                    content[start:start + step] for start in range(0, len(content), step)
+                )
+            content = content.encode()
+        return xxhash.xxh3_128_hexdigest(memoryview(content))
+
     @classmethod
-    def generate_content_hash(cls, content: str) -> str:
-        """生成内容哈希"""
-        import hashlib
-        return hashlib.sha256(content.encode()).hexdigest()
+    def generate_content_hash_stream(cls, chunks: Iterable[Union[str, bytes]]) -> str:
+        """分块计算内容哈希，结果与对拼接后的完整内容调用 generate_content_hash 相同"""
+        digest = xxhash.xxh3_128()
+        for chunk in chunks:
+            digest.update(chunk.encode() if isinstance(chunk, str) else memoryview(chunk))
+        return digest.hexdigest()
 
 
 class ChangeReadReceipt(Base):
     """记录用户已读的变化项"""
     __tablename__ = "change_read_receipts"
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    user_id = Column(String, ForeignKey('users.id'), nullable=False, index=True)
-    change_id = Column(String, ForeignKey('change_detections.id'), nullable=False, index=True)
-    read_at = Column(DateTime, default=datetime.utcnow)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-    user = relationship("User", back_populates="read_receipts")
-    change = relationship("ChangeDetection", back_populates="read_receipts")
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    user_id: Mapped[str] = mapped_column(String, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    # change_detections 已分区、id 单列不再唯一，无法建外键；一致性由 ORM 级联与
+    # 分区删除时的同步清理维护，可选的 delete_orphaned_read_receipts 分批兜底
+    change_id: Mapped[str] = mapped_column(String, nullable=False, index=True)
+    read_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+
+    user: Mapped[Optional["User"]] = relationship("User", back_populates="read_receipts")
+    change: Mapped[Optional["ChangeDetection"]] = relationship(
+        "ChangeDetection",
+        primaryjoin="ChangeDetection.id == foreign(ChangeReadReceipt.change_id)",
+        back_populates="read_receipts",
+    )
 
     __table_args__ = (
         UniqueConstraint('user_id', 'change_id', name='uq_user_change_read'),
@@ -297,60 +415,189 @@ class AnalysisArchive(Base):
     """归档的分析快照"""
     __tablename__ = "analysis_archives"
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    user_id = Column(String, ForeignKey('users.id'), nullable=False, index=True)
-    monitor_id = Column(String, ForeignKey('monitors.id'), nullable=True, index=True)
-    task_id = Column(String, ForeignKey('analysis_tasks.id'), nullable=True, index=True)
-    title = Column(String, nullable=False)
-    tenant_snapshot = Column(JSON)
-    competitor_snapshot = Column(JSON)
-    change_snapshot = Column(JSON)
-    metadata_json = Column(JSON)
-    search_text = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-    user = relationship("User", back_populates="archives")
-    monitor = relationship("Monitor", back_populates="archives")
-    task = relationship("AnalysisTask", back_populates="archive_entry")
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    user_id: Mapped[str] = mapped_column(String, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    monitor_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey('monitors.id', ondelete='SET NULL'), nullable=True, index=True)
+    task_id: Mapped[Optional[str]] = mapped_column(String, ForeignKey('analysis_tasks.id'), nullable=True, index=True)
+    title: Mapped[str] = mapped_column(String, nullable=False)
+    tenant_snapshot: Mapped[Optional[Any]] = mapped_column(JSONVariant)
+    competitor_snapshot: Mapped[Optional[Any]] = mapped_column(JSONVariant)
+    change_snapshot: Mapped[Optional[Any]] = mapped_column(JSONVariant)
+    metadata_json: Mapped[Optional[Any]] = mapped_column(JSONVariant)
+    search_text: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+
+    user: Mapped[Optional["User"]] = relationship("User", back_populates="archives")
+    monitor: Mapped[Optional["Monitor"]] = relationship("Monitor", back_populates="archives")
+    task: Mapped[Optional["AnalysisTask"]] = relationship("AnalysisTask", back_populates="archive_entry")
+
+    __table_args__ = (
+        # list_archives 的 keyset 分页：按用户倒序扫描；id 区分同一时刻写入的行
+        Index('idx_archive_user_created', 'user_id', created_at.desc(), id.desc()),
+        # search_text 全文检索（仅 PostgreSQL）
+        Index(
+            'idx_archive_search_text',
+            func.to_tsvector(literal_column("'english'"), func.coalesce(search_text, literal_column("''"))),
+            postgresql_using='gin',
+        ).ddl_if(dialect='postgresql'),
+    )
     # 在你的 database/models.py 文件末尾添加这个User模型
 
 class User(Base):
     """用户认证模型 - OAuth登录用户"""
     __tablename__ = "users"
 
-    id = Column(String, primary_key=True, default=generate_uuid)
-    email = Column(String, unique=True, nullable=False, index=True)
-    name = Column(String, nullable=False)
-    avatar_url = Column(String, nullable=True)
+    id: Mapped[str] = mapped_column(String, primary_key=True, default=generate_uuid)
+    email: Mapped[str] = mapped_column(String, unique=True, nullable=False, index=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    avatar_url: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     
     # OAuth相关字段
-    google_id = Column(String, nullable=True, unique=True)
-    github_id = Column(String, nullable=True, unique=True) 
-    github_username = Column(String, nullable=True)
+    google_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    github_id: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    github_username: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     
     # 状态字段
-    is_active = Column(Boolean, default=True)
-    is_verified = Column(Boolean, default=False)
+    is_active: Mapped[Optional[bool]] = mapped_column(Boolean, default=True)
+    is_verified: Mapped[Optional[bool]] = mapped_column(Boolean, default=False)
     
     # 时间戳
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    last_login = Column(DateTime, nullable=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now(), server_onupdate=FetchedValue())  # 由 set_updated_at 触发器维护
+    last_login: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     # 额外数据
-    extra_data = Column(JSON, nullable=True)
+    extra_data: Mapped[Optional[Any]] = mapped_column(JSONVariant, nullable=True)
 
-    monitors = relationship("Monitor", back_populates="user", cascade="all, delete-orphan")
-    analysis_tasks = relationship("AnalysisTask", back_populates="user")
-    read_receipts = relationship("ChangeReadReceipt", back_populates="user", cascade="all, delete-orphan")
-    archives = relationship("AnalysisArchive", back_populates="user", cascade="all, delete-orphan")
+    # 删除用户时由数据库 ON DELETE CASCADE 清理子表，不先把子行逐条载入 Session；
+    # 这些集合保持懒加载，用户对象在每次鉴权时都会读取
+    monitors: Mapped[List["Monitor"]] = relationship("Monitor", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    analysis_tasks: Mapped[List["AnalysisTask"]] = relationship("AnalysisTask", back_populates="user")
+    read_receipts: Mapped[List["ChangeReadReceipt"]] = relationship("ChangeReadReceipt", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    archives: Mapped[List["AnalysisArchive"]] = relationship("AnalysisArchive", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
-    # 索引优化
+    # email 的唯一索引已覆盖登录查询（唯一即单行，无需再带 is_active）。
+    # OAuth id 多数为 NULL：唯一性改由部分索引保证，只索引非空行
     __table_args__ = (
-        Index('idx_user_email', 'email'),
-        Index('idx_user_google_id', 'google_id'),
-        Index('idx_user_github_id', 'github_id'),
+        Index(
+            'idx_user_google', 'google_id', unique=True,
+            postgresql_where=text('google_id IS NOT NULL'),
+            sqlite_where=text('google_id IS NOT NULL'),
+        ),
+        Index(
+            'idx_user_github', 'github_id', unique=True,
+            postgresql_where=text('github_id IS NOT NULL'),
+            sqlite_where=text('github_id IS NOT NULL'),
+        ),
     )
     
     def __repr__(self):
         return f"<User(id='{self.id}', email='{self.email}', name='{self.name}')>"
+
+
+# updated_at 由 PostgreSQL 的 BEFORE UPDATE 触发器统一写入 now()：
+# ORM 的 UPDATE 不再携带 Python 时间戳，批量 UPDATE 也能自动刷新
+_SET_UPDATED_AT_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+""")
+event.listen(Base.metadata, "before_create", _SET_UPDATED_AT_FUNCTION.execute_if(dialect="postgresql"))
+
+for _table in Base.metadata.tables.values():
+    if "updated_at" in _table.c:
+        event.listen(
+            _table,
+            "after_create",
+            DDL(
+                f"CREATE TRIGGER trg_{_table.name}_updated_at BEFORE UPDATE ON {_table.name} "
+                "FOR EACH ROW EXECUTE FUNCTION set_updated_at()"
+            ).execute_if(dialect="postgresql"),
+        )
+
+
+# change_detections 按 detected_at 月度分区：DEFAULT 分区兜底，月分区由后台任务提前创建，
+# 超出保留期的月份整块 DETACH + DROP，不产生逐行 DELETE 的膨胀
+CHANGE_DETECTION_DEFAULT_PARTITION = "change_detections_default"
+_CHANGE_DETECTION_PARTITION_PREFIX = "change_detections_"
+
+
+def _month_start(moment: datetime) -> datetime:
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(month: datetime) -> datetime:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def ensure_change_detection_partitions(connection, months_ahead: int = 2) -> List[str]:
+    """创建当前月及之后 months_ahead 个月的分区（已存在则跳过），返回新建的分区名"""
+    if connection.dialect.name != "postgresql":
+        return []
+
+    created = []
+    month = _month_start(datetime.utcnow())
+    for _ in range(months_ahead + 1):
+        upper = _next_month(month)
+        name = f"{_CHANGE_DETECTION_PARTITION_PREFIX}{month:%Y%m}"
+        if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+            # 多个 worker 可能同时发现缺失的分区，IF NOT EXISTS 让落后的一方直接跳过
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF change_detections "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            ))
+            created.append(name)
+        month = upper
+    return created
+
+
+def expired_change_detection_partitions(connection, cutoff: datetime) -> List[str]:
+    """整月早于 cutoff 的月度分区名（DEFAULT 分区及非月度分区不参与按月清理）"""
+    if connection.dialect.name != "postgresql":
+        return []
+
+    partitions = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'change_detections'::regclass"
+    )).scalars().all()
+
+    expired = []
+    for name in sorted(partitions):
+        suffix = name[len(_CHANGE_DETECTION_PARTITION_PREFIX):]
+        if not (name.startswith(_CHANGE_DETECTION_PARTITION_PREFIX) and len(suffix) == 6 and suffix.isdigit()):
+            continue
+        if _next_month(datetime.strptime(suffix, "%Y%m")) <= cutoff:
+            expired.append(name)
+    return expired
+
+
+def drop_change_detection_partition(connection, name: str) -> None:
+    """DETACH 并 DROP 一个分区，连同指向其中记录的已读回执；调用方每个分区单独提交"""
+    connection.execute(text(f"DELETE FROM change_read_receipts WHERE change_id IN (SELECT id FROM {name})"))
+    connection.execute(text(f"ALTER TABLE change_detections DETACH PARTITION {name}"))
+    connection.execute(text(f"DROP TABLE {name}"))
+
+
+def delete_orphaned_read_receipts(connection, batch_size: int) -> int:
+    """删除至多 batch_size 条 change_id 已不存在的已读回执，返回删除行数
+
+    正常路径不会产生孤立回执（ORM 级联、分区删除时同步清理），仅作可选的兜底任务分批调用。
+    """
+    return connection.execute(text(
+        "DELETE FROM change_read_receipts WHERE id IN ("
+        "SELECT r.id FROM change_read_receipts r WHERE NOT EXISTS ("
+        "SELECT 1 FROM change_detections c WHERE c.id = r.change_id) LIMIT :batch_size)"
+    ), {"batch_size": batch_size}).rowcount
+
+
+@event.listens_for(ChangeDetection.__table__, "after_create")
+def _create_change_detection_partitions(target, connection, **kw):
+    if connection.dialect.name != "postgresql":
+        return
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {CHANGE_DETECTION_DEFAULT_PARTITION} PARTITION OF change_detections DEFAULT"
+    ))
+    ensure_change_detection_partitions(connection)
@@ -12,8 +12,9 @@ sys.path.insert(0, str(project_root))
 
 from backend.core.email_service import email_service
 from backend.core.email_tasks import send_daily_change_alerts
-from backend.database import get_db_session
+from backend.database import get_db_session, get_async_db_session, ASYNC_DB_AVAILABLE
 from backend.database.models import User
+from sqlalchemy import select
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -25,19 +26,21 @@ async def test_email_system():
         # 1. 测试基本邮件发送
         logger.info("测试基本邮件发送...")
         
-        # 获取测试用户 - 在session内获取需要的属性
-        test_user_email = None
-        test_user_name = None
+        # 获取测试用户 - 只取发送所需的两列，不构造ORM对象
+        stmt = select(User.email, User.name).limit(1)
+        if ASYNC_DB_AVAILABLE:
+            # 异步引擎：查询不阻塞事件循环
+            async with get_async_db_session() as db:
+                row = (await db.execute(stmt)).first()
+        else:
+            with get_db_session() as db:
+                row = db.execute(stmt).first()
         
-        with get_db_session() as db:
-            test_user = db.query(User).first()
-            if not test_user:
-                logger.error("没有找到测试用户")
-                return False
-            
-            # 在session内获取属性
-            test_user_email = test_user.email
-            test_user_name = test_user.name
+        if not row:
+            logger.error("没有找到测试用户")
+            return False
+        
+        test_user_email, test_user_name = row
         
         if not test_user_email:
             logger.error("测试用户缺少邮箱地址")
@@ -100,10 +103,8 @@ async def test_email_system():
         
         # 2. 测试邮件模板渲染
         logger.info("\n测试邮件模板渲染...")
-        from jinja2 import Template
         from datetime import datetime
         
-        template = Template(email_service.change_alert_template)
         frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
         
         template_data = {
@@ -116,7 +117,7 @@ async def test_email_system():
             "settings_url": f"{frontend_url}#settings"
         }
         
-        html_content = template.render(**template_data)
+        html_content = email_service.render_change_alert(template_data)
         if html_content and len(html_content) > 1000:
             logger.info("✅ 邮件模板渲染成功")
             logger.info(f"  模板长度: {len(html_content)} 字符")
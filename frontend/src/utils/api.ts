@@ -449,14 +449,32 @@ export async function bulkMarkChangesRead(changeIds: string[]): Promise<void> {
 }
 
 export async function fetchArchives(): Promise<ArchiveEntry[]> {
-  const response = await fetch(`${API_BASE}/api/archives`, {
-    headers: {
-      ...getAuthHeaders(),
-    },
-  })
+  // The endpoint is keyset-paginated; follow next_cursor until the last page
+  const archives: ArchiveEntry[] = []
+  let cursor: { before: string; before_id: string } | null = null
+
+  do {
+    const params = new URLSearchParams()
+    if (cursor) {
+      params.set('before', cursor.before)
+      params.set('before_id', cursor.before_id)
+    }
+    const query = params.toString()
+    const response = await fetch(`${API_BASE}/api/archives${query ? `?${query}` : ''}`, {
+      headers: {
+        ...getAuthHeaders(),
+      },
+    })
+
+    const data = await handleResponse<{
+      archives: Array<Record<string, unknown>>
+      next_cursor: { before: string; before_id: string } | null
+    }>(response)
+    archives.push(...data.archives.map(mapArchive))
+    cursor = data.next_cursor
+  } while (cursor)
 
-  const data = await handleResponse<{ archives: Array<Record<string, unknown>> }>(response)
-  return data.archives.map(mapArchive)
+  return archives
 }
 
 export async function createArchive(request: ArchiveCreateRequest): Promise<ArchiveEntry> {
@@ -2,12 +2,13 @@ from dotenv import load_dotenv
 load_dotenv()
 from langgraph.graph import StateGraph, START, END
 from src.models.schemas import CompetitorState
-from src.core import tenant_agent, competitor_finder, change_detector
+from src.core import tenant_agent, competitor_finder, competitor_seed, change_detector
 from langchain_core.messages import HumanMessage
 import asyncio
 from src.core.ongoing_compare_agent import ongoing_compare_agent
 from typing import List
 import logging
+import time
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,16 +33,46 @@ async def build_opp_agent():
     """构建OPP分析代理"""
     agent_builder = StateGraph(CompetitorState)
     agent_builder.add_node("tenant_info_agent", tenant_agent)
+    agent_builder.add_node("competitor_seed", competitor_seed)
     agent_builder.add_node("competitor_finder", competitor_finder)
     agent_builder.add_node("change_detector", change_detector)
 
+    # 租户分析与初始竞品搜索互不依赖，并行执行；competitor_finder 等两者都完成后再运行
     agent_builder.add_edge(START, "tenant_info_agent")
-    agent_builder.add_edge("tenant_info_agent", "competitor_finder")
+    agent_builder.add_edge(START, "competitor_seed")
+    agent_builder.add_edge(["tenant_info_agent", "competitor_seed"], "competitor_finder")
     agent_builder.add_edge("competitor_finder", "change_detector")
     agent_builder.add_edge("change_detector", END)
     opp_agent = agent_builder.compile()
     return opp_agent
 
+async def _run_db(fn, *args, **kwargs):
+    """在线程中执行同步数据库调用，LLM/爬取的流式响应不被 SQL I/O 阻塞"""
+    return await asyncio.to_thread(fn, *args, **kwargs)
+
+# 每次写入各用一个短会话并立即提交，流式等待 LLM 期间不持有连接或事务
+def _sync_create_task(company_name: str, tenant_dict: dict, task_config: dict) -> str:
+    """租户 upsert 与任务创建在 create_task_with_tenant 内同一事务提交，返回任务ID"""
+    with get_db_session() as db:
+        return enhanced_task_crud.create_task_with_tenant(db, company_name, tenant_dict, task_config).id
+
+def _sync_get_tenant_competitors(tenant_id: str) -> list:
+    with get_db_session() as db:
+        competitors = tenant_crud.get_tenant_competitors(db, tenant_id)
+        db.expunge_all()  # 会话关闭后仍可读取已加载的属性
+        return competitors
+
+def _sync_save_competitors(task_id: str, tenant_id: str, competitors_data: List[dict]) -> tuple:
+    with get_db_session() as db:
+        records, mappings = enhanced_task_crud.save_competitors_with_mapping(
+            db, task_id, tenant_id, competitors_data
+        )
+        return len(records), len(mappings)
+
+def _sync_mark_task_failed(task_id: str, message: str) -> None:
+    with get_db_session() as db:
+        enhanced_task_crud.update_task_status(db, task_id, "failed", message)
+
 # ===== 增强版：优化的持久化OPP Agent =====
 async def run_opp_agent_with_enhanced_persistence(
     company_name: str = "FL Studio", 
@@ -72,48 +103,45 @@ async def run_opp_agent_with_enhanced_persistence(
         
         # ===== 第一步：执行分析并收集结果 =====
         logger.info("执行分析流程...")
+        started = time.perf_counter()
+        # 变化检测缓存跨 update 累积，流结束后一次写入
+        pending_cache: dict = {}
+        pending_map: dict = {}
+        
         async for update in opp_agent.astream(
             {"messages": [HumanMessage(content=company_name)]},
             stream_mode="updates",
         ):
             print(update)
+            logger.info(f"节点完成: {', '.join(update)} (+{time.perf_counter() - started:.2f}s)")
             full_result.update(update)
             
-            # ===== 租户信息处理 =====
+            # ===== 租户信息处理：租户完成即创建任务 =====
             if "tenant_info_agent" in update and update["tenant_info_agent"].get("tenant"):
                 tenant_data = update["tenant_info_agent"]["tenant"]
                 
                 try:
-                    with get_db_session() as db:
-                        # 标准化租户数据
-                        tenant_dict = _normalize_data(tenant_data)
-                        
-                        # 确保有tenant_id
-                        if 'tenant_id' not in tenant_dict or not tenant_dict['tenant_id']:
-                            tenant_dict['tenant_id'] = company_name.lower().replace(' ', '_').replace('-', '_')
-                        
-                        tenant_id = tenant_dict['tenant_id']
-                        
-                        # 创建或更新租户
-                        tenant_record, created = tenant_crud.get_or_create_tenant(
-                            db, tenant_id, tenant_dict
-                        )
-                        
-                        # 创建任务记录
-                        task = enhanced_task_crud.create_task_with_tenant(
-                            db, 
-                            company_name, 
-                            tenant_dict, 
-                            {
-                                'enable_caching': enable_caching,
-                                'max_competitors': max_competitors,
-                                'day_delta': day_delta
-                            }
-                        )
-                        task_id = task.id
-                        
-                        action = "创建" if created else "更新"
-                        logger.info(f"{action}租户: {tenant_dict.get('tenant_name', company_name)} (任务ID: {task_id})")
+                    # 标准化租户数据
+                    tenant_dict = _normalize_data(tenant_data)
+                    
+                    # 确保有tenant_id
+                    if 'tenant_id' not in tenant_dict or not tenant_dict['tenant_id']:
+                        tenant_dict['tenant_id'] = company_name.lower().replace(' ', '_').replace('-', '_')
+                    
+                    tenant_id = tenant_dict['tenant_id']
+                    
+                    # 租户 upsert 与任务创建一次提交
+                    task_id = await _run_db(
+                        _sync_create_task,
+                        company_name,
+                        tenant_dict,
+                        {
+                            'enable_caching': enable_caching,
+                            'max_competitors': max_competitors,
+                            'day_delta': day_delta
+                        }
+                    )
+                    logger.info(f"保存租户: {tenant_dict.get('tenant_name', company_name)} (任务ID: {task_id})")
                 
                 except Exception as e:
                     logger.error(f"处理租户信息失败: {e}")
@@ -126,26 +154,21 @@ async def run_opp_agent_with_enhanced_persistence(
                 limited_competitors = competitors[:max_competitors]
                 
                 try:
-                    with get_db_session() as db:
-                        # 检查是否启用缓存且已有竞争对手
-                        existing_competitors = []
-                        if enable_caching:
-                            existing_competitors = tenant_crud.get_tenant_competitors(db, tenant_id)
-                            
-                            if existing_competitors:
-                                logger.info(f"使用已存储的竞争对手: {len(existing_competitors)} 个")
-                                # 更新状态以使用已存储的竞争对手
-                                full_result["competitor_finder"]["competitors"] = existing_competitors[:max_competitors]
-                                continue
-                        
-                        # 保存新的竞争对手
-                        competitors_data = [_normalize_data(comp) for comp in limited_competitors]
-                        
-                        records, mappings = enhanced_task_crud.save_competitors_with_mapping(
-                            db, task_id, tenant_id, competitors_data
-                        )
+                    # 检查是否启用缓存且已有竞争对手
+                    if enable_caching:
+                        existing_competitors = await _run_db(_sync_get_tenant_competitors, tenant_id)
                         
-                        logger.info(f"保存竞争对手: {len(records)} 个记录, {len(mappings)} 个映射关系")
+                        if existing_competitors:
+                            logger.info(f"使用已存储的竞争对手: {len(existing_competitors)} 个")
+                            # 更新状态以使用已存储的竞争对手
+                            full_result["competitor_finder"]["competitors"] = existing_competitors[:max_competitors]
+                            continue
+                    
+                    # 保存新的竞争对手
+                    record_count, mapping_count = await _run_db(
+                        _sync_save_competitors, task_id, tenant_id, _competitor_dicts(limited_competitors)
+                    )
+                    logger.info(f"保存竞争对手: {record_count} 个记录, {mapping_count} 个映射关系")
                 
                 except Exception as e:
                     logger.error(f"处理竞争对手信息失败: {e}")
@@ -156,32 +179,28 @@ async def run_opp_agent_with_enhanced_persistence(
                 
                 if enable_caching and changes:
                     try:
-                        # 准备缓存数据
-                        cache_data = {}
-                        competitor_mapping = {}
-                        
-                        # 获取当前的竞争对手列表
-                        current_competitors = full_result.get("competitor_finder", {}).get("competitors", [])
-                        
-                        for i, change in enumerate(changes):
-                            if i < len(current_competitors):
-                                comp = current_competitors[i]
-                                comp_url = _get_url_from_competitor(comp)
-                                comp_id = _get_id_from_competitor(comp)
-                                
-                                if comp_url:
-                                    change_dict = _normalize_data(change)
-                                    cache_data[comp_url] = change_dict
-                                    competitor_mapping[comp_url] = comp_id
+                        # 获取当前的竞争对手列表：一次转换，URL/ID 直接按列取
+                        current_competitors = _competitor_dicts(
+                            full_result.get("competitor_finder", {}).get("competitors", [])
+                        )
+                        comp_urls = [comp.get('primary_url') for comp in current_competitors]
+                        comp_ids = [comp.get('id') for comp in current_competitors]
                         
-                        if cache_data:
-                            cached_urls = await change_detection_cache.cache_results(
-                                cache_data, competitor_mapping
-                            )
-                            logger.info(f"缓存变化检测结果: {len(cached_urls)} 个URL")
+                        for change, comp_url, comp_id in zip(changes, comp_urls, comp_ids):
+                            if comp_url:
+                                pending_cache[comp_url] = _normalize_data(change)
+                                pending_map[comp_url] = comp_id
                     
                     except Exception as e:
-                        logger.error(f"缓存变化检测结果失败: {e}")
+                        logger.error(f"准备变化检测缓存失败: {e}")
+        
+        # ===== 变化检测结果整批缓存：一个事务、一条 executemany 的 upsert =====
+        if pending_cache:
+            try:
+                cached_urls = await change_detection_cache.cache_results(pending_cache, pending_map)
+                logger.info(f"缓存变化检测结果: {len(cached_urls)} 个URL")
+            except Exception as e:
+                logger.error(f"缓存变化检测结果失败: {e}")
         
         # ===== 第二步：生成最终统计 =====
         summary = _generate_analysis_summary(full_result, company_name, enable_caching)
@@ -200,10 +219,7 @@ async def run_opp_agent_with_enhanced_persistence(
         # TODO: 更新任务状态为失败
         if task_id:
             try:
-                with get_db_session() as db:
-                    enhanced_task_crud.update_task_status(
-                        db, task_id, "failed", f"Analysis failed: {str(e)}"
-                    )
+                await _run_db(_sync_mark_task_failed, task_id, f"Analysis failed: {str(e)}")
             except:
                 pass
         raise
@@ -309,21 +325,20 @@ def _normalize_data(data):
     else:
         return {"raw_data": str(data)}
 
-def _get_url_from_competitor(competitor):
-    """从竞争对手对象获取URL"""
-    if hasattr(competitor, 'primary_url'):
-        return competitor.primary_url
-    elif isinstance(competitor, dict):
-        return competitor.get('primary_url')
-    return None
-
-def _get_id_from_competitor(competitor):
-    """从竞争对手对象获取ID"""
-    if hasattr(competitor, 'id'):
-        return competitor.id
-    elif isinstance(competitor, dict):
-        return competitor.get('id')
-    return None
+def _competitor_dicts(competitors) -> List[dict]:
+    """把同构的竞争对手列表一次性转为 dict 列表：按首个元素判定类型，不逐个探测属性"""
+    if not competitors:
+        return []
+    first = competitors[0]
+    if hasattr(first, 'model_dump'):
+        return [comp.model_dump() for comp in competitors]
+    if isinstance(first, dict):
+        return list(competitors)
+    # 数据库中已存储的 Competitor 行
+    return [
+        {'id': comp.id, 'display_name': comp.display_name, 'primary_url': comp.primary_url}
+        for comp in competitors
+    ]
 
 def _generate_analysis_summary(full_result, company_name, enable_caching):
     """生成分析摘要"""
@@ -331,13 +346,11 @@ def _generate_analysis_summary(full_result, company_name, enable_caching):
     competitors = full_result.get("competitor_finder", {}).get("competitors", [])
     changes = full_result.get("change_detector", {}).get("changes", [])
     
-    # 计算变化总数
-    total_changes = 0
-    for change in changes:
-        if hasattr(change, 'changes'):
-            total_changes += len(change.changes) if change.changes else 0
-        elif isinstance(change, dict) and 'changes' in change:
-            total_changes += len(change['changes']) if change['changes'] else 0
+    # 计算变化总数：缓存命中为 dict，新检测为 SOChanges
+    total_changes = sum(
+        len((change.get('changes') if isinstance(change, dict) else change.changes) or ())
+        for change in changes
+    )
     
     return {
         "company_name": company_name,
@@ -355,7 +368,7 @@ async def get_enhanced_system_stats():
     """获取增强的系统统计信息"""
     try:
         # 数据库统计
-        db_stats = get_database_stats()
+        db_stats = await _run_db(get_database_stats)
         
         # 缓存统计 - 现在使用async方法
         cache_stats = await change_detection_cache.get_cache_stats()
@@ -410,6 +423,9 @@ async def cleanup_system_data(days_to_keep: int = 30):
 
 async def get_tenant_analysis_history_enhanced(tenant_id: str):
     """获取租户的增强分析历史"""
+    return await _run_db(_sync_get_tenant_analysis_history, tenant_id)
+
+def _sync_get_tenant_analysis_history(tenant_id: str):
     try:
         with get_db_session() as db:
             # 获取租户信息
@@ -2,7 +2,7 @@
 from .rate_limiter import rate_limiter, RateLimiter, RateLimitConfig
 from .llm_wrapper import RateLimitedLLM, create_rate_limited_llm
 from .tenant_analyzer import tenant_agent
-from .competitor_finder import competitor_finder
+from .competitor_finder import competitor_finder, competitor_seed
 from .firecrawl_wrapper import RateLimitedFirecrawl
 from .compare_agent import change_detector
 __all__ = [
@@ -13,6 +13,7 @@ __all__ = [
     'create_rate_limited_llm',
     'tenant_agent',
     'competitor_finder',
+    'competitor_seed',
     'ArchiveTracker',
     'OngoingTracker',
     'RateLimitedFirecrawl',
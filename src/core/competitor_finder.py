@@ -90,6 +90,11 @@ async def llm_call(state: CompetitorState) -> Dict:
     """
     tenant_info = state["tenant"].model_dump_json()
     tool_call_iterations = state.get("tool_call_iterations", 0)
+    seed_results = state.get("seed_results") or []
+    seed_context = (
+        [HumanMessage(content="Initial competitor search results:\n" + "\n---\n".join(seed_results))]
+        if seed_results else []
+    )
         
     # Execute OpenAI call (rate limiting is handled by RateLimitedLLM wrapper)
     response = await model_with_tools.ainvoke(
@@ -98,11 +103,38 @@ async def llm_call(state: CompetitorState) -> Dict:
             tool_call_iterations=tool_call_iterations
         ))] + 
         state.get("messages", []) + 
+        seed_context +
         [HumanMessage(content=f"Find competitors for {tenant_info}")]
     )
     
     return {"messages": [response]}
 
+async def competitor_seed(state: CompetitorState) -> Dict:
+    """Run an initial competitor search from the raw company name.
+    
+    The search only needs the user's input, so it runs alongside tenant
+    analysis; llm_call later receives the results as extra context.
+    """
+    from langchain_core.messages import filter_messages
+    
+    human_messages = filter_messages(state.get("messages", []), include_types=["human"])
+    if not human_messages:
+        return {"seed_results": []}
+    company_name = human_messages[0].content
+    
+    _, tools_by_name = _get_tools()
+    try:
+        observation = await rate_limiter.execute_with_limit(
+            "tavily",
+            tools_by_name["tavily_search"].ainvoke,
+            {"query": f"{company_name} competitors and alternatives"}
+        )
+    except Exception as e:
+        logger.error(f"Competitor seed search failed: {e}")
+        return {"seed_results": []}
+    
+    return {"seed_results": [str(observation)]}
+
 async def tool_node(state: CompetitorState) -> Dict:
     """Execute all tool calls from the previous LLM response.
     
@@ -7,14 +7,13 @@
 import asyncio
 import difflib
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Union, AsyncGenerator, Sequence
+from typing import List, Dict, Optional, Tuple, Union, AsyncGenerator, Sequence
 from waybackpy import WaybackMachineCDXServerAPI
 from .firecrawl_wrapper import RateLimitedFirecrawl
 from .rate_limiter import rate_limiter
 import requests
 import os
 from dotenv import load_dotenv
-from firecrawl.v2.types import Document
 import logging
 
 # ===== 新增：导入数据库内容存储 =====
@@ -325,56 +324,55 @@ class OngoingTracker:
         
         tag_to_use = tag if tag is not None else self._tag
         
-        # 分批处理
-        for i in range(0, len(urls), self.batch_size):
-            batch_urls = urls[i:i + self.batch_size]
-            
-            # ===== 步骤1：获取历史内容 =====
-            previous_batch = await self.get_previous_scrapes(batch_urls, tag_to_use)
-            
-            # ===== 步骤2：抓取当前内容并进行比较 =====
-            current_content = {}
-            
-            # 使用Firecrawl批量抓取当前内容
-            async for result in self.fcw.batch_scrape_stream(
-                batch_urls, 
-                formats=['markdown'], 
-                maxAge=self.maxAge
-            ):
-                url = None
-                markdown_content = None
-                
-                # 处理不同的结果格式
-                if isinstance(result, Document):
-                    url = getattr(result, 'url', None) or getattr(result.metadata, 'url', None)
-                    markdown_content = getattr(result, 'markdown', None)
-                elif isinstance(result, dict):
-                    url = result.get('url')
-                    markdown_content = result.get('markdown')
-                elif hasattr(result, 'url'):
-                    url = result.url
-                    markdown_content = getattr(result, 'markdown', None)
+        # ===== 步骤1：一次取回全部URL的历史内容 =====
+        previous_content = await self.get_previous_scrapes(urls, tag_to_use)
+        
+        # ===== 步骤2：所有URL并发抓取比较（本地扇出上限 batch_size），先完成先输出 =====
+        local_sem = asyncio.Semaphore(self.batch_size)
+        
+        async def _bounded(url: str) -> Tuple[Dict, Optional[str]]:
+            async with local_sem:
+                return await self._track_one(url, previous_content.get(url))
+        
+        tasks = [asyncio.create_task(_bounded(url)) for url in urls]
+        current_content = {}
+        
+        try:
+            for fut in asyncio.as_completed(tasks):
+                diff_result, markdown_content = await fut
+                if markdown_content:
+                    current_content[diff_result["url"]] = markdown_content
                 
-                if url and markdown_content:
-                    current_content[url] = markdown_content
-                    
-                    # 获取历史内容进行比较
-                    previous_content = previous_batch.get(url)
-                    
-                    # 生成差异结果
-                    diff_result = await self._create_diff_result(url, markdown_content, previous_content)
-                    
-                    # 立即流式输出结果
-                    yield diff_result
+                # 立即流式输出结果
+                yield diff_result
                 
-                elif url:
-                    # 处理失败的抓取
-                    error_result = await self._create_diff_result(url, None, previous_batch.get(url))
-                    yield error_result
-            
-            # ===== 步骤3：保存当前内容到数据库 =====
-            if save_content and current_content:
-                await self.save_current_scrapes(current_content, tag_to_use)
+                # ===== 步骤3：每满一批保存一次当前内容，避免整轮结束前内容全部堆在内存 =====
+                if save_content and len(current_content) >= self.batch_size:
+                    await self.save_current_scrapes(current_content, tag_to_use)
+                    current_content = {}
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        if save_content and current_content:
+            await self.save_current_scrapes(current_content, tag_to_use)
+
+    async def _track_one(self, url: str, previous_content: Optional[str]) -> Tuple[Dict, Optional[str]]:
+        """抓取单个URL并与历史内容比较，返回 (差异结果, 当前内容)"""
+        try:
+            result = await self.fcw.scrape(url, formats=['markdown'], maxAge=self.maxAge)
+        except Exception as e:
+            logger.warning(f"抓取当前内容失败 {url}: {e}")
+            result = None
+        
+        # 处理不同的结果格式
+        if isinstance(result, dict):
+            markdown_content = result.get('markdown')
+        else:
+            markdown_content = getattr(result, 'markdown', None)
+        
+        diff_result = await self._create_diff_result(url, markdown_content, previous_content)
+        return diff_result, markdown_content
 
     # ===== 保持向后兼容的原始方法 =====
     async def ongoing_tracking_stream(self, urls: Union[str, List[str]], tag: Optional[str] = None) -> AsyncGenerator[Dict, None]:
@@ -63,6 +63,8 @@ class CompetitorState(TypedDict):
     competitors: List[SOCompetitor] = []
     raw_notes: Annotated[List[str], operator.add] = []
     changes: Annotated[List[SOChanges], operator.add] = []
+    # 与租户分析并行的初始竞品搜索结果，仅由 competitor_seed 写入
+    seed_results: List[str] = []
 
 class CompetitorFinderOutputState(TypedDict):
     """Output state for the competitor finder subgraph"""